@@ -0,0 +1,299 @@
+import ctypes
+from bisect import bisect_right
+import numpy as np
+from Node import Node, NodeCursor, NodeJITBase, NodeJIT_fields, node_link_journal
+from codegenerator import BlockNodeLoopGenerator
+
+
+def particle_id(particle):
+    """
+    :return: ID of a particle as Python int (JIT particles return their record fields as 1-element arrays)
+    """
+    pid = particle.id
+    return int(pid[0]) if isinstance(pid, np.ndarray) else int(pid)
+
+
+class BlockNodeJIT(NodeJITBase, Node, ctypes.Structure):
+    """
+    Node of an unrolled list: instead of pointing to a single particle, the node holds a fixed-capacity block of
+    particle records (a numpy structured array of the particle type's dtype) plus an occupancy mask. The C struct
+    (BlockNodeJIT in node.h) extends the NodeJIT struct by the mask pointer, the capacity and the particle count,
+    so that the compiled particle loop (see codegenerator.BlockNodeLoopGenerator) can iterate over the records of
+    a block as over an array before it follows the '_c_next_p' link.
+
+    The JITParticle objects stored in a block keep working as usual: their record pointer (_cptr) is redirected to
+    their slot in the block's record array.
+    """
+    _fields_ = NodeJIT_fields + [('_c_mask_p', ctypes.c_void_p),
+                                 ('_c_capacity', ctypes.c_int),
+                                 ('_c_count', ctypes.c_int)]
+    capacity = 0
+    count = 0
+    records = None
+    mask = None
+    particles = None
+    slot_of = None
+    _free_slots = None
+
+    def __init__(self, prev=None, next=None, ptype=None, capacity=64):
+        """
+        :param prev: previous block node
+        :param next: next block node
+        :param ptype: particle type (PType) of the records
+        :param capacity: number of particle records per block
+        """
+        assert ptype is not None and capacity > 0
+        self.capacity = capacity
+        self.count = 0
+        self.records = np.zeros(capacity, dtype=ptype.dtype)
+        self.mask = np.zeros(capacity, dtype=np.uint8)
+        self.particles = [None] * capacity
+        self.slot_of = {}
+        # -- pop() hands out the slots front-to-back -- #
+        self._free_slots = list(range(capacity-1, -1, -1))
+        # -- block nodes don't take a particle ID (id=-1 -> None) -- #
+        super(BlockNodeJIT, self).__init__(prev=prev, next=next, id=-1, data=self.records)
+        self._c_mask_p = self.mask.ctypes.data
+        self._c_capacity = capacity
+        self._c_count = 0
+
+    def c_data_address(self):
+        if self.data is None:
+            return None
+        return self.data.ctypes.data
+
+    def update_data(self):
+        if self.data is not None:
+            self.set_data_ptr_c(self, ctypes.c_void_p(self.data.ctypes.data))
+        else:
+            self.reset_data_ptr_c(self)
+
+    def full(self):
+        return self.count >= self.capacity
+
+    def min_id(self):
+        return min(self.slot_of.keys()) if self.count > 0 else None
+
+    def insert(self, particle):
+        """
+        Moves the particle's record into a free slot of this block.
+        :param particle: JITParticle (with a record of this block's particle type)
+        :return: slot index of the particle
+        """
+        assert not self.full()
+        slot = self._free_slots.pop()
+        self.records[slot] = particle.get_cptr()[0]
+        particle.set_cptr(self.records[slot:slot+1])
+        self.particles[slot] = particle
+        self.slot_of[particle_id(particle)] = slot
+        self.mask[slot] = 1
+        self.count += 1
+        self._c_count = self.count
+        return slot
+
+    def remove(self, slot):
+        """
+        Removes the particle in the given slot from this block; the particle gets its own copy of its record.
+        :param slot: slot index
+        :return: removed particle
+        """
+        particle = self.particles[slot]
+        assert particle is not None
+        particle.set_cptr(self.records[slot:slot+1].copy())
+        self.particles[slot] = None
+        del self.slot_of[particle_id(particle)]
+        self.mask[slot] = 0
+        self._free_slots.append(slot)
+        self.count -= 1
+        self._c_count = self.count
+        return particle
+
+    def remove_by_id(self, id):
+        return self.remove(self.slot_of[id])
+
+    def iter_particles(self):
+        """
+        :return: generator over the particles of this block (in slot order)
+        """
+        for particle in self.particles:
+            if particle is not None:
+                yield particle
+
+
+class UnrolledList(object):
+    """
+    Unrolled linked list of particles: a chain of BlockNodeJIT nodes with up to 'capacity' particles each.
+    The blocks cover disjoint, ascending particle ID ranges (the particles within a block are unordered). A full
+    block is split in two on insertion; a block that falls below a quarter of its capacity on removal is merged
+    into a neighbour if the neighbour has room for its particles. Inserting or deleting a particle hence touches a
+    single block (plus at most one neighbour), while the compiled kernel loop runs over contiguous records.
+    """
+    loopgen_class = BlockNodeLoopGenerator
+    _ptype = None
+    _capacity = 64
+    _blocks = []
+    _keys = []
+    _len = 0
+
+    def __init__(self, ptype, capacity=64):
+        """
+        :param ptype: particle type (PType) of the stored (JIT) particles
+        :param capacity: number of particle records per block
+        """
+        assert ptype.uses_jit
+        assert capacity >= 4
+        self._ptype = ptype
+        self._capacity = capacity
+        # -- blocks in chain order, and the lower ID bound of each block (for bisection) -- #
+        self._blocks = []
+        self._keys = []
+        self._len = 0
+
+    def __del__(self):
+        self.clear()
+
+    def clear(self):
+        """Remove all the particles (and blocks) from the list."""
+        while len(self._blocks) > 0:
+            block = self._blocks.pop()
+            block.unlink()
+        self._keys = []
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    @property
+    def nblocks(self):
+        return len(self._blocks)
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    def begin(self):
+        """
+        :return: first block node of the chain (to be handed to the compiled particle loop); None if empty
+        """
+        return self._blocks[0] if len(self._blocks) > 0 else None
+
+    def end(self):
+        return self._blocks[-1] if len(self._blocks) > 0 else None
+
+    def export_c(self, sub_chain=None):
+        """
+        :param sub_chain: not supported - the particles within a block are unordered, so there are no ID runs to
+                          hand over; the loop always covers all particles
+        :return: tuple (num_particles, begin block) - the leading arguments of the compiled block loop, as for the
+                 node storages (see NodeStorage.export_c())
+        """
+        assert sub_chain is None, "UnrolledList has no sub-chains - its blocks are not ordered internally"
+        # -- the block links may have been journaled (see Node.LinkJournal) -- #
+        node_link_journal.flush()
+        return self._len, self.begin()
+
+    def blocks(self, backward=False):
+        """
+        :return: NodeCursor over the block nodes
+        """
+        return NodeCursor(self.end() if backward else self.begin(), backward=backward)
+
+    def __iter__(self):
+        for block in self._blocks:
+            for particle in block.iter_particles():
+                yield particle
+
+    def _block_index(self, id):
+        return max(bisect_right(self._keys, id) - 1, 0)
+
+    def _new_block(self, index):
+        prev_block = self._blocks[index-1] if index > 0 else None
+        next_block = self._blocks[index] if index < len(self._blocks) else None
+        block = BlockNodeJIT(ptype=self._ptype, capacity=self._capacity)
+        block.link_between(prev_block, next_block)
+        self._blocks.insert(index, block)
+        return block
+
+    def _split(self, index):
+        """
+        Moves the upper half (by ID) of the particles of a full block into a new block after it.
+        """
+        block = self._blocks[index]
+        ids = sorted(block.slot_of.keys())
+        upper = ids[len(ids)//2:]
+        new_block = self._new_block(index+1)
+        self._keys.insert(index+1, upper[0])
+        for id in upper:
+            new_block.insert(block.remove_by_id(id))
+
+    def _merge(self, index):
+        """
+        Moves the particles of an underfull block into a neighbour (if it has room) and removes the block.
+        """
+        block = self._blocks[index]
+        if index+1 < len(self._blocks) and self._blocks[index+1].count + block.count <= self._capacity // 2:
+            target = self._blocks[index+1]
+            self._keys[index+1] = self._keys[index]
+        elif index > 0 and self._blocks[index-1].count + block.count <= self._capacity // 2:
+            target = self._blocks[index-1]
+        else:
+            return
+        for id in list(block.slot_of.keys()):
+            target.insert(block.remove_by_id(id))
+        self._remove_block(index)
+
+    def _remove_block(self, index):
+        block = self._blocks.pop(index)
+        key = self._keys.pop(index)
+        if index == 0 and len(self._keys) > 0:
+            # -- the new first block has to cover the IDs below its own bound as well -- #
+            self._keys[0] = min(key, self._keys[0])
+        block.unlink()
+
+    def add(self, particle):
+        """
+        Inserts a (JIT) particle into the block that covers its ID, splitting that block if it is full.
+        :param particle: JITParticle
+        """
+        id = particle_id(particle)
+        if len(self._blocks) <= 0:
+            self._new_block(0)
+            self._keys.append(id)
+        index = self._block_index(id)
+        if self._blocks[index].full():
+            self._split(index)
+            index = self._block_index(id)
+        if id < self._keys[index]:
+            self._keys[index] = id
+        self._blocks[index].insert(particle)
+        self._len += 1
+
+    def get_by_id(self, id):
+        """
+        :param id: particle ID
+        :return: particle with that ID; None if there is no such particle
+        """
+        if len(self._blocks) <= 0:
+            return None
+        block = self._blocks[self._block_index(id)]
+        slot = block.slot_of.get(id, None)
+        return block.particles[slot] if slot is not None else None
+
+    def remove(self, particle_or_id):
+        """
+        Removes a particle from the list; its block is merged into a neighbour if it becomes underfull.
+        :param particle_or_id: particle or particle ID
+        :return: removed particle (holding its own record again)
+        """
+        id = int(particle_or_id) if isinstance(particle_or_id, (int, np.integer)) else particle_id(particle_or_id)
+        index = self._block_index(id)
+        block = self._blocks[index] if len(self._blocks) > 0 else None
+        if block is None or id not in block.slot_of:
+            raise ValueError('particle {} not in list'.format(id))
+        particle = block.remove_by_id(id)
+        self._len -= 1
+        if block.count <= 0:
+            self._remove_block(index)
+        elif block.count < self._capacity // 4:
+            self._merge(index)
+        return particle
@@ -0,0 +1,437 @@
+from Node import *
+from OrderStatistic import SortedListBackend
+from NodeStorage import NodeStorage
+from LinkedList import as_node, node_id, update_linked, removal_mask, unlink_masked, split_linked
+from bisect import bisect_left, insort
+from contextlib import contextmanager
+from copy import deepcopy
+from itertools import chain, groupby
+import numpy as np
+import threading
+
+
+def bisect_node_id(nodes, id):
+    """
+    :param nodes: sorted storage of nodes
+    :param id: search node ID
+    :return: position of the first node with an ID not lower than 'id' (len(nodes) if there is none)
+    """
+    lower = 0
+    upper = len(nodes)
+    while lower < upper:
+        pos = (lower + upper) // 2
+        if nodes[pos].id < id:
+            lower = pos + 1
+        else:
+            upper = pos
+    return lower
+
+
+class ListSegment(object):
+    """
+    One segment of a ConcurrentRealList: the nodes of one ID range in a sorted storage of their own, linked among
+    each other (the links towards the neighbouring segments are set by ConcurrentRealList.stitch()), and the lock
+    that guards both.
+    """
+    number = 0
+    nodes = None
+    lock = None
+
+    def __init__(self, number):
+        """
+        :param number: segment number - the segment holds the IDs [number << segment_bits, (number+1) << segment_bits)
+        """
+        self.number = number
+        self.nodes = SortedListBackend()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.nodes)
+
+
+class ConcurrentRealList(NodeStorage):
+    """
+    Sorted list of linked nodes for several producer threads: the ID space is partitioned into segments of
+    2^segment_bits IDs, each with its own lock, sorted storage and chain segment (see ListSegment). An insertion
+    only locks the segment of its ID, so producers that add particles of different ID ranges (e.g. repeat
+    releases, SPLIT children and external seeding, each drawing from its own ID range) insert in parallel.
+
+    The chain segments are stitched together at their boundaries lazily: an insertion or removal that changes the
+    first or last node of a segment only marks the chain as stale, and the boundary links are set under all locks
+    - in O(number of segments) - right before the chain is walked (see stitch(); begin(), end() and export_c()
+    stitch implicitly). Positions (index results, positional access) count across all segments; while producers
+    are inserting, they are only a snapshot.
+    """
+    dtype = None
+    _segment_bits = 16
+    _segments = {}
+    _order = []
+    _registry_lock = None
+    _stale = False
+
+    def __init__(self, iterable=None, dtype=Node, segment_bits=16):
+        """
+        :param iterable: initial nodes, node IDs (int) or data objects
+        :param dtype: node class
+        :param segment_bits: log2 of the number of IDs per segment
+        """
+        self.dtype = dtype
+        self._segment_bits = segment_bits
+        self._segments = {}
+        self._order = []
+        # -- guards the creation of segments; taken before (never while holding) a segment lock -- #
+        self._registry_lock = threading.Lock()
+        self._stale = False
+        if iterable is not None:
+            self.update(iterable)
+
+    def __del__(self):
+        self.clear()
+
+    # ==== segments ==== #
+    def _segment(self, id, create=False):
+        """
+        :param id: node ID
+        :param create: if True, the segment is created if it does not exist yet
+        :return: segment of the ID; None if it does not exist (and 'create' is False)
+        """
+        number = int(id) >> self._segment_bits
+        segment = self._segments.get(number, None)
+        if segment is None and create:
+            with self._registry_lock:
+                segment = self._segments.get(number, None)
+                if segment is None:
+                    segment = ListSegment(number)
+                    self._segments[number] = segment
+                    insort(self._order, number)
+        return segment
+
+    def _ordered_segments(self):
+        return [self._segments[number] for number in list(self._order)]
+
+    def _offset(self, number):
+        """
+        :return: number of nodes in the segments before segment 'number'
+        """
+        order = list(self._order)
+        return sum(len(self._segments[n]) for n in order[:bisect_left(order, number)])
+
+    def _locate(self, index):
+        """
+        :param index: position (negative ones count from the end)
+        :return: tuple (segment, position in the segment)
+        """
+        if index < 0:
+            index += len(self)
+        if index >= 0:
+            for segment in self._ordered_segments():
+                if index < len(segment):
+                    return segment, index
+                index -= len(segment)
+        raise IndexError("ConcurrentRealList index out of range")
+
+    @contextmanager
+    def exclusive(self):
+        """
+        Locks the whole list - the registry first, then all segments in ID order - for operations that span
+        segments.
+        :return: context manager that yields the segments in ID order
+        """
+        with self._registry_lock:
+            segments = self._ordered_segments()
+            for segment in segments:
+                segment.lock.acquire()
+            try:
+                yield segments
+            finally:
+                for segment in reversed(segments):
+                    segment.lock.release()
+
+    def stitch(self):
+        """
+        Links the last node of each non-empty segment with the first node of the next one (and clears the links at
+        both ends of the chain), if any segment boundary has changed since the last stitch. For JIT nodes, the
+        changed links are synchronised with a single call into the 'node' library (see sync_c_links()).
+        """
+        if not self._stale:
+            return
+        with self.exclusive() as segments:
+            touched = []
+            prev_node = None
+            for segment in segments:
+                if len(segment) <= 0:
+                    continue
+                first = segment.nodes[0]
+                if first.prev is not prev_node:
+                    first.prev = prev_node
+                    touched.append(first)
+                if prev_node is not None and prev_node.next is not first:
+                    prev_node.next = first
+                    touched.append(prev_node)
+                prev_node = segment.nodes[-1]
+            if prev_node is not None and prev_node.next is not None:
+                prev_node.next = None
+                touched.append(prev_node)
+            if len(touched) > 0 and isinstance(touched[0], NodeJITBase):
+                sync_c_links(touched, data=False)
+            self._stale = False
+
+    # ==== access ==== #
+    def __len__(self):
+        return sum(len(segment) for segment in self._ordered_segments())
+
+    def __iter__(self):
+        return chain.from_iterable(list(segment.nodes) for segment in self._ordered_segments())
+
+    def __contains__(self, node):
+        if not isinstance(node, NodeBase) or node.id is None:
+            return False
+        return self.get_by_id(node.id) is node
+
+    def __getitem__(self, index):
+        segment, pos = self._locate(index)
+        return segment.nodes[pos]
+
+    def __delitem__(self, index):
+        self.pop(index)
+
+    def begin(self):
+        self.stitch()
+        for segment in self._ordered_segments():
+            if len(segment) > 0:
+                return segment.nodes[0]
+        return None
+
+    def end(self):
+        self.stitch()
+        for segment in reversed(self._ordered_segments()):
+            if len(segment) > 0:
+                return segment.nodes[-1]
+        return None
+
+    def bisect_id(self, id):
+        """
+        :param id: search node ID
+        :return: position of the first node with an ID not lower than 'id' (see NodeStorage.bisect_id())
+        """
+        number = int(id) >> self._segment_bits
+        segment = self._segments.get(number, None)
+        pos = self._offset(number)
+        if segment is not None:
+            pos += bisect_node_id(segment.nodes, id)
+        return pos
+
+    def bisect_left(self, value):
+        """
+        :param value: node or ID
+        :return: position of the first node with an ID not lower than the one of 'value'
+        """
+        return self.bisect_id(value.id if isinstance(value, NodeBase) else value)
+
+    def get_by_id(self, id):
+        """
+        :param id: search node ID
+        :return: node with that ID; None if there is no such node
+        """
+        segment = self._segment(id)
+        if segment is None:
+            return None
+        nodes = segment.nodes
+        pos = bisect_node_id(nodes, id)
+        if pos < len(nodes) and nodes[pos].id == id:
+            return nodes[pos]
+        return None
+
+    def index_range(self, start, stop):
+        self.stitch()
+        return super().index_range(start, stop)
+
+    def export_c(self, sub_chain=None):
+        self.stitch()
+        return super().export_c(sub_chain)
+
+    # ==== insertion ==== #
+    def add(self, val):
+        self.add_locate(val)
+
+    def add_locate(self, val):
+        """
+        Inserts a node (or creates a node for an ID or data object) at its sorted position in its segment and
+        links it, holding only the lock of that segment.
+        :param val: node, node ID (int) or data object
+        :return: tuple (prev_node, next_node, index) - the new neighbours of the node within its segment (None at
+                 the segment boundaries) and its position in the list
+        """
+        node = as_node(val, self.dtype)
+        segment = self._segment(node.id, create=True)
+        with segment.lock:
+            prev_node, next_node, index = segment.nodes.insert_locate(node)
+            node.link_between(prev_node, next_node)
+            if prev_node is None or next_node is None:
+                self._stale = True
+        return prev_node, next_node, self._offset(segment.number) + index
+
+    def append(self, val):
+        self.add(val)
+
+    def update(self, iterable):
+        """
+        Inserts a batch of nodes (or creates nodes for IDs or data objects): the batch is sorted once, and each
+        segment merges its share under its own lock (see update_linked()).
+        :param iterable: nodes, node IDs (int) or data objects
+        """
+        batch = sorted([as_node(val, self.dtype) for val in iterable], key=node_id)
+        for number, group in groupby(batch, key=lambda node: int(node.id) >> self._segment_bits):
+            group = list(group)
+            segment = self._segment(group[0].id, create=True)
+            with segment.lock:
+                update_linked(segment.nodes, group, self.dtype)
+                self._stale = True
+
+    def extend(self, iterable):
+        self.update(iterable)
+
+    def adopt_chain(self, nodes):
+        """
+        Indexes an already linked chain of nodes, sorted by ID (the nodes are not relinked). The list has to be
+        empty.
+        :param nodes: sequence of the nodes in chain order
+        """
+        assert self.__len__() == 0
+        for number, group in groupby(nodes, key=lambda node: int(node.id) >> self._segment_bits):
+            group = list(group)
+            segment = self._segment(group[0].id, create=True)
+            with segment.lock:
+                segment.nodes.reset(group)
+
+    # ==== splitting and joining ==== #
+    def split_at(self, id):
+        """
+        Splits the list before the first node with an ID not lower than 'id', under the locks of all segments:
+        the segments above the split move to a new list as they are, and the segment of 'id' is cut in two (see
+        LinkedList.split_linked()). The chains of both lists are stitched right away.
+        :param id: lowest node ID of the upper part
+        :return: tuple (lower list, upper list) - this list and the new one
+        """
+        other = type(self)(dtype=self.dtype, segment_bits=self._segment_bits)
+        number = int(id) >> self._segment_bits
+        with self.exclusive() as segments:
+            for segment in segments:
+                if segment.number < number:
+                    continue
+                upper = other._segment(segment.number << self._segment_bits, create=True)
+                if segment.number == number:
+                    upper.nodes.reset(split_linked(segment.nodes, bisect_node_id(segment.nodes, id)))
+                else:
+                    upper.nodes.reset(list(segment.nodes))
+                    segment.nodes.clear()
+            # -- emptied segments are dropped, so that the lower list does not walk over them -- #
+            for segment in segments:
+                if segment.number >= number and len(segment) <= 0:
+                    del self._segments[segment.number]
+            self._order = [n for n in self._order if n in self._segments]
+            self._stale = True
+        other._stale = True
+        self.stitch()
+        other.stitch()
+        return self, other
+
+    def concat(self, other):
+        """
+        Moves all nodes of another concurrent list (with the same segment size) into this one, under the locks of
+        all segments of both lists: each segment of the other list is merged into the segment of the same ID range
+        of this list (see LinkedList.update_linked()), or taken over as it is if this list has no such segment.
+        :param other: concurrent list of the same node class and segment size
+        :return: this list
+        """
+        assert other.dtype == self.dtype and other._segment_bits == self._segment_bits
+        with other.exclusive() as other_segments:
+            moved = [(segment.number, list(segment.nodes)) for segment in other_segments if len(segment) > 0]
+            for segment in other_segments:
+                segment.nodes.clear()
+            other._segments = {}
+            other._order = []
+            other._stale = False
+        for number, nodes in moved:
+            segment = self._segment(number << self._segment_bits, create=True)
+            with segment.lock:
+                # -- links that still lead into the other list's segments are replaced by stitch() -- #
+                if len(segment) <= 0:
+                    segment.nodes.reset(nodes)
+                else:
+                    update_linked(segment.nodes, nodes, self.dtype)
+                self._stale = True
+        self.stitch()
+        return self
+
+    # ==== removal ==== #
+    def _unlink_at(self, segment, pos):
+        """
+        Removes the node at position 'pos' of a (locked) segment and unlinks it within the segment.
+        :return: the removed node
+        """
+        nodes = segment.nodes
+        start = max(pos - 1, 0)
+        window = list(nodes[start:pos+2])
+        mask = np.zeros(len(window), dtype=np.bool_)
+        mask[pos - start] = True
+        unlink_masked(window, mask)
+        if pos == 0 or pos == len(nodes) - 1:
+            self._stale = True
+        return nodes.pop(pos)
+
+    def remove(self, node):
+        """
+        Removes (and unlinks) a node, holding only the lock of its segment.
+        :param node: node of the list
+        """
+        segment = self._segment(node.id)
+        if segment is None:
+            raise ValueError("{} not in ConcurrentRealList".format(node))
+        with segment.lock:
+            self._unlink_at(segment, segment.nodes.index(node))
+
+    def pop(self, idx=-1, deepcopy_elem=False):
+        """
+        Removes (and unlinks) the node at a position. As with RealList.pop(), the node is not destroyed but
+        returned - or, if 'deepcopy_elem' is set, a deep copy of it.
+        """
+        segment, pos = self._locate(idx)
+        with segment.lock:
+            result = deepcopy(segment.nodes[pos]) if deepcopy_elem else None
+            node = self._unlink_at(segment, pos)
+        return result if deepcopy_elem else node
+
+    def remove_many(self, indices_or_mask):
+        """
+        Removes the nodes at the given positions under the locks of all segments: each segment unlinks its share
+        in a single sweep (see unlink_masked()) and rebuilds its sorted storage once.
+        :param indices_or_mask: array (or list) of positions, or boolean mask over the list
+        :return: list of the removed (unlinked) nodes
+        """
+        victims = []
+        with self.exclusive() as segments:
+            mask = removal_mask(indices_or_mask, sum(len(segment) for segment in segments))
+            offset = 0
+            for segment in segments:
+                n = len(segment)
+                survivors, segment_victims = unlink_masked(list(segment.nodes), mask[offset:offset+n])
+                if len(segment_victims) > 0:
+                    segment.nodes.reset(survivors)
+                    victims.extend(segment_victims)
+                offset += n
+            if len(victims) > 0:
+                self._stale = True
+        return victims
+
+    def clear(self):
+        """
+        Removes all nodes and tears them down in one batch (see Node.teardown_nodes()); the segments are kept.
+        """
+        with self.exclusive() as segments:
+            nodes = list(chain.from_iterable(list(segment.nodes) for segment in segments))
+            for segment in segments:
+                segment.nodes.clear()
+            if len(nodes) > 0:
+                teardown_nodes(nodes)
+            self._stale = False
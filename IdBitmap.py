@@ -0,0 +1,170 @@
+import numpy as np
+
+
+class IdBitmap(object):
+    """
+    Paged bitmap over the (uint64) ID space handed out by package_globals.IdGenerator: one bit per possible ID,
+    in pages of 2^page_bits IDs (uint64 words) that are only allocated once an ID of their range is added. Hence,
+    membership tests are O(1) bit tests - without comparisons of nodes and without searching the sorted storage -
+    while the memory stays at 1 bit per ID of the occupied ID ranges.
+    """
+    _pages = {}
+    _page_bits = 16
+    _count = 0
+
+    def __init__(self, ids=None, page_bits=16):
+        """
+        :param ids: IDs to add initially
+        :param page_bits: log2 of the number of IDs per page (at least 6, i.e. one uint64 word)
+        """
+        assert page_bits >= 6
+        self._page_bits = page_bits
+        self._pages = {}
+        self._count = 0
+        if ids is not None:
+            self.add_many(ids)
+
+    def __len__(self):
+        return self._count
+
+    def _locate(self, id):
+        """
+        :return: tuple (page number, word index in the page, bit mask in the word) of an ID
+        """
+        id = int(id)
+        offset = id & ((1 << self._page_bits) - 1)
+        return id >> self._page_bits, offset >> 6, np.uint64(1 << (offset & 63))
+
+    def _locate_many(self, ids):
+        """
+        :return: tuple (page numbers, word indices, bit masks) of an array of IDs
+        """
+        ids = np.asarray(ids, dtype=np.uint64)
+        offsets = ids & np.uint64((1 << self._page_bits) - 1)
+        return ids >> np.uint64(self._page_bits), (offsets >> np.uint64(6)).astype(np.int64), np.left_shift(np.uint64(1), offsets & np.uint64(63))
+
+    def _new_page(self):
+        return np.zeros(1 << (self._page_bits - 6), dtype=np.uint64)
+
+    def __contains__(self, id):
+        page_no, word, mask = self._locate(id)
+        page = self._pages.get(page_no, None)
+        return page is not None and bool(page[word] & mask)
+
+    def add(self, id):
+        """
+        :param id: ID to add
+        :return: True if the ID has not been in the bitmap before
+        """
+        page_no, word, mask = self._locate(id)
+        page = self._pages.get(page_no, None)
+        if page is None:
+            page = self._pages[page_no] = self._new_page()
+        if page[word] & mask:
+            return False
+        page[word] |= mask
+        self._count += 1
+        return True
+
+    def discard(self, id):
+        """
+        :param id: ID to remove (if it is in the bitmap)
+        :return: True if the ID has been in the bitmap
+        """
+        page_no, word, mask = self._locate(id)
+        page = self._pages.get(page_no, None)
+        if page is None or not (page[word] & mask):
+            return False
+        page[word] &= ~mask
+        self._count -= 1
+        return True
+
+    def add_many(self, ids):
+        """
+        Adds a batch of IDs, with one vectorised update per touched page.
+        :param ids: array (or list) of IDs
+        """
+        ids = np.unique(np.asarray(ids, dtype=np.uint64))
+        if len(ids) <= 0:
+            return
+        page_nos, words, masks = self._locate_many(ids)
+        # -- the IDs are sorted, so each page's IDs form one contiguous run -- #
+        bounds = np.flatnonzero(np.diff(page_nos)) + 1
+        for start, stop in zip(np.concatenate(([0], bounds)).tolist(), np.concatenate((bounds, [len(ids)])).tolist()):
+            page_no = int(page_nos[start])
+            page = self._pages.get(page_no, None)
+            if page is None:
+                page = self._pages[page_no] = self._new_page()
+            self._count += int(np.count_nonzero((page[words[start:stop]] & masks[start:stop]) == 0))
+            np.bitwise_or.at(page, words[start:stop], masks[start:stop])
+
+    def discard_many(self, ids):
+        """
+        Removes a batch of IDs (the ones that are in the bitmap), with one vectorised update per touched page.
+        :param ids: array (or list) of IDs
+        """
+        ids = np.unique(np.asarray(ids, dtype=np.uint64))
+        if len(ids) <= 0:
+            return
+        page_nos, words, masks = self._locate_many(ids)
+        bounds = np.flatnonzero(np.diff(page_nos)) + 1
+        for start, stop in zip(np.concatenate(([0], bounds)).tolist(), np.concatenate((bounds, [len(ids)])).tolist()):
+            page = self._pages.get(int(page_nos[start]), None)
+            if page is None:
+                continue
+            self._count -= int(np.count_nonzero(page[words[start:stop]] & masks[start:stop]))
+            np.bitwise_and.at(page, words[start:stop], ~masks[start:stop])
+
+    def update(self, other):
+        """
+        Adds all IDs of another bitmap (with the same page size), OR-ing its pages into this one.
+        :param other: IdBitmap
+        """
+        assert other._page_bits == self._page_bits
+        for page_no, other_page in other._pages.items():
+            page = self._pages.get(page_no, None)
+            if page is None:
+                self._pages[page_no] = other_page.copy()
+                self._count += popcount(other_page)
+            else:
+                self._count -= popcount(page)
+                page |= other_page
+                self._count += popcount(page)
+
+    def split_off(self, id):
+        """
+        Moves the IDs not lower than 'id' into a new bitmap: whole pages are handed over, only the page that
+        contains 'id' is split.
+        :param id: lowest ID of the new bitmap
+        :return: IdBitmap
+        """
+        result = IdBitmap(page_bits=self._page_bits)
+        page_no, word, mask = self._locate(id)
+        below = mask - np.uint64(1)
+        for other_no in [p for p in self._pages.keys() if p >= page_no]:
+            if other_no == page_no:
+                page = self._pages[other_no]
+                upper = page.copy()
+                upper[:word] = 0
+                upper[word] &= ~below
+                page[word+1:] = 0
+                page[word] &= below
+            else:
+                upper = self._pages.pop(other_no)
+            result._pages[other_no] = upper
+            moved = popcount(upper)
+            result._count += moved
+            self._count -= moved
+        return result
+
+    def clear(self):
+        self._pages = {}
+        self._count = 0
+
+
+def popcount(words):
+    """
+    :param words: numpy array of uint64 words
+    :return: number of set bits
+    """
+    return int(np.unpackbits(words.view(np.uint8)).sum())
@@ -1,8 +1,280 @@
 from Node import *
 import package_globals
 from sortedcontainers import SortedList
+from OrderStatistic import SortedListBackend
+from NodeStorage import NodeStorage
+from bisect import bisect_left, bisect_right
+from itertools import chain, compress
+import numpy as np
 from copy import copy, deepcopy
 import gc
+import threading
+import weakref
+
+
+def as_node(val, dtype):
+    """
+    :param val: node, node ID (int) or data object
+    :param dtype: node class
+    :return: the node itself, or a new node of class 'dtype' for the given ID or data object
+    """
+    if isinstance(val, NodeBase):
+        assert type(val) == dtype
+        return val
+    elif isinstance(val, (int, np.integer)):
+        return dtype(id=int(val))
+    return dtype(data=val)
+
+
+def insert_linked(slist, node):
+    """
+    Inserts a node into a sorted storage of nodes (after any equal nodes, i.e. at its bisect_right() position) and
+    links it between its new neighbours. The storage reports the neighbours along with the insertion (see
+    OrderStatisticBackend.insert_locate()), so the insertion slot is located only once.
+    :param slist: order-statistic backend (or RealList) of nodes
+    :param node: node to insert
+    :return: tuple (prev_node, next_node, index) - the new neighbours of the node (None at the ends of the list)
+             and its position in the list
+    """
+    prev_node, next_node, index = slist.insert_locate(node)
+    node.link_between(prev_node, next_node)
+    return prev_node, next_node, index
+
+
+def node_id(node):
+    return node.id
+
+
+def relink_range(nodes, first, last):
+    """
+    Relinks the prev / next links of nodes[first..last] (and the links of the adjacent nodes towards that range)
+    according to their order in 'nodes', in a single sweep. For JIT nodes, the C-side links of the range are then
+    synchronised with a single call into the 'node' library (see sync_c_links()); the data pointers are unchanged.
+    :param nodes: list of nodes in the desired chain order
+    :param first: index of the first node to relink
+    :param last: index of the last node to relink
+    """
+    n = len(nodes)
+    prev_node = nodes[first-1] if first > 0 else None
+    for i in range(first, last+1):
+        node = nodes[i]
+        node.prev = prev_node
+        if prev_node is not None:
+            prev_node.next = node
+        prev_node = node
+    next_node = nodes[last+1] if last+1 < n else None
+    prev_node.next = next_node
+    if next_node is not None:
+        next_node.prev = prev_node
+    if isinstance(nodes[first], NodeJITBase):
+        sync_c_links(nodes[max(first-1, 0):last+2], data=False)
+
+
+def update_linked(slist, iterable, dtype):
+    """
+    Bulk insertion into a sorted storage of nodes: the batch is sorted once by ID and merged with the nodes of the
+    list in O(n + k) (a stable sort of two sorted runs), then the merged range is relinked in a single sweep (see
+    relink_range()) and the sorted storage is rebuilt once. Equal IDs are placed after the nodes that are already
+    in the list, as with single insertions. Small batches (below a quarter of the list length) are inserted one
+    by one instead.
+    :param slist: order-statistic backend (or RealList) of nodes
+    :param iterable: nodes, node IDs (int) or data objects
+    :param dtype: node class of the list
+    """
+    batch = sorted([as_node(val, dtype) for val in iterable], key=node_id)
+    if len(batch) <= 0:
+        return
+    if len(batch) * 4 < len(slist):
+        for node in batch:
+            insert_linked(slist, node)
+        return
+    merged = list(slist)
+    merged.extend(batch)
+    merged.sort(key=node_id)
+    # -- only the range between the lowest and the highest new node changes its links -- #
+    first = bisect_left(merged, batch[0])
+    last = bisect_right(merged, batch[-1]) - 1
+    relink_range(merged, first, last)
+    slist.reset(merged)
+
+
+def removal_mask(indices_or_mask, n):
+    """
+    :param indices_or_mask: array (or list) of positions - negative ones count from the end - or boolean mask of
+                            length n
+    :param n: length of the list
+    :return: boolean mask of length n (True for the positions to remove)
+    """
+    # -- a list of Python bools is a mask as well (and must not be cast to the positions 0 and 1) -- #
+    indices_or_mask = np.asarray(indices_or_mask)
+    if indices_or_mask.dtype == np.bool_:
+        assert indices_or_mask.shape == (n,)
+        return indices_or_mask
+    mask = np.zeros(n, dtype=np.bool_)
+    mask[indices_or_mask.astype(np.int64)] = True
+    return mask
+
+
+def unlink_masked(nodes, mask):
+    """
+    Unlinks the masked nodes from their chain in a single sweep: each run of consecutive victims is bridged by
+    linking the surviving nodes around it, and the victims lose their links. For JIT nodes, the C-side links of
+    all touched nodes are synchronised with a single call into the 'node' library (see sync_c_links()).
+    :param nodes: list of nodes in chain order
+    :param mask: boolean mask over 'nodes' (True for the nodes to remove)
+    :return: tuple (survivors, victims) - lists of the remaining and of the removed nodes, in chain order
+    """
+    victim_indices = np.flatnonzero(mask)
+    if len(victim_indices) <= 0:
+        return nodes, []
+    n = len(nodes)
+    victims = [nodes[i] for i in victim_indices.tolist()]
+    survivors = list(compress(nodes, np.logical_not(mask).tolist()))
+    # -- first and last position of each run of consecutive victims -- #
+    breaks = np.diff(victim_indices) > 1
+    run_starts = victim_indices[np.concatenate(([True], breaks))].tolist()
+    run_ends = victim_indices[np.concatenate((breaks, [True]))].tolist()
+    touched = []
+    for first, last in zip(run_starts, run_ends):
+        prev_node = nodes[first-1] if first > 0 else None
+        next_node = nodes[last+1] if last+1 < n else None
+        if prev_node is not None:
+            prev_node.next = next_node
+            touched.append(prev_node)
+        if next_node is not None:
+            next_node.prev = prev_node
+            touched.append(next_node)
+    for node in victims:
+        node.prev = None
+        node.next = None
+    if isinstance(victims[0], NodeJITBase):
+        sync_c_links(touched + victims, data=False)
+    return survivors, victims
+
+
+def sorted_storage(node_list):
+    """
+    :param node_list: RealList or OrderedList
+    :return: the sorted storage of the list's nodes - the RealList itself, or the backend of the OrderedList
+    """
+    return node_list._list if isinstance(node_list, OrderedList) else node_list
+
+
+def split_linked(slist, index):
+    """
+    Cuts a sorted storage of nodes before position 'index': the nodes from there on are removed from the storage
+    (see OrderStatisticBackend.split_off()) and their run is detached from the chain in O(1) (see Node.splice()).
+    :param slist: order-statistic backend (or RealList) of nodes
+    :param index: position of the first node to cut off
+    :return: list of the cut-off nodes - a linked run of their own, in chain order
+    """
+    tail = slist.split_off(index)
+    if len(tail) > 0:
+        tail[0].splice(tail[-1], None, None)
+    return tail
+
+
+def insert_run_linked(slist, nodes, dtype):
+    """
+    Inserts a run of nodes, sorted by ID and detached from any other chain. If no node of the storage has an ID
+    within the run's ID range, the run is moved in as one block: the chain is relinked in O(1) (see Node.splice())
+    and the storage only cuts and appends its sublists (see OrderStatisticBackend.split_off() / append_sorted()).
+    Otherwise, the run is merged node by node (see update_linked()).
+    :param slist: order-statistic backend (or RealList) of nodes
+    :param nodes: list of the nodes of the run, in chain order
+    :param dtype: node class of the list
+    """
+    if len(nodes) <= 0:
+        return
+    first, last = nodes[0], nodes[-1]
+    # -- as with single insertions, the run goes behind any nodes with the same ID as its first node -- #
+    pos = slist.bisect_right(first)
+    if pos < len(slist) and not (last.id < slist[pos].id):
+        update_linked(slist, nodes, dtype)
+        return
+    prev_node = slist[pos-1] if pos > 0 else None
+    next_node = slist[pos] if pos < len(slist) else None
+    first.splice(last, prev_node, next_node)
+    tail = slist.split_off(pos)
+    slist.append_sorted(nodes + tail if len(tail) > 0 else nodes)
+
+
+class RealListSnapshot(object):
+    """
+    Copy-on-write snapshot of a RealList (see RealList.snapshot()), e.g. for an output writer thread that
+    serialises the particles of one time step while the next kernel step already runs on the live list.
+
+    The snapshot shares the sorted storage blocks (sublists) of the list: only the blocks that the live list
+    mutates afterwards are copied - by the live list, before its first change to them. The particle records are
+    shared as well, and copied into one structured array only once, by whichever side comes first: the reader
+    (records()) or the live side, right before it changes particle data (see RealList.materialize_snapshots();
+    the ParticleSet calls it before each kernel step, in __setitem__() and before nodes are recycled or torn down).
+
+    Contract: the list cannot see changes to the particle objects themselves. Code that changes particle data
+    directly (e.g. 'pset[i].data.lon = ...') while a snapshot is alive has to call materialize_snapshots() on the
+    list (or records() on the snapshot) before the change - otherwise the snapshot's records() show the new value.
+    """
+    _lists = []
+    _len = 0
+    _records = None
+    _lock = None
+
+    def __init__(self, lists, length):
+        """
+        :param lists: the list's sublists of nodes (shared, not copied)
+        :param length: number of nodes
+        """
+        self._lists = lists
+        self._len = length
+        self._records = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        """
+        :return: iterator over the nodes of the snapshot, in ID order (their particle data may already have changed
+                 if the snapshot has been materialised - use records() for the data)
+        """
+        return chain.from_iterable(self._lists)
+
+    @property
+    def materialized(self):
+        return self._records is not None
+
+    def materialize(self):
+        """
+        Copies the particle records of the snapshot's nodes into one structured array (once; thread-safe).
+        """
+        with self._lock:
+            if self._records is None:
+                self._records = gather_records(list(chain.from_iterable(self._lists)))
+
+    def records(self):
+        """
+        :return: structured array (of the particle type's dtype) with the particle records at snapshot time, in
+                 ID order
+        """
+        self.materialize()
+        return self._records
+
+
+def gather_records(nodes):
+    """
+    :param nodes: nodes with particle data
+    :return: structured array (of the particle type's dtype) with a copy of the nodes' particle records
+    """
+    particles = [node.data for node in nodes if node.data is not None]
+    if len(particles) <= 0:
+        return None
+    ptype = particles[0].getPType()
+    if ptype.uses_jit:
+        return np.concatenate([p.get_cptr() for p in particles])
+    records = np.zeros(len(particles), dtype=ptype.dtype)
+    for v in ptype.variables:
+        records[v.name] = [getattr(p, v.name) for p in particles]
+    return records
 
 
 # ========================== #
@@ -10,93 +282,217 @@ import gc
 # = overrides to the del() = #
 # = function won't work.   = #
 # ========================== #
-class RealList(SortedList):
+class RealList(SortedListBackend, NodeStorage):
     dtype = None
+    _snapshots = None
+    _shared = None
 
     def __init__(self, iterable=None, dtype=Node):
-        super(RealList, self).__init__(iterable)
+        super(RealList, self).__init__()
         self.dtype=dtype
+        # -- live snapshots, and the ids of the sublists shared with them (see snapshot()) -- #
+        self._snapshots = weakref.WeakSet()
+        self._shared = set()
+        if iterable is not None:
+            # -- SortedList.__init__() would insert the initial nodes without linking them -- #
+            self.update(iterable)
 
     def __del__(self):
         self.clear()
 
     def clear(self):
-        """Remove all the elements from the list."""
+        """
+        Remove all the elements from the list. The storage is dropped wholesale and the nodes are torn down in one
+        batch (see Node.teardown_nodes()) instead of being unlinked one by one.
+        """
         n = self.__len__()
         # print("# remaining items: {}".format(n))
         if n > 0:
             print("Deleting {} elements ...".format(n))
-            while (n > 0):
-                # val = self.pop(); del val
-                # super().__delitem__(n-1)
-                # self.pop()
-
-                self.__getitem__(-1).unlink()
-                self.__delitem__(-1)
-                n = self.__len__()
-                # print("Deleting {} elements ...".format(n))
+            self.materialize_snapshots()
+            nodes = list(chain.from_iterable(self._lists))
+            super()._clear()
+            teardown_nodes(nodes)
+            del nodes
         # gc.collect()
         super()._clear()
 
     def __new__(cls, iterable=None, key=None, load=1000, dtype=Node):
         return object.__new__(cls)
 
+    def begin(self):
+        return self._lists[0][0] if self._len > 0 else None
+
+    def end(self):
+        return self._lists[-1][-1] if self._len > 0 else None
+
+    # ==== copy-on-write snapshots ==== #
+    def snapshot(self):
+        """
+        Takes a copy-on-write snapshot of the list in O(n / load): only the list of sublists is copied, the
+        sublists and the particle records are shared until they are mutated (see RealListSnapshot). Particle data
+        must only be changed after materialize_snapshots() while the snapshot is alive.
+        :return: RealListSnapshot
+        """
+        result = RealListSnapshot(list(self._lists), self._len)
+        self._shared.update([id(sublist) for sublist in self._lists])
+        self._snapshots.add(result)
+        return result
+
+    def materialize_snapshots(self):
+        """
+        Lets all live snapshots copy their particle records - to be called before particle data is changed.
+        """
+        for snapshot in list(self._snapshots):
+            snapshot.materialize()
+
+    def _own(self, first, last):
+        """
+        Copies the sublists at the positions [first, last] that are still shared with a snapshot, before the list
+        changes them in place.
+        """
+        if len(self._snapshots) <= 0:
+            self._shared.clear()
+            return
+        for pos in range(max(first, 0), min(last, len(self._lists) - 1) + 1):
+            sublist = self._lists[pos]
+            if id(sublist) in self._shared:
+                self._shared.discard(id(sublist))
+                self._lists[pos] = list(sublist)
+
+    def insert_locate(self, value):
+        if len(self._shared) > 0 and len(self._maxes) > 0:
+            pos = bisect_right(self._maxes, value)
+            self._own(pos - 1 if pos == len(self._maxes) else pos, pos)
+        return super().insert_locate(value)
+
+    def _delete(self, pos, idx):
+        # -- deleting may merge the sublist with its predecessor (or successor, at the front) -- #
+        if len(self._shared) > 0:
+            self._own(pos - 1, pos + 1)
+        super()._delete(pos, idx)
+
+    def split_off(self, index):
+        if len(self._shared) > 0 and 0 <= index < self._len:
+            pos = self._pos(index)[0]
+            self._own(pos, pos)
+        return super().split_off(index)
+
     def add(self, val):
-        assert type(val)==self.dtype
-        if isinstance(val, Node):
-            n = self.__len__()
-            index = self.bisect_right(val)
-            if index < n:
-                next_node = self.__getitem__(index)
-            else:
-                next_node = None
-            if index > 0:
-                prev_node = self.__getitem__(index-1)
-            else:
-                prev_node = None
-            if next_node is not None:
-                next_node.set_prev(val)
-                val.set_next(next_node)
-            if prev_node is not None:
-                prev_node.set_next(val)
-                val.set_prev(prev_node)
-            super().add(val)
-        elif isinstance(val, int):
-            n = self.__len__()
-            index = self.bisect_right(val)
-            if index < n:
-                next_node = self.__getitem__(index)
-            else:
-                next_node = None
-            if index > 0:
-                prev_node = self.__getitem__(index-1)
-            else:
-                prev_node = None
-            new_node = self.dtype(prev=prev_node, next=next_node, id=val)
-            super().add(new_node)
-        else:
-            new_node = self.dtype(data=val)
-            super().add(new_node)
-            n = self.__len__()
-            index = self.index(new_node)
-            if index < (n-2):
-                next_node = self.__getitem__(index+1)
-            else:
-                next_node = None
-            if index > 0:
-                prev_node = self.__getitem__(index-1)
-            else:
-                prev_node = None
-            if next_node is not None:
-                next_node.set_prev(new_node)
-                new_node.set_next(next_node)
-            if prev_node is not None:
-                prev_node.set_next(new_node)
-                new_node.set_prev(prev_node)
+        self.add_locate(val)
+
+    def add_locate(self, val):
+        """
+        Inserts a node (or creates a node for an ID or data object) at its sorted position and links it between
+        its new neighbours, locating the insertion slot only once (see insert_linked()).
+        :param val: node, node ID (int) or data object
+        :return: tuple (prev_node, next_node, index) - the new neighbours of the node and its position in the list
+        """
+        return insert_linked(self, as_node(val, self.dtype))
 
     def append(self, val):
         self.add(val)
 
+    def update(self, iterable):
+        """
+        Inserts a batch of nodes (or creates nodes for IDs or data objects) with one sort, one merge and one
+        linking pass (see update_linked()).
+        :param iterable: nodes, node IDs (int) or data objects
+        """
+        update_linked(self, iterable, self.dtype)
+
+    def extend(self, iterable):
+        self.update(iterable)
+
+    def remove_many(self, indices_or_mask):
+        """
+        Removes the nodes at the given positions in a single linear pass: all of them are unlinked from the chain
+        in one sweep (see unlink_masked()) and the sorted storage is rebuilt once. As with pop(), the removed
+        nodes are not destroyed but returned.
+        :param indices_or_mask: array (or list) of positions, or boolean mask over the list
+        :return: list of the removed (unlinked) nodes
+        """
+        nodes = list(chain.from_iterable(self._lists))
+        survivors, victims = unlink_masked(nodes, removal_mask(indices_or_mask, len(nodes)))
+        if len(victims) > 0:
+            self.reset(survivors)
+        return victims
+
+    def adopt_chain(self, nodes):
+        """
+        Indexes an already linked chain of nodes, sorted by ID, in a single pass (the nodes are not relinked).
+        The list has to be empty.
+        :param nodes: sequence of the nodes in chain order
+        """
+        assert self.__len__() == 0
+        self.reset(list(nodes))
+
+    def split_at(self, id):
+        """
+        Splits the list before the first node with an ID not lower than 'id': this list keeps the lower nodes, the
+        others move to a new list of the same kind. The chain is cut in O(1) (see split_linked()).
+        :param id: lowest node ID of the upper part
+        :return: tuple (lower list, upper list) - this list and the new one
+        """
+        other = type(self)(dtype=self.dtype)
+        nodes = split_linked(self, self.bisect_id(id))
+        other.append_sorted(nodes)
+        return self, other
+
+    def concat(self, other):
+        """
+        Moves all nodes of another list into this one (the other list is empty afterwards). If the two ID ranges
+        do not interleave, the chains are joined in O(1) and the sorted storage only appends or cuts sublists
+        (see insert_run_linked()); otherwise, the nodes are merged.
+        :param other: list of the same node class
+        :return: this list
+        """
+        assert other.dtype == self.dtype
+        nodes = split_linked(sorted_storage(other), 0)
+        insert_run_linked(self, nodes, self.dtype)
+        return self
+
+    def splice(self, source, sub_chain):
+        """
+        Moves a run of nodes (see Node.SubChain, e.g. from NodeStorage.id_range()) out of another list into this
+        one. The source chain is bridged over the run in O(1), and the run is inserted as in concat().
+        :param source: list that holds the nodes of the run
+        :param sub_chain: SubChain descriptor of the run
+        :return: this list
+        """
+        if len(sub_chain) <= 0:
+            return self
+        start = source.bisect_id(sub_chain.first.id)
+        nodes = split_linked(sorted_storage(source), start)
+        rest = nodes[sub_chain.count:]
+        nodes = nodes[:sub_chain.count]
+        assert nodes[-1] is sub_chain.last
+        if len(rest) > 0:
+            # -- detach the run from the rest and put the rest back behind the cut -- #
+            rest[0].splice(rest[-1], source.end(), None)
+            sorted_storage(source).append_sorted(rest)
+        insert_run_linked(self, nodes, self.dtype)
+        return self
+
+    def remove(self, node):
+        """
+        Removes (and detaches) a node of this list; the node itself is not destroyed - a JIT node stays registered
+        with the 'node' library until it is torn down, so that it can be added again.
+        :param node: node to remove
+        """
+        super().remove(node)
+        node.detach()
+
+    def __delitem__(self, index):
+        """
+        Removes (and detaches) the node at a position, or the nodes of a slice.
+        :param index: position or slice
+        """
+        nodes = self.__getitem__(index)
+        super().__delitem__(index)
+        for node in (nodes if isinstance(index, slice) else [nodes]):
+            node.detach()
+
     def pop(self, idx=-1, deepcopy_elem=False):
         """
         Because we expect the return node to be of use,
@@ -120,11 +516,21 @@ class RealList(SortedList):
 
 
 
-class OrderedList(object):
+class OrderedList(NodeStorage):
+    """
+    Sorted list of linked nodes on top of an exchangeable order-statistic backend (see OrderStatistic): the
+    default SortedListBackend behaves like RealList, while e.g. BPlusTreeList keeps per-node counts so that
+    positional access never has to rebuild an index after insertions and deletions.
+    """
     _list = None
     dtype = None
 
-    def __init__(self, iterable=None, dtype=Node):
+    def __init__(self, iterable=None, dtype=Node, backend=SortedListBackend):
+        """
+        :param iterable: nodes to add initially
+        :param dtype: node class of the list
+        :param backend: order-statistic backend class (see OrderStatistic.OrderStatisticBackend)
+        """
         self.dtype=dtype
         if isinstance(iterable, dict):
             iterable = None
@@ -134,22 +540,17 @@ class OrderedList(object):
                 assert isinstance(iterable[0], self.dtype)
             except AssertionError:
                 iterable = None
-        self._list = SortedList(iterable)
+        self._list = backend()
+        if iterable is not None:
+            # -- bulk-load and link the initial nodes (see update_linked()) -- #
+            self.update(iterable)
 
     def __del__(self):
         n = len(self._list)
         # print("# remaining items: {}".format(n))
         if n > 0:
             print("Deleting {} elements ...".format(n))
-            while (n > 0):
-                # val = self.pop(); del val
-                # super().__delitem__(n-1)
-                # self.pop()
-                item = self._list[-1]
-                item.unlink()
-                del self._list[-1]
-                n = len(self._list)
-                # print("Deleting {} elements ...".format(n))
+            self.clear()
         #gc.collect()
         del self._list
 
@@ -159,59 +560,106 @@ class OrderedList(object):
         :param other: new insertion object (e.g. Node)
         :return: this object
         """
-        assert type(other)==self.dtype
-        if isinstance(other, Node):
-            n = len(self._list)
-            index = self._list.bisect_right(other)  # .bisect_right(val) || .index(other)
-            if index < n:
-                next_node = self._list[index]
-            else:
-                next_node = None
-            if index > 0:
-                prev_node = self._list[index-1]
-            else:
-                prev_node = None
-            if next_node is not None:
-                next_node.set_prev(other)
-                other.set_next(next_node)
-            if prev_node is not None:
-                prev_node.set_next(other)
-                other.set_prev(prev_node)
-            self._list.add(other)
-        elif isinstance(other, int):
-            n = len(self._list)
-            index = self._list.bisect_right(other)
-            if index < n:
-                next_node = self._list[index]
-            else:
-                next_node = None
-            if index > 0:
-                prev_node = self._list[index-1]
-            else:
-                prev_node = None
-            new_node = self.dtype(prev=prev_node, next=next_node, id=other)
-            self._list.add(new_node)
-        else:
-            new_node = self.dtype(data=other)
-            self._list.add(new_node)
-            n = len(self._list)
-            index = self._list.index(new_node)
-            if index < (n-2):
-                next_node = self._list[index+1]
-            else:
-                next_node = None
-            if index > 0:
-                prev_node = self._list[index-1]
-            else:
-                prev_node = None
-            if next_node is not None:
-                next_node.set_prev(new_node)
-                new_node.set_next(next_node)
-            if prev_node is not None:
-                prev_node.set_next(new_node)
-                new_node.set_prev(prev_node)
+        self.add_locate(other)
         return self
 
+    def add(self, other):
+        self.add_locate(other)
+
+    def add_locate(self, other):
+        """
+        Inserts a node (or creates a node for an ID or data object) at its sorted position and links it between
+        its new neighbours, locating the insertion slot only once (see insert_linked()).
+        :param other: new insertion object (node, node ID or data object)
+        :return: tuple (prev_node, next_node, index) - the new neighbours of the node and its position in the list
+        """
+        return insert_linked(self._list, as_node(other, self.dtype))
+
+    def update(self, iterable):
+        """
+        Inserts a batch of nodes (or creates nodes for IDs or data objects) with one sort, one merge and one
+        linking pass (see update_linked()).
+        :param iterable: nodes, node IDs (int) or data objects
+        """
+        update_linked(self._list, iterable, self.dtype)
+
+    def extend(self, iterable):
+        self.update(iterable)
+
+    def remove_many(self, indices_or_mask):
+        """
+        Removes the nodes at the given positions in a single linear pass (see RealList.remove_many()).
+        :param indices_or_mask: array (or list) of positions, or boolean mask over the list
+        :return: list of the removed (unlinked) nodes
+        """
+        nodes = list(self._list)
+        survivors, victims = unlink_masked(nodes, removal_mask(indices_or_mask, len(nodes)))
+        if len(victims) > 0:
+            self._list.reset(survivors)
+        return victims
+
+    def adopt_chain(self, nodes):
+        """
+        Indexes an already linked chain of nodes, sorted by ID, in a single pass (the nodes are not relinked).
+        The list has to be empty.
+        :param nodes: sequence of the nodes in chain order
+        """
+        assert len(self._list) == 0
+        self._list.reset(list(nodes))
+
+    def split_at(self, id):
+        """
+        Splits the list before the first node with an ID not lower than 'id': this list keeps the lower nodes, the
+        others move to a new list of the same kind. The chain is cut in O(1) (see split_linked()).
+        :param id: lowest node ID of the upper part
+        :return: tuple (lower list, upper list) - this list and the new one
+        """
+        other = type(self)(dtype=self.dtype, backend=type(self._list))
+        nodes = split_linked(self._list, self.bisect_id(id))
+        other._list.append_sorted(nodes)
+        return self, other
+
+    def concat(self, other):
+        """
+        Moves all nodes of another list into this one (the other list is empty afterwards). If the two ID ranges
+        do not interleave, the chains are joined in O(1) and the sorted storage only appends or cuts sublists
+        (see insert_run_linked()); otherwise, the nodes are merged.
+        :param other: list of the same node class
+        :return: this list
+        """
+        assert other.dtype == self.dtype
+        nodes = split_linked(sorted_storage(other), 0)
+        insert_run_linked(self._list, nodes, self.dtype)
+        return self
+
+    def splice(self, source, sub_chain):
+        """
+        Moves a run of nodes (see Node.SubChain, e.g. from NodeStorage.id_range()) out of another list into this
+        one. The source chain is bridged over the run in O(1), and the run is inserted as in concat().
+        :param source: list that holds the nodes of the run
+        :param sub_chain: SubChain descriptor of the run
+        :return: this list
+        """
+        if len(sub_chain) <= 0:
+            return self
+        start = source.bisect_id(sub_chain.first.id)
+        nodes = split_linked(sorted_storage(source), start)
+        rest = nodes[sub_chain.count:]
+        nodes = nodes[:sub_chain.count]
+        assert nodes[-1] is sub_chain.last
+        if len(rest) > 0:
+            # -- detach the run from the rest and put the rest back behind the cut -- #
+            rest[0].splice(rest[-1], source.end(), None)
+            sorted_storage(source).append_sorted(rest)
+        insert_run_linked(self._list, nodes, self.dtype)
+        return self
+
+    def bisect_left(self, value):
+        return self._list.bisect_left(value)
+
+    def bisect_right(self, value):
+        return self._list.bisect_right(value)
+
     def __iadd__(self, other):
         """
         In-place addition (as syntactical)
@@ -223,16 +671,31 @@ class OrderedList(object):
     def __len__(self):
         return len(self._list)
 
+    def __iter__(self):
+        return iter(self._list)
+
+    def begin(self):
+        return self._list[0] if len(self._list) > 0 else None
+
+    def end(self):
+        return self._list[-1] if len(self._list) > 0 else None
+
+    def __contains__(self, other):
+        return other in self._list
+
     def __delitem__(self, order_element):
-        if isinstance(order_element, int):
+        if isinstance(order_element, (int, np.integer)):
             index = order_element
         else:
             try:
                 index = self._list.index(order_element)
             except ValueError:
-                err_msg = "Requested object {} not part of OrderedList.".format(other)
+                err_msg = "Requested object {} not part of OrderedList.".format(order_element)
                 raise IndexError(err_msg)
+        node = self._list[index]
         del self._list[index]
+        # -- the node leaves the chain as well (it is not destroyed, see pop()) -- #
+        node.detach()
 
 
     def __index__(self, other):
@@ -243,8 +706,8 @@ class OrderedList(object):
             raise IndexError(err_msg)
         return index
 
-    def pop(self):
-        self.pop_back()
+    def pop(self, idx=-1, deepcopy_elem=False):
+        return self._popitem_internal_(idx, deepcopy_elem)
 
     def popitem(self, index):
         n = len(self._list)
@@ -289,7 +752,7 @@ class OrderedList(object):
         self.__delitem__(other)
 
     def __getitem__(self, order_element):
-        if isinstance(order_element, int):
+        if isinstance(order_element, (int, np.integer)):
             index = order_element
         else:
             try:
@@ -303,128 +766,257 @@ class OrderedList(object):
         return self.__getitem__(order_element)
 
     def clear(self):
+        """
+        Remove all the elements from the list. The storage is dropped wholesale and the nodes are torn down in one
+        batch (see Node.teardown_nodes()) instead of being unlinked one by one.
+        """
         n = len(self._list)
         # print("# remaining items: {}".format(n))
         if n > 0:
             # print("Deleting {} elements ...".format(n))
-            while (n > 0):
-                self._list[-1].unlink()
-                del self._list[-1]
-                n = len(self._list)
-                # print("Deleting {} elements ...".format(n))
+            nodes = list(self._list)
+            self._list.clear()
+            teardown_nodes(nodes)
+            del nodes
 
 
 
 
 class DoubleLinkedList(object):
+    """
+    Doubly linked list of nodes with an ID -> node hash index. The chain runs from 'tail' (first node) to 'head'
+    (last node); both ends are kept, so that lookups by ID, insertion before or after a given node, insertion at
+    either end and deletion all take O(1). By default, insert() appends at the head, i.e. the chain keeps the
+    insertion order - a lean alternative to the SortedList-backed lists when no global order is needed.
+    In sorted mode, insert() places each node at its ID position instead: a SortedList of the IDs is bisected for
+    the neighbour's ID, which is then resolved to the neighbour node via the hash index. Keeping the IDs sorted
+    makes insertion and deletion O(log n) in this mode.
+    """
     tail = None
     head = None
-    nodeType = type(Node)
+    nodeType = Node
     n_elem = 0
+    _index = {}
+    _keys = None
 
-    def __init__(self, nodeType=None):
+    def __init__(self, node=None, nodeType=None, sorted=False):
+        """
+        :param node: node (of an existing chain) to take over, together with all nodes linked to it
+        :param nodeType: node class of the list; defaults to the class of 'node' (or Node)
+        :param sorted: if True, insert() keeps the nodes sorted by ID (the chain of 'node' has to be sorted)
+        """
+        self.tail = None
+        self.head = None
         self.n_elem = 0
-        if nodeType is None:
-            self.nodeType = type(Node)
+        self._index = {}
+        self._keys = SortedList() if sorted else None
+        if nodeType is not None:
+            self.nodeType = nodeType
+        elif node is not None:
+            self.nodeType = type(node)
         else:
-            self.nodeType = type(nodeType)
+            self.nodeType = Node
+        if node is not None:
+            assert isinstance(node, NodeBase)
+            while node.prev is not None:
+                node = node.prev
+            self.tail = node
+            for c_node in NodeCursor(node):
+                self._add_index(c_node)
+                self.head = c_node
 
-    def __init__(self, node):
-        self.n_elem = 0
-        assert(node is not None)
-        assert(isinstance(node, Node))
-        self.tail = node
-        p_node = None
-        c_node = self.tail
-        while c_node is not None:
-            p_node = c_node
-            c_node = c_node.next
-        self.head = p_node
-        self.n_elem += 1
-        self.nodeType = type(node)
+    def __del__(self):
+        self.clear()
 
     def __len__(self):
         return self.n_elem
 
+    def __iter__(self):
+        return NodeCursor(self.tail)
+
+    def __reversed__(self):
+        return NodeCursor(self.head, backward=True)
+
+    def __contains__(self, value):
+        if isinstance(value, NodeBase):
+            return self._index.get(value.id, None) is value
+        return value in self._index
+
+    @property
+    def sorted(self):
+        return self._keys is not None
+
+    def begin(self):
+        return self.tail
+
+    def end(self):
+        return self.head
+
     def traverse(self):
-        pass
+        """
+        :return: forward cursor over the nodes, from tail to head
+        """
+        return NodeCursor(self.tail)
+
+    def _add_index(self, node):
+        if node.id is None or node.id in self._index:
+            raise ValueError("node ID {} is not unique in DoubleLinkedList".format(node.id))
+        self._index[node.id] = node
+        if self._keys is not None:
+            self._keys.add(node.id)
+        self.n_elem += 1
+
+    def _remove_index(self, node):
+        del self._index[node.id]
+        if self._keys is not None:
+            self._keys.remove(node.id)
+        self.n_elem -= 1
 
     def get(self, value):
-        if isinstance(value, int):
-            return self.get_by_id(value)
+        if isinstance(value, (int, np.integer)):
+            return self.get_by_id(int(value))
         else:
             return self.get_by_data(value)
 
     def get_by_data(self, node_data):
-        c_node = self.tail
-        while c_node != None and c_node.data != node_data:
-            c_node = c_node.next
-        return c_node
+        """
+        Linear search (data objects are not indexed).
+        :param node_data: data object
+        :return: first node holding that data; None if there is no such node
+        """
+        for c_node in NodeCursor(self.tail):
+            if c_node.data is node_data:
+                return c_node
+        return None
 
     def get_by_id(self, node_id):
-        c_node = self.tail
-        while c_node != None and c_node.id != node_id:
-            c_node = c_node.next
-        return c_node
+        """
+        :param node_id: search node ID
+        :return: node with that ID; None if there is no such node
+        """
+        return self._index.get(node_id, None)
 
     def insert(self, value):
-        if isinstance(value, Node):
-            self.insert_node(value)
-        elif isinstance(value, int):
-            node = self.nodeType(id=package_globals.idgen.nextID(), data=value)
-            self.insert_node(node)
-        else:
-            TypeError("'value' not accepted type (type='{}')".format(type(value)))
+        """
+        Inserts a node (or creates a node for an ID or data object): at its ID position in sorted mode, otherwise
+        at the head of the list.
+        :param value: node, node ID (int) or data object
+        :return: inserted node
+        """
+        node = as_node(value, self.nodeType)
+        if self._keys is not None:
+            return self.insert_sorted(node)
+        return self.push_back(node)
 
     def insert_node(self, node):
-        skip = False
+        return self.insert(node)
+
+    def insert_sorted(self, node):
+        """
+        Inserts a node at its ID position (sorted mode only).
+        :param node: node to insert
+        :return: inserted node
+        """
+        assert self._keys is not None
+        if self.head is None or self.head.id < node.id:
+            return self.push_back(node)
+        if node.id < self.tail.id:
+            return self.push_front(node)
+        # -- the first node with a higher ID, looked up via the sorted IDs and the hash index -- #
+        next_node = self._index[self._keys[self._keys.bisect_right(node.id)]]
+        return self.insert_before(next_node, node)
+
+    def push_back(self, value):
+        """
+        :param value: node, node ID (int) or data object to insert behind the head
+        :return: inserted node
+        """
+        node = as_node(value, self.nodeType)
+        if self._keys is not None and self.head is not None:
+            assert self.head.id < node.id
+        self._add_index(node)
+        node.link_between(self.head, None)
+        self.head = node
         if self.tail is None:
             self.tail = node
-            skip = True
+        return node
+
+    def push_front(self, value):
+        """
+        :param value: node, node ID (int) or data object to insert before the tail
+        :return: inserted node
+        """
+        node = as_node(value, self.nodeType)
+        if self._keys is not None and self.tail is not None:
+            assert node.id < self.tail.id
+        self._add_index(node)
+        node.link_between(None, self.tail)
+        self.tail = node
         if self.head is None:
             self.head = node
-            skip = True
-        if skip:
-            return
-        c_node = self.tail
-        while c_node != None and c_node < node:
-            c_node = c_node.next
+        return node
 
-        if c_node == self.tail:
-            self.tail = node
-
-        if c_node is None:
-            node.prev = self.head
-            self.head.next = node
+    def insert_after(self, ref_node, value):
+        """
+        :param ref_node: node of this list
+        :param value: node, node ID (int) or data object to insert right after 'ref_node'
+        :return: inserted node
+        """
+        node = as_node(value, self.nodeType)
+        self._add_index(node)
+        node.link_between(ref_node, ref_node.next)
+        if ref_node is self.head:
             self.head = node
-        else:
-            node.prev = c_node.prev
-            node.next = c_node
-            c_node.prev = node
-        self.n_elem += 1
+        return node
+
+    def insert_before(self, ref_node, value):
+        """
+        :param ref_node: node of this list
+        :param value: node, node ID (int) or data object to insert right before 'ref_node'
+        :return: inserted node
+        """
+        node = as_node(value, self.nodeType)
+        self._add_index(node)
+        node.link_between(ref_node.prev, ref_node)
+        if ref_node is self.tail:
+            self.tail = node
+        return node
 
     def delete(self, value):
-        if isinstance(value, Node):
-            if value == self.tail:
-                self.tail = self.tail.next
-            elif value == self.head:
-                self.head = self.head.prev
-            del value
-            self.n_elem -= 1
-        elif isinstance(value, int):
-            self.delete_by_id(value)
-        else:
-            return
+        """
+        Removes a node (given as node or ID) from the list and unlinks it.
+        :param value: node or node ID
+        :return: removed node; None if there is no such node in the list
+        """
+        node = self.get_by_id(int(value)) if isinstance(value, (int, np.integer)) else value
+        if node is None or not isinstance(node, NodeBase) or self._index.get(node.id, None) is not node:
+            return None
+        if node is self.tail:
+            self.tail = node.next
+        if node is self.head:
+            self.head = node.prev
+        self._remove_index(node)
+        node.detach()
+        return node
 
     def delete_by_id(self, id):
-        c_node = self.tail
-        while c_node != None and c_node.id != id:
-            c_node = c_node.next
-
-        if c_node == self.tail:
-            self.tail = self.tail.next
-        elif c_node == self.head:
-            self.head = self.head.prev
-        if c_node is not None:
-            del c_node
-        self.n_elem -= 1
\ No newline at end of file
+        return self.delete(id)
+
+    def pop_front(self):
+        return self.delete(self.tail) if self.tail is not None else None
+
+    def pop_back(self):
+        return self.delete(self.head) if self.head is not None else None
+
+    def clear(self):
+        """Remove all the elements from the list (bulk teardown of the nodes, see Node.teardown_nodes())."""
+        if self.n_elem > 0:
+            nodes = list(NodeCursor(self.tail))
+            self.tail = None
+            self.head = None
+            self._index = {}
+            if self._keys is not None:
+                self._keys.clear()
+            self.n_elem = 0
+            teardown_nodes(nodes)
+            del nodes
@@ -5,20 +5,22 @@ from wrapping import *
 
 from particle import JITParticle, ScipyParticle
 
-class Node(object):
-    prev = None
-    next = None
-    id   = None
-    data = None
+class NodeBase(object):
+    """
+    Common behaviour of all node classes. The base class itself holds no state (empty __slots__), so that the
+    concrete node classes can either keep their attributes in a per-instance __dict__ (Node, NodeJITBase) or in
+    fixed slots (CompactNode, CompactNodeJIT).
+    """
+    __slots__ = ()
 
     def __init__(self, prev=None, next=None, id=None, data=None):
         if prev is not None:
-            assert (isinstance(prev, Node))
+            assert (isinstance(prev, NodeBase))
             self.prev = prev
         else:
             self.prev = None
         if next is not None:
-            assert (isinstance(next, Node))
+            assert (isinstance(next, NodeBase))
             self.next = next
         else:
             self.next = None
@@ -47,7 +49,8 @@ class Node(object):
         # self.prev = None
         # self.next = None
         del self.data
-        package_globals.idgen.releaseID(self.id)
+        if self.id is not None:
+            package_globals.idgen.releaseID(self.id)
 
     def unlink(self):
         # print("Node.unlink() [id={}] is called.".format(self.id))
@@ -58,13 +61,57 @@ class Node(object):
         self.prev = None
         self.next = None
 
-    def __iter__(self):
-        return self
+    def detach(self):
+        """
+        Removes this node from its chain (linking its neighbours to each other), but - other than unlink() - keeps
+        any external resources of the node (e.g. the C library registration of JIT nodes), so that the node can be
+        re-used (see NodePool).
+        """
+        if self.prev is not None:
+            self.prev.next = self.next
+        if self.next is not None:
+            self.next.prev = self.prev
+        self.prev = None
+        self.next = None
 
-    def __next__(self):
-        if self.next is None:
-            raise StopIteration
-        return self.next
+    def link_between(self, prev, next):
+        """
+        Inserts this node between 'prev' and 'next' (either of which may be None), linking both directions.
+        :param prev: new predecessor node
+        :param next: new successor node
+        """
+        self.prev = prev
+        self.next = next
+        if prev is not None:
+            prev.next = self
+        if next is not None:
+            next.prev = self
+
+    def splice(self, last, prev, next):
+        """
+        Moves the sub-chain [self, ..., last] from its current chain to the position between 'prev' and 'next'.
+        :param last: last node of the sub-chain that starts with this node
+        :param prev: new predecessor of the sub-chain (may be None)
+        :param next: new successor of the sub-chain (may be None)
+        """
+        before_first = self.prev
+        after_last = last.next
+        if before_first is not None:
+            before_first.next = after_last
+        if after_last is not None:
+            after_last.prev = before_first
+        self.prev = prev
+        last.next = next
+        if prev is not None:
+            prev.next = self
+        if next is not None:
+            next.prev = last
+
+    def __iter__(self):
+        """
+        :return: forward cursor over the chain, starting with (and including) this node
+        """
+        return NodeCursor(self)
 
     def __eq__(self, other):
         if type(self) is not type(other):
@@ -118,7 +165,11 @@ class Node(object):
         return "Node(p: {}, n: {}, id: {}, d: {})".format(repr(self.prev), repr(self.next), self.id, repr(self.data))
 
     def __sizeof__(self):
-        obj_size = sys.getsizeof(object)+sys.getsizeof(object)+sys.getsizeof(self.id)
+        # -- the node object itself, its attribute dictionary (if any), the ID and the attached data -- #
+        obj_size = object.__sizeof__(self)
+        if hasattr(self, '__dict__'):
+            obj_size += sys.getsizeof(self.__dict__)
+        obj_size += sys.getsizeof(self.id)
         if self.data is not None:
             obj_size += sys.getsizeof(self.data)
         return obj_size
@@ -133,12 +184,320 @@ class Node(object):
         self.data = data
 
 
+class NodeCursor(object):
+    """
+    Cursor over a linked chain of nodes. It starts at any node of the chain, moves forward (along 'next') or
+    backward (along 'prev'), and returns either the nodes themselves or their payload (node.data).
+    Besides single-step iteration, the cursor hands out batches of up to N items at a time (next_batch(),
+    batches()), so that consumers can process a plain Python list per batch instead of following the links
+    one item at a time.
+
+    The cursor always points at the next node to be returned. Removing the nodes that have already been returned
+    is safe; the node the cursor points at must not be removed while iterating.
+    """
+    _node = None
+    _backward = False
+    _payload = False
+
+    def __init__(self, node, backward=False, payload=False):
+        """
+        :param node: first node to be returned (None for an empty chain)
+        :param backward: if True, the cursor moves along 'prev' instead of 'next'
+        :param payload: if True, the cursor returns node.data instead of the node
+        """
+        assert node is None or isinstance(node, NodeBase)
+        self._node = node
+        self._backward = backward
+        self._payload = payload
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        node = self._node
+        if node is None:
+            raise StopIteration
+        self._node = node.prev if self._backward else node.next
+        return node.data if self._payload else node
+
+    @property
+    def node(self):
+        """
+        :return: node the cursor currently points at (the next node to be returned); None if it is exhausted
+        """
+        return self._node
+
+    @property
+    def backward(self):
+        return self._backward
+
+    def exhausted(self):
+        return self._node is None
+
+    def reversed(self):
+        """
+        :return: new cursor that starts at the current position and moves in the opposite direction
+        """
+        return NodeCursor(self._node, backward=not self._backward, payload=self._payload)
+
+    def next_batch(self, batch_size):
+        """
+        :param batch_size: maximum number of items in the batch
+        :return: list of up to 'batch_size' items (nodes or payloads); an empty list if the cursor is exhausted
+        """
+        batch = []
+        node = self._node
+        # -- separate loops per direction and payload type, to keep the per-item work minimal -- #
+        if self._backward:
+            if self._payload:
+                while node is not None and len(batch) < batch_size:
+                    batch.append(node.data)
+                    node = node.prev
+            else:
+                while node is not None and len(batch) < batch_size:
+                    batch.append(node)
+                    node = node.prev
+        else:
+            if self._payload:
+                while node is not None and len(batch) < batch_size:
+                    batch.append(node.data)
+                    node = node.next
+            else:
+                while node is not None and len(batch) < batch_size:
+                    batch.append(node)
+                    node = node.next
+        self._node = node
+        return batch
+
+    def batches(self, batch_size):
+        """
+        Generator over the remaining chain in batches.
+        :param batch_size: maximum number of items per batch
+        :return: lists of up to 'batch_size' items (nodes or payloads)
+        """
+        assert batch_size > 0
+        while self._node is not None:
+            yield self.next_batch(batch_size)
+
+
+class SubChain(object):
+    """
+    Lightweight descriptor of a contiguous run of a node chain: its first node, its last node and the number of
+    nodes in between (both ends included). It holds no list of the nodes, so that e.g. contiguous ID blocks of a
+    ParticleSet (see ParticleSet.id_range() / index_range()) can be handed to the Python and the compiled particle
+    loops for partitioned processing. The descriptor is only valid as long as no node of the run is removed.
+    """
+    first = None
+    last = None
+    count = 0
+
+    def __init__(self, first=None, last=None, count=0):
+        """
+        :param first: first node of the run (None for an empty run)
+        :param last: last node of the run (None for an empty run)
+        :param count: number of nodes of the run
+        """
+        assert (first is None) == (last is None) == (count <= 0)
+        self.first = first
+        self.last = last
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return self.cursor()
+
+    def __repr__(self):
+        return "SubChain(first={}, last={}, count={})".format(None if self.first is None else self.first.id,
+                                                            None if self.last is None else self.last.id, self.count)
+
+    def cursor(self, payload=False):
+        """
+        :param payload: if True, the iterator returns node.data instead of the nodes
+        :return: iterator over the nodes (or payloads) of the run, in chain order
+        """
+        cursor = NodeCursor(self.first, payload=payload)
+        for i in range(self.count):
+            yield next(cursor)
+
+    def batches(self, batch_size, payload=False):
+        """
+        :param batch_size: maximum number of items per batch
+        :param payload: if True, the batches contain the particle data instead of the nodes
+        :return: generator of lists of up to 'batch_size' items, covering exactly the nodes of the run
+        """
+        assert batch_size > 0
+        cursor = NodeCursor(self.first, payload=payload)
+        remaining = self.count
+        while remaining > 0:
+            batch = cursor.next_batch(min(batch_size, remaining))
+            remaining -= len(batch)
+            yield batch
+
+    def id_bounds(self):
+        """
+        :return: tuple (first ID, last ID) of the run; (None, None) for an empty run
+        """
+        if self.count <= 0:
+            return None, None
+        return self.first.id, self.last.id
+
+    def export_c(self):
+        """
+        :return: tuple (num_particles, node_begin) - the leading arguments of the compiled particle loop, which
+                 then stops after the last node of the run (see codegenerator.NodeLoopGenerator)
+        """
+        node_link_journal.flush()
+        return self.count, self.first
+
+
+class Node(NodeBase):
+    prev = None
+    next = None
+    id   = None
+    data = None
+
+
+class CompactNode(NodeBase):
+    """
+    Node with its attributes in fixed __slots__ instead of a per-instance __dict__. Behaves like Node (and can be
+    used as drop-in 'dtype' of RealList, OrderedList and ParticleSet), but new attributes cannot be attached.
+    """
+    __slots__ = ('prev', 'next', 'id', 'data')
+
+
 node_c_interface = None
 
-class NodeJIT(Node, ctypes.Structure):
-    _fields_ = [('_c_prev_p', ctypes.c_void_p),
-                ('_c_next_p', ctypes.c_void_p),
-                ('_c_data_p', ctypes.c_void_p)]
+
+class LinkJournal(object):
+    """
+    Journal of NodeJIT objects whose Python-side links (prev, next, data) changed while deferred synchronisation
+    is enabled. Instead of crossing into C on every set_prev() / set_next() / set_data(), the nodes are only
+    marked dirty here, and the C structs are updated in one batched call by flush() - e.g. right before a
+    compiled kernel walks the chain.
+
+    Note: while the journal is enabled, unlinked nodes keep their (stale) C pointers until they are linked again;
+    only the nodes that remain in the chain are guaranteed to be consistent after a flush.
+
+    The journal is shared by all node chains of the process, so it is reference-counted: it stays enabled as long
+    as one of its users (e.g. a ParticleSet with 'deferred_links') has not called disable(). Every container that
+    hands a JIT chain to compiled code flushes it first (see NodeStorage.export_c()).
+    """
+    enabled = False
+    _dirty = {}
+    _n_users = 0
+
+    def __init__(self):
+        self.enabled = False
+        self._dirty = {}
+        self._n_users = 0
+
+    def __len__(self):
+        return len(self._dirty)
+
+    def enable(self):
+        """
+        Enables the deferred synchronisation for one more user.
+        """
+        self._n_users += 1
+        self.enabled = True
+
+    def disable(self):
+        """
+        Ends the deferred synchronisation for one user; the last user flushes the journal and disables it.
+        """
+        if self._n_users <= 0:
+            return
+        self._n_users -= 1
+        if self._n_users > 0:
+            return
+        self.flush()
+        self.enabled = False
+
+    def mark(self, node):
+        if isinstance(node, NodeJITBase):
+            self._dirty[id(node)] = node
+
+    def discard(self, nodes):
+        """
+        Drops the given nodes from the journal (e.g. because they are torn down), without synchronising them.
+        """
+        if len(self._dirty) <= 0:
+            return
+        for node in nodes:
+            self._dirty.pop(id(node), None)
+
+    def flush(self):
+        """
+        Writes the current Python-side links of all dirty nodes to their C structs (single call into C).
+        """
+        if len(self._dirty) <= 0:
+            return
+        sync_c_links(self._dirty.values())
+        self._dirty.clear()
+
+
+node_link_journal = LinkJournal()
+
+
+def sync_c_links(nodes, data=True):
+    """
+    Writes the Python-side prev, next and data links of the given NodeJIT objects to their C structs,
+    using a single call into the 'node' library.
+    :param nodes: iterable of NodeJIT (or CompactNodeJIT) objects
+    :param data: if False, only prev and next are synchronised (the C data pointers are kept as they are - except
+                 for the ones that detach() has reset, e.g. of removed nodes that are linked again)
+    """
+    entries = []
+    for node in nodes:
+        entries.append(ctypes.addressof(node))
+        entries.append(ctypes.addressof(node.prev) if isinstance(node.prev, NodeJITBase) else None)
+        entries.append(ctypes.addressof(node.next) if isinstance(node.next, NodeJITBase) else None)
+        entries.append(node.c_data_address() if data or node._c_data_p is None else node._c_data_p)
+    n = len(entries) // 4
+    if n <= 0:
+        return
+    NodeJIT.bind_c_functions()
+    NodeJIT.sync_node_links_c((ctypes.c_void_p * len(entries))(*entries), n)
+
+
+def teardown_nodes(nodes):
+    """
+    Bulk teardown of many nodes at once (e.g. all nodes of a list that is cleared or destroyed): the links of all
+    nodes are dropped, their IDs are released to the ID generator in one batch and, for JIT nodes, the C structs
+    are reset with a single call into the 'node' library and the library registrations are returned at once.
+    Destroying the nodes afterwards needs no further calls (see NodeBase.__del__ and NodeJITBase.__del__).
+    :param nodes: list of nodes
+    """
+    ids = []
+    jit_nodes = []
+    for node in nodes:
+        node.prev = None
+        node.next = None
+        if node.id is not None:
+            ids.append(node.id)
+            node.id = None
+        if isinstance(node, NodeJITBase) and node.registered:
+            node.registered = False
+            jit_nodes.append(node)
+    package_globals.idgen.releaseIDs(ids)
+    if len(jit_nodes) > 0:
+        node_link_journal.discard(jit_nodes)
+        entries = []
+        for node in jit_nodes:
+            entries.extend((ctypes.addressof(node), None, None, None))
+        NodeJIT.bind_c_functions()
+        NodeJIT.sync_node_links_c((ctypes.c_void_p * len(entries))(*entries), len(jit_nodes))
+        c_lib_register.deregister("node", len(jit_nodes))
+
+
+class NodeJITBase(NodeBase):
+    """
+    Common behaviour of the nodes that mirror their links in a C struct (see 'NodeJIT_fields'). Concrete classes
+    combine this with ctypes.Structure (see NodeJIT and CompactNodeJIT).
+    """
+    __slots__ = ()
     registered = False
 
     init_node_c = None
@@ -148,6 +507,56 @@ class NodeJIT(Node, ctypes.Structure):
     reset_prev_ptr_c = None
     reset_next_ptr_c = None
     reset_data_ptr_c = None
+    insert_between_c = None
+    unlink_node_c = None
+    splice_chain_c = None
+    count_nodes_c = None
+    find_by_index_c = None
+    sync_node_links_c = None
+    clone_chain_c = None
+    c_library = None
+
+    arena = None
+    arena_slot = None
+
+    @classmethod
+    def c_function_params(cls):
+        """
+        Signatures of the 'node' library functions used by this node class.
+        :return: array of dictionary {"name": str, "return": type, "arguments": [type, ...]}
+        """
+        func_params = []
+        func_params.append({"name": 'init_node', "return": None, "arguments": [ctypes.POINTER(cls)]})
+        func_params.append({"name": 'set_prev_ptr', "return": None, "arguments": [ctypes.POINTER(cls), ctypes.POINTER(cls)]})
+        func_params.append({"name": 'set_next_ptr', "return": None, "arguments": [ctypes.POINTER(cls), ctypes.POINTER(cls)]})
+        func_params.append({"name": 'set_data_ptr', "return": None, "arguments": [ctypes.POINTER(cls), ctypes.c_void_p]})
+        func_params.append({"name": 'reset_prev_ptr', "return": None, "arguments": [ctypes.POINTER(cls)]})
+        func_params.append({"name": 'reset_next_ptr', "return": None, "arguments": [ctypes.POINTER(cls)]})
+        func_params.append({"name": 'reset_data_ptr', "return": None, "arguments": [ctypes.POINTER(cls)]})
+        func_params.append({"name": 'insert_between', "return": None, "arguments": [ctypes.POINTER(cls), ctypes.POINTER(cls), ctypes.POINTER(cls)]})
+        func_params.append({"name": 'unlink_node', "return": None, "arguments": [ctypes.POINTER(cls)]})
+        func_params.append({"name": 'splice_chain', "return": None, "arguments": [ctypes.POINTER(cls), ctypes.POINTER(cls), ctypes.POINTER(cls), ctypes.POINTER(cls)]})
+        func_params.append({"name": 'count_nodes', "return": ctypes.c_size_t, "arguments": [ctypes.POINTER(cls)]})
+        func_params.append({"name": 'find_by_index', "return": ctypes.c_void_p, "arguments": [ctypes.POINTER(cls), ctypes.c_size_t]})
+        func_params.append({"name": 'sync_node_links', "return": None, "arguments": [ctypes.POINTER(ctypes.c_void_p), ctypes.c_size_t]})
+        func_params.append({"name": 'clone_chain', "return": ctypes.c_size_t, "arguments": [ctypes.POINTER(cls), ctypes.c_void_p, ctypes.c_size_t, ctypes.c_void_p, ctypes.c_size_t, ctypes.c_size_t]})
+        return func_params
+
+    @classmethod
+    def bind_c_functions(cls):
+        """
+        Loads the C functions of the 'node' library once per class (instead of once per node) and attaches them
+        as class attributes. The functions are re-bound if the library has been re-loaded in the meantime.
+        """
+        node_c_interface = c_lib_register.get("node")  # ["node"]
+        if node_c_interface is None or node_c_interface.libc is None:
+            return
+        if cls.__dict__.get('c_library', None) is node_c_interface.libc:
+            return
+        c_funcs = node_c_interface.load_functions(cls.c_function_params())
+        for name, func in c_funcs.items():
+            setattr(cls, name+'_c', func)
+        cls.c_library = node_c_interface.libc
 
 
     def __init__(self, prev=None, next=None, id=None, data=None):
@@ -161,47 +570,20 @@ class NodeJIT(Node, ctypes.Structure):
         c_lib_register.load("node")
         c_lib_register.register("node")
         self.registered = True
-        node_c_interface = c_lib_register.get("node")  # ["node"]
-
-        func_params = []
-        func_params.append({"name": 'init_node', "return": None, "arguments": [ctypes.POINTER(NodeJIT)]})
-        func_params.append({"name": 'set_prev_ptr', "return": None, "arguments": [ctypes.POINTER(NodeJIT), ctypes.POINTER(NodeJIT)]})
-        func_params.append({"name": 'set_next_ptr', "return": None, "arguments": [ctypes.POINTER(NodeJIT), ctypes.POINTER(NodeJIT)]})
-        func_params.append({"name": 'set_data_ptr', "return": None, "arguments": [ctypes.POINTER(NodeJIT), ctypes.c_void_p]})
-        func_params.append({"name": 'reset_prev_ptr', "return": None, "arguments": [ctypes.POINTER(NodeJIT)]})
-        func_params.append({"name": 'reset_next_ptr', "return": None, "arguments": [ctypes.POINTER(NodeJIT)]})
-        func_params.append({"name": 'reset_data_ptr', "return": None, "arguments": [ctypes.POINTER(NodeJIT)]})
-        c_funcs = node_c_interface.load_functions(func_params)
-        self.init_node_c = c_funcs['init_node']
-        self.set_prev_ptr_c = c_funcs['set_prev_ptr']
-        self.set_next_ptr_c = c_funcs['set_next_ptr']
-        self.set_data_ptr_c = c_funcs['set_data_ptr']
-        self.reset_prev_ptr_c = c_funcs['reset_prev_ptr']
-        self.reset_next_ptr_c = c_funcs['reset_next_ptr']
-        self.reset_data_ptr_c = c_funcs['reset_data_ptr']
+        type(self).bind_c_functions()
 
+        # init_node() already resets all pointers - only the non-NULL ones need to be set afterwards
         self.init_node_c(self)
 
-        if self.prev is not None and isinstance(self.prev, NodeJIT):
+        if self.prev is not None and isinstance(self.prev, NodeJITBase):
             self.set_prev_ptr_c(self, self.prev)
-        else:
-            self.reset_prev_ptr_c(self)
         #self._c_self_p = ctypes.cast(self, ctypes.c_void_p)
-        if self.next is not None and isinstance(self.next, NodeJIT):
+        if self.next is not None and isinstance(self.next, NodeJITBase):
             self.set_next_ptr_c(self, self.next)
-        else:
-            self.reset_next_ptr_c(self)
 
 
-        if self.data is not None:   # and isinstance(ctypes.c_void_p):
-            #self._c_data_p = ctypes.cast(self.data, ctypes.c_void_p)
-            try:
-                # self.set_data_ptr_c(self, ctypes.cast(ctypes.byref(self.data.cdata()), ctypes.c_void_p))
-                self.set_data_ptr_c(self, self.data.cdata())
-            except AttributeError:
-                self.set_data_ptr_c(self, ctypes.cast(self.data, ctypes.c_void_p))
-        else:
-            self.reset_data_ptr_c(self)
+        if self.data is not None:
+            self.update_data()
 
         #self.ctypes.data_as(ctypes.c_void_p)
         #ctypes.cast(self, ctypes.c_void_p)
@@ -217,19 +599,12 @@ class NodeJIT(Node, ctypes.Structure):
         result.data = self.data
         c_lib_register.register("node")   # should rather be done by 'result' internally
         result.registered = True
-        result.init_node_c = self.init_node_c
-        result.set_prev_ptr_c = self.set_prev_ptr_c
-        result.set_next_ptr_c = self.set_next_ptr_c
-        result.set_data_ptr_c = self.set_data_ptr_c
-        result.reset_prev_ptr_c = self.reset_prev_ptr_c
-        result.reset_next_ptr_c = self.reset_next_ptr_c
-        result.reset_data_ptr_c = self.reset_data_ptr_c
         result.init_node_c(self)
-        if result.prev is not None and isinstance(result.prev, NodeJIT):
+        if result.prev is not None and isinstance(result.prev, NodeJITBase):
             result.set_prev_ptr_c(result, result.prev)
         else:
             result.reset_prev_ptr_c(result)
-        if result.next is not None and isinstance(result.next, NodeJIT):
+        if result.next is not None and isinstance(result.next, NodeJITBase):
             result.set_next_ptr_c(result, result.next)
         else:
             result.reset_next_ptr_c(result)
@@ -259,7 +634,8 @@ class NodeJIT(Node, ctypes.Structure):
         # self.reset_data_ptr_c(self)
         # self.prev = None
         # self.next = None
-        package_globals.idgen.releaseID(self.id)
+        if self.id is not None:
+            package_globals.idgen.releaseID(self.id)
 
         #global node_c_interface
         #if node_c_interface is not None:
@@ -267,28 +643,85 @@ class NodeJIT(Node, ctypes.Structure):
         #    if node_c_interface.register_count <= 0:
         #        node_c_interface.unload_library()
         #        node_c_interface = None
+        if getattr(self, 'arena', None) is not None:
+            self.arena.reclaim(self.arena_slot)
+            self.arena = None
 
     def unlink(self):
         # print("NodeJIT.unlink() [id={}] is called.".format(self.id))
+        self.detach()
         if self.registered:
-            # print("Calling ctype funcs.")
-            if self.prev is not None:
-                if self.next is not None:
-                    self.prev.set_next(self.next)
-                else:
-                    self.reset_next_ptr_c(self.prev)
-            if self.next is not None:
-                if self.prev is not None:
-                    self.next.set_prev(self.prev)
-                else:
-                    self.reset_prev_ptr_c(self.next)
-            self.reset_prev_ptr_c(self)
-            self.reset_next_ptr_c(self)
-            self.reset_data_ptr_c(self)
             c_lib_register.deregister("node")
             self.registered = False
-        self.prev = None
-        self.next = None
+
+    def detach(self):
+        """
+        Removes this node from its chain on the Python- and the C-side, but keeps the node registered with the
+        'node' library (and its C struct valid), so that it can be re-used without re-registering.
+        """
+        if self.registered:
+            if node_link_journal.enabled:
+                node_link_journal.mark(self.prev)
+                node_link_journal.mark(self.next)
+            else:
+                # -- one call relinks both C-side neighbours and resets this node's links -- #
+                self.unlink_node_c(self)
+                self.reset_data_ptr_c(self)
+        super().detach()
+
+    def link_between(self, prev, next):
+        """
+        Inserts this node between 'prev' and 'next' (either of which may be None), linking both directions
+        on the Python- and the C-side with a single call into the 'node' library.
+        :param prev: new predecessor node
+        :param next: new successor node
+        """
+        super().link_between(prev, next)
+        # -- unlink() / detach() reset the C data pointer (and set_data() skips unregistered nodes) -- #
+        stale_data = not self.registered or self._c_data_p is None
+        if not self.registered:
+            # -- a previously unlinked node that is linked again needs to be mirrored in C again -- #
+            c_lib_register.register("node")
+            self.registered = True
+        if node_link_journal.enabled:
+            node_link_journal.mark(self)
+            node_link_journal.mark(prev)
+            node_link_journal.mark(next)
+            return
+        self.insert_between_c(self, prev if isinstance(prev, NodeJITBase) else None, next if isinstance(next, NodeJITBase) else None)
+        if stale_data:
+            self.update_data()
+
+    def splice(self, last, prev, next):
+        """
+        Moves the sub-chain [self, ..., last] from its current chain to the position between 'prev' and 'next'.
+        The sub-chain is relinked in O(1), with a single call into the 'node' library.
+        :param last: last node of the sub-chain that starts with this node
+        :param prev: new predecessor of the sub-chain (may be None)
+        :param next: new successor of the sub-chain (may be None)
+        """
+        if node_link_journal.enabled:
+            for node in [self.prev, last.next, self, last, prev, next]:
+                node_link_journal.mark(node)
+            super().splice(last, prev, next)
+            return
+        super().splice(last, prev, next)
+        self.splice_chain_c(self, last, prev if isinstance(prev, NodeJITBase) else None, next if isinstance(next, NodeJITBase) else None)
+
+    def count_chain(self):
+        """
+        :return: number of nodes in the C-side chain, starting from (and including) this node
+        """
+        node_link_journal.flush()
+        return self.count_nodes_c(self)
+
+    def chain_address(self, index):
+        """
+        :param index: position in the C-side chain, counted from this node
+        :return: C address of the node at that position; None if the chain is shorter than 'index'
+        """
+        node_link_journal.flush()
+        return self.find_by_index_c(self, index)
 
     def __repr__(self):
         return super().__repr__()
@@ -297,7 +730,11 @@ class NodeJIT(Node, ctypes.Structure):
         return super().__str__()
 
     def __sizeof__(self):
-        return super().__sizeof__()+sys.getsizeof(self._fields_)
+        obj_size = super().__sizeof__()
+        if getattr(self, 'arena', None) is None:
+            # -- arena nodes are views: their C struct is accounted for by the arena's slabs -- #
+            obj_size += ctypes.sizeof(self)
+        return obj_size
 
     #def __eq__(self, other):
     #    return super().__eq__(other)
@@ -320,20 +757,29 @@ class NodeJIT(Node, ctypes.Structure):
     def set_data(self, data):
         super().set_data(data)
         if self.registered:
-            self.update_data()
+            if node_link_journal.enabled:
+                node_link_journal.mark(self)
+            else:
+                self.update_data()
 
     def set_prev(self, prev):
         super().set_prev(prev)
         if self.registered:
-            self.update_prev()
+            if node_link_journal.enabled:
+                node_link_journal.mark(self)
+            else:
+                self.update_prev()
 
     def set_next(self, next):
         super().set_next(next)
         if self.registered:
-            self.update_next()
+            if node_link_journal.enabled:
+                node_link_journal.mark(self)
+            else:
+                self.update_next()
 
     def update_prev(self):
-        if self.prev is not None and isinstance(self.prev, NodeJIT):
+        if self.prev is not None and isinstance(self.prev, NodeJITBase):
             #self._c_prev_p = ctypes.cast(self.prev, ctypes.c_void_p)
             #self._c_prev_p = self.prev._c_self_p
             self.set_prev_ptr_c(self, self.prev)
@@ -341,13 +787,24 @@ class NodeJIT(Node, ctypes.Structure):
             self.reset_prev_ptr_c(self)
 
     def update_next(self):
-        if self.next is not None and isinstance(self.next, NodeJIT):
+        if self.next is not None and isinstance(self.next, NodeJITBase):
             #self._c_next_p = ctypes.cast(self.next, ctypes.c_void_p)
             #self._c_next_p = self.next._c_self_p
             self.set_next_ptr_c(self, self.next)
         else:
             self.reset_next_ptr_c(self)
 
+    def c_data_address(self):
+        """
+        :return: C address of this node's data (None if there is no data)
+        """
+        if self.data is None:
+            return None
+        try:
+            return self.data.cdata().value
+        except AttributeError:
+            return ctypes.cast(self.data, ctypes.c_void_p).value
+
     def update_data(self):
         if self.data is not None:   # and isinstance(ctypes.c_void_p):
             #self._c_data_p = ctypes.cast(self.data, ctypes.c_void_p)
@@ -360,4 +817,26 @@ class NodeJIT(Node, ctypes.Structure):
             self.reset_data_ptr_c(self)
 
 
+NodeJIT_fields = [('_c_prev_p', ctypes.c_void_p),
+                  ('_c_next_p', ctypes.c_void_p),
+                  ('_c_data_p', ctypes.c_void_p)]
+
+
+class NodeJIT(NodeJITBase, Node, ctypes.Structure):
+    _fields_ = NodeJIT_fields
 
+
+class CompactNodeJIT(NodeJITBase, ctypes.Structure):
+    """
+    NodeJIT with its Python-side attributes in fixed __slots__ instead of a per-instance __dict__.
+    The C struct is identical to the one of NodeJIT.
+    """
+    _fields_ = NodeJIT_fields
+    __slots__ = ('prev', 'next', 'id', 'data', 'registered', 'arena', 'arena_slot')
+
+    def __init__(self, prev=None, next=None, id=None, data=None):
+        # -- slots have no class-level defaults: initialise the ones that are read before they are first set -- #
+        self.registered = False
+        self.arena = None
+        self.arena_slot = None
+        super().__init__(prev=prev, next=next, id=id, data=data)
@@ -0,0 +1,130 @@
+import ctypes
+from Node import NodeBase, NodeJIT
+from wrapping import c_lib_register
+
+
+class NodeArena(object):
+    """
+    Slab allocator for NodeJIT objects. Instead of each NodeJIT owning its own (small) C buffer, the C structs
+    are placed in large, contiguous slabs of 'slab_size' nodes each. The Python NodeJIT objects handed out by
+    the arena are thin views (ctypes.Structure.from_address) into those slabs, hence the C-side chain of
+    '_c_prev_p' / '_c_next_p' pointers stays within a few large memory blocks. The slabs are kept alive by the
+    arena, and each view keeps its arena alive via 'node.arena'.
+
+    Slots of nodes that are destroyed are returned to the arena (see NodeJIT.__del__), zeroed, and are handed
+    out again before a new slab is allocated. As free slots are always zeroed, allocate() only needs to write the
+    non-NULL pointers of a new node, instead of running the full NodeJIT constructor.
+    """
+    _nclass = NodeJIT
+    _slab_size = 0
+    _node_bytes = 0
+    _slabs = []
+    _free_slots = []
+    _n_slots = 0
+    _n_allocated = 0
+
+    def __init__(self, nclass=NodeJIT, slab_size=65536):
+        """
+        :param nclass: ctypes node class to allocate (NodeJIT, CompactNodeJIT or a subclass)
+        :param slab_size: number of node structs per contiguous slab
+        """
+        assert issubclass(nclass, ctypes.Structure)
+        assert slab_size > 0
+        self._nclass = nclass
+        self._slab_size = slab_size
+        self._node_bytes = ctypes.sizeof(nclass)
+        self._slabs = []
+        self._free_slots = []
+        self._n_slots = 0
+        self._n_allocated = 0
+
+    def __len__(self):
+        """
+        :return: number of nodes currently handed out by this arena
+        """
+        return self._n_allocated
+
+    @property
+    def capacity(self):
+        return self._n_slots
+
+    @property
+    def nslabs(self):
+        return len(self._slabs)
+
+    def _add_slab(self):
+        # -- make sure the 'node' library (and the class-level C functions) are available before the first node -- #
+        c_lib_register.load("node")
+        self._nclass.bind_c_functions()
+        slab = (ctypes.c_byte * (self._node_bytes * self._slab_size))()
+        self._slabs.append(slab)
+        # -- push in reverse so that consecutive allocations fill the slab front-to-back -- #
+        self._free_slots.extend(range(self._n_slots + self._slab_size - 1, self._n_slots - 1, -1))
+        self._n_slots += self._slab_size
+
+    def allocate(self, prev=None, next=None, id=None, data=None):
+        """
+        Creates a new node inside the arena. The parameters are the same as for the NodeJIT constructor.
+        :return: NodeJIT view into a slab of this arena
+        """
+        if len(self._free_slots) <= 0:
+            self._add_slab()
+        slot = self._free_slots.pop()
+        slab_index, slab_offset = divmod(slot, self._slab_size)
+        node = self._nclass.from_address(ctypes.addressof(self._slabs[slab_index]) + slab_offset * self._node_bytes)
+        node.arena = self
+        node.arena_slot = slot
+        NodeBase.__init__(node, prev=prev, next=next, id=id, data=data)
+        c_lib_register.register("node")
+        node.registered = True
+        if node.prev is not None:
+            node.update_prev()
+        if node.next is not None:
+            node.update_next()
+        if node.data is not None:
+            node.update_data()
+        self._n_allocated += 1
+        return node
+
+    def claim_slab(self):
+        """
+        Adds a new slab and hands out all of its slots at once, as views in slot order. Other than allocate(), the
+        views are neither linked nor registered with the 'node' library: meant for bulk construction, where the
+        caller writes the C structs of the whole slab (e.g. with a single call into the 'node' library) and sets up
+        the Python-side attributes of the views.
+        :return: list of 'slab_size' node views
+        """
+        self._add_slab()
+        first_slot = self._n_slots - self._slab_size
+        # -- _add_slab() appended the new slots to the end of the free list -- #
+        del self._free_slots[-self._slab_size:]
+        base = ctypes.addressof(self._slabs[-1])
+        nodes = []
+        for i in range(self._slab_size):
+            node = self._nclass.from_address(base + i * self._node_bytes)
+            node.prev = None
+            node.next = None
+            node.id = None
+            node.data = None
+            node.registered = False
+            node.arena = self
+            node.arena_slot = first_slot + i
+            nodes.append(node)
+        self._n_allocated += self._slab_size
+        return nodes
+
+    def reclaim(self, slot):
+        """
+        Returns a slot to the arena. Called from NodeJIT.__del__ - do not call this on a node that is still alive.
+        :param slot: arena slot index of the destroyed node
+        """
+        ctypes.memset(self.address(slot), 0, self._node_bytes)
+        self._free_slots.append(slot)
+        self._n_allocated -= 1
+
+    def address(self, slot):
+        """
+        :return: C address of the node struct in the given slot
+        """
+        slab_index, slab_offset = divmod(slot, self._slab_size)
+        return ctypes.addressof(self._slabs[slab_index]) + slab_offset * self._node_bytes
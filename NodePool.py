@@ -0,0 +1,119 @@
+import ctypes
+import package_globals
+from Node import NodeBase, Node, NodeJITBase, node_link_journal, teardown_nodes
+from NodeArena import NodeArena
+from wrapping import c_lib_register
+
+
+class NodePool(object):
+    """
+    Recycling pool for node objects, with explicit acquire() / release() semantics. Released nodes are detached
+    from their chain, their ID is returned to the ID generator and their data is dropped - but the node object
+    itself (and, for JIT nodes, its C struct and its 'node' library registration) is kept in the pool and handed
+    out again by the next acquire(). Hence, in a high-turnover simulation (particles deleted and released
+    continuously), no node objects are allocated or garbage-collected and no finaliser (__del__) runs on the hot
+    path. The pooled nodes are only finalised when the pool itself is cleared or destroyed.
+
+    JIT nodes of a pool are allocated in a NodeArena, so that recycled C structs stay in a few contiguous slabs.
+    """
+    _nclass = Node
+    _arena = None
+    _free_nodes = []
+    _n_acquired = 0
+
+    def __init__(self, nclass=Node, use_arena=True, slab_size=65536):
+        """
+        :param nclass: node class of the pool (e.g. Node, CompactNode, NodeJIT, CompactNodeJIT)
+        :param use_arena: if True, JIT nodes are allocated in a NodeArena (ignored for non-JIT nodes)
+        :param slab_size: number of nodes per arena slab
+        """
+        assert issubclass(nclass, NodeBase)
+        self._nclass = nclass
+        self._arena = None
+        if use_arena and issubclass(nclass, NodeJITBase) and issubclass(nclass, ctypes.Structure):
+            self._arena = NodeArena(nclass, slab_size=slab_size)
+        self._free_nodes = []
+        self._n_acquired = 0
+
+    def __len__(self):
+        """
+        :return: number of nodes currently handed out by this pool
+        """
+        return self._n_acquired
+
+    @property
+    def nfree(self):
+        """
+        :return: number of released nodes that are available for re-use
+        """
+        return len(self._free_nodes)
+
+    @property
+    def nclass(self):
+        return self._nclass
+
+    def _create(self, prev=None, next=None, id=None, data=None):
+        if self._arena is not None:
+            return self._arena.allocate(prev=prev, next=next, id=id, data=data)
+        return self._nclass(prev=prev, next=next, id=id, data=data)
+
+    def reserve(self, n):
+        """
+        Pre-allocates nodes so that the next 'n' acquire() calls don't need to create new nodes.
+        :param n: number of free nodes the pool should hold at least
+        """
+        while len(self._free_nodes) < n:
+            # -- negative ID: the node gets no ID from the generator until it is acquired -- #
+            self._free_nodes.append(self._create(id=-1))
+
+    def acquire(self, prev=None, next=None, id=None, data=None):
+        """
+        Hands out a node of the pool's node class - a recycled one, if available. The parameters are the same as
+        for the node constructor; as with the constructor, the node is not linked into the neighbours' links.
+        :return: node object
+        """
+        self._n_acquired += 1
+        if len(self._free_nodes) <= 0:
+            return self._create(prev=prev, next=next, id=id, data=data)
+        node = self._free_nodes.pop()
+        NodeBase.__init__(node, prev=prev, next=next, id=id, data=data)
+        if isinstance(node, NodeJITBase):
+            if not node.registered:
+                c_lib_register.register("node")
+                node.registered = True
+            if node_link_journal.enabled:
+                # -- the C links of a node released in journal mode may be stale: rewrite all of them on flush -- #
+                node_link_journal.mark(node)
+            else:
+                # -- release() left the C links reset: only the non-NULL ones need to be written -- #
+                if node.prev is not None:
+                    node.update_prev()
+                if node.next is not None:
+                    node.update_next()
+                if node.data is not None:
+                    node.update_data()
+        return node
+
+    def release(self, node):
+        """
+        Returns a node to the pool. The node is detached from its chain, its ID is released and its data dropped.
+        The caller has to make sure that the node is not referenced by a container anymore.
+        :param node: node that was acquired from this pool (or any other node of the pool's node class)
+        """
+        assert isinstance(node, self._nclass)
+        node.detach()
+        if node.id is not None:
+            package_globals.idgen.releaseID(node.id)
+            node.id = None
+        node.data = None
+        self._free_nodes.append(node)
+        self._n_acquired -= 1
+
+    def clear(self):
+        """
+        Drops all free nodes of the pool (which finalises them, after a bulk teardown - see Node.teardown_nodes()).
+        """
+        nodes = self._free_nodes
+        self._free_nodes = []
+        teardown_nodes(nodes)
+        del nodes
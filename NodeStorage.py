@@ -0,0 +1,222 @@
+import numpy as np
+from codegenerator import NodeLoopGenerator
+from Node import SubChain, node_link_journal
+from parcels_mocks.status import StatusCode as ErrorCode
+
+
+class NodeStorage(object):
+    """
+    Storage protocol of the ParticleSet: a container of linked nodes, sorted by node ID. The ParticleSet (and,
+    via ParticleSet.export_c(), the kernels) only use the operations below, so that any container implementing
+    them can be handed to ParticleSet(storage=...). There are two kinds of storages:
+    - node-based storages ('node_based' is True - RealList, OrderedList, SkipList, ConcurrentRealList, ...) link
+      and index the node objects of the ParticleSet's node class (Node, NodeJIT, CompactNode, ...);
+    - record storages ('node_based' is False - SoAParticleStorage, SlotMapStorage) keep the particle data in arrays
+      of their own and hand out lightweight handles in place of nodes (see RecordStorage.RecordNode). Their node
+      class is 'dtype' after attach(), and the ParticleSet uses that class for its nodes.
+
+    The operations in OPTIONAL_METHODS need not be implemented: callers check for them with supports() (the
+    ParticleSet refuses them with a NotImplementedError before anything is changed).
+
+    Besides the Python-side operations, a storage defines how its chain is handed to the compiled particle loop:
+    export_c() returns the arguments for the loop, and 'loopgen_class' is the loop generator (see codegenerator)
+    that generates a matching loop.
+    """
+    dtype = None
+    loopgen_class = NodeLoopGenerator
+    node_based = True
+    OPTIONAL_METHODS = ('split_at', 'concat', 'splice', 'snapshot')
+
+    @classmethod
+    def supports(cls, method):
+        """
+        :param method: name of an operation in OPTIONAL_METHODS
+        :return: True if the storage implements the operation (splice() comes with split_at() and concat())
+        """
+        assert method in cls.OPTIONAL_METHODS
+        if getattr(cls, method) is not getattr(NodeStorage, method):
+            return True
+        if method == 'splice':
+            return cls.supports('split_at') and cls.supports('concat')
+        return False
+
+    def attach(self, pclass, ngrids):
+        """
+        Tells the storage the particle class of the ParticleSet (called once, before any particle is added).
+        Node-based storages don't need it; record storages set up their arrays and their node class ('dtype').
+        :param pclass: particle class (ScipyParticle, JITParticle or a subclass)
+        :param ngrids: number of grids of the fieldset (length of the grid search index arrays of JIT particles)
+        """
+        pass
+
+    def __len__(self):
+        raise NotImplementedError
+
+    def __iter__(self):
+        """
+        :return: iterator over the nodes, in ID order
+        """
+        raise NotImplementedError
+
+    def __getitem__(self, index):
+        """
+        :param index: position
+        :return: node at that position
+        """
+        raise NotImplementedError
+
+    def begin(self):
+        """
+        :return: first node of the chain; None if the storage is empty
+        """
+        raise NotImplementedError
+
+    def end(self):
+        """
+        :return: last node of the chain; None if the storage is empty
+        """
+        raise NotImplementedError
+
+    def add_locate(self, val):
+        """
+        Inserts a node (or creates a node for an ID or data object) at its sorted position and links it.
+        :param val: node, node ID (int) or data object
+        :return: tuple (prev_node, next_node, index) - the new neighbours of the node and its position
+        """
+        raise NotImplementedError
+
+    def update(self, iterable):
+        """
+        Inserts a batch of nodes (or creates nodes for IDs or data objects).
+        :param iterable: nodes, node IDs (int) or data objects
+        """
+        raise NotImplementedError
+
+    def remove_many(self, indices_or_mask):
+        """
+        Removes (and unlinks) the nodes at the given positions.
+        :param indices_or_mask: array (or list) of positions, or boolean mask over the storage
+        :return: list of the removed nodes
+        """
+        raise NotImplementedError
+
+    def adopt_chain(self, nodes):
+        """
+        Indexes an already linked chain of nodes, sorted by ID (the storage has to be empty).
+        :param nodes: sequence of the nodes in chain order
+        """
+        raise NotImplementedError
+
+    def deleted_mask(self):
+        """
+        :return: boolean mask over the storage - True for the particles in state ErrorCode.Delete (record storages
+                 evaluate their state column instead of visiting each particle)
+        """
+        return np.array([bool(node.data.state == ErrorCode.Delete) for node in self], dtype=np.bool_)
+
+    # ==== optional operations (see supports()) ==== #
+    def split_at(self, id):
+        """
+        Splits the storage before the first node with an ID not lower than 'id' (optional).
+        :param id: lowest node ID of the upper part
+        :return: tuple (lower storage, upper storage) - this storage and a new one of the same kind
+        """
+        raise NotImplementedError
+
+    def concat(self, other):
+        """
+        Moves all nodes of another storage into this one (optional).
+        :param other: storage of the same node class
+        :return: this storage
+        """
+        raise NotImplementedError
+
+    def splice(self, source, sub_chain):
+        """
+        Moves a run of nodes out of another storage into this one (optional). By default, the source is cut before
+        and after the run (see split_at()), the part after the run goes back into the source and the run is
+        concatenated to this storage (see concat()).
+        :param source: storage that holds the nodes of the run
+        :param sub_chain: SubChain descriptor of the run (see id_range())
+        :return: this storage
+        """
+        if len(sub_chain) <= 0:
+            return self
+        after = sub_chain.last.next
+        run = source.split_at(sub_chain.first.id)[1]
+        if after is not None:
+            source.concat(run.split_at(after.id)[1])
+        return self.concat(run)
+
+    def snapshot(self):
+        """
+        :return: copy-on-write snapshot of the storage (optional; see LinkedList.RealListSnapshot)
+        """
+        raise NotImplementedError
+
+    def materialize_snapshots(self):
+        """
+        Lets all live snapshots copy the particle data they share - to be called before particle data is changed
+        (storages without snapshots have nothing to do).
+        """
+        pass
+
+    def add(self, val):
+        self.add_locate(val)
+
+    def bisect_id(self, id):
+        """
+        Binary search over the positions of the storage (storages with a faster lookup override this).
+        :param id: search node ID
+        :return: position of the first node with an ID not lower than 'id' (len(self) if there is none)
+        """
+        lower = 0
+        upper = len(self)
+        while lower < upper:
+            pos = (lower + upper) // 2
+            if self[pos].id < id:
+                lower = pos + 1
+            else:
+                upper = pos
+        return lower
+
+    def get_by_id(self, id):
+        """
+        :param id: search node ID
+        :return: node with that ID; None if there is no such node
+        """
+        pos = self.bisect_id(id)
+        if pos < len(self) and self[pos].id == id:
+            return self[pos]
+        return None
+
+    def index_range(self, start, stop):
+        """
+        :param start: position of the first node
+        :param stop: position after the last node (clipped to the length of the storage)
+        :return: SubChain descriptor of the nodes at the positions [start, stop)
+        """
+        stop = min(stop, len(self))
+        if start >= stop:
+            return SubChain()
+        return SubChain(self[start], self[stop-1], stop - start)
+
+    def id_range(self, lo, hi):
+        """
+        :param lo: lowest node ID of the range
+        :param hi: node ID after the range
+        :return: SubChain descriptor of the nodes with IDs in [lo, hi)
+        """
+        return self.index_range(self.bisect_id(lo), self.bisect_id(hi))
+
+    def export_c(self, sub_chain=None):
+        """
+        Prepares the chain for the compiled particle loop (writing all deferred link changes to the C nodes first).
+        :param sub_chain: SubChain descriptor (see id_range()) - if given, the loop only covers its nodes
+        :return: tuple (num_particles, node_begin) - the leading arguments of the compiled particle loop (see
+                 'loopgen_class'); node_begin is None if the storage is empty
+        """
+        node_link_journal.flush()
+        if sub_chain is not None:
+            return sub_chain.export_c()
+        return len(self), self.begin()
@@ -0,0 +1,381 @@
+import ctypes
+import numpy as np
+from codegenerator import OffsetNodeLoopGenerator, OffsetNode64LoopGenerator
+try:
+    from multiprocessing import shared_memory
+    from multiprocessing import resource_tracker
+except ImportError:
+    shared_memory = None
+    resource_tracker = None
+
+
+class OffsetArenaHeader(ctypes.Structure):
+    """
+    Header at the start of an OffsetNodeArena buffer (OffsetArenaHeader in node.h). All positions are offsets
+    relative to the start of the buffer, and all links are slot indices - hence the buffer contains no raw
+    pointers and can be relocated (copied, memory-mapped, shared between processes) as it is.
+    """
+    _fields_ = [('capacity', ctypes.c_int64),
+                ('count', ctypes.c_int64),
+                ('begin', ctypes.c_int64),
+                ('end', ctypes.c_int64),
+                ('free_head', ctypes.c_int64),
+                ('index_bytes', ctypes.c_int64),
+                ('links_offset', ctypes.c_int64),
+                ('records_offset', ctypes.c_int64),
+                ('record_bytes', ctypes.c_int64)]
+
+
+NIL = -1        # link value of 'no node'
+FREE = -2       # 'prev' link value of a slot in the free list
+
+
+class OffsetNodeArena(object):
+    """
+    Relocatable node chain: a single contiguous buffer holds a header, a link table of 'prev' and 'next' slot
+    indices (32- or 64-bit, see 'index_dtype') and the particle records (structured array of the particle type's
+    dtype; slot k's record is the payload of node k). Unused slots are chained in a free list through their 'next'
+    link. As the links are offsets, the whole chain can be saved and reloaded with a single memory-map (save() /
+    load()), or placed in multiprocessing.shared_memory and attached zero-copy by worker processes
+    (to_shared_memory() / attach_shared_memory()).
+
+    The compiled kernel loop over such a chain is generated by codegenerator.OffsetNodeLoopGenerator, which gets
+    the buffer's header (c_header()) instead of a begin node.
+    """
+    _buffer = None
+    _header = None
+    _links = None
+    _records = None
+    _record_dtype = None
+    _index_dtype = np.int32
+    _particles = []
+    _shm = None
+
+    def __init__(self, record_dtype, capacity=1024, index_dtype=np.int32, buffer=None):
+        """
+        :param record_dtype: numpy dtype of the particle records (e.g. ptype.dtype)
+        :param capacity: initial number of slots (ignored if 'buffer' is given)
+        :param index_dtype: dtype of the links - np.int32 or np.int64
+        :param buffer: existing arena buffer (numpy uint8 array) to attach to, e.g. from load() or shared memory
+        """
+        self._record_dtype = np.dtype(record_dtype)
+        self._index_dtype = np.dtype(index_dtype)
+        assert self._index_dtype in [np.dtype(np.int32), np.dtype(np.int64)]
+        self._shm = None
+        if buffer is None:
+            self._attach(self._create_buffer(capacity))
+            self._init_slots(0)
+            self.header.begin = NIL
+            self.header.end = NIL
+            self.header.count = 0
+        else:
+            self._attach(buffer)
+            assert self.header.index_bytes == self._index_dtype.itemsize
+            assert self.header.record_bytes == self._record_dtype.itemsize
+        self._particles = [None] * self.capacity
+
+    # ==== buffer layout ==== #
+    @staticmethod
+    def _align(nbytes, alignment=8):
+        return (nbytes + alignment - 1) // alignment * alignment
+
+    def _layout(self, capacity):
+        links_offset = self._align(ctypes.sizeof(OffsetArenaHeader))
+        records_offset = self._align(links_offset + capacity * 2 * self._index_dtype.itemsize)
+        nbytes = records_offset + capacity * self._record_dtype.itemsize
+        return links_offset, records_offset, nbytes
+
+    def _create_buffer(self, capacity):
+        links_offset, records_offset, nbytes = self._layout(capacity)
+        buffer = np.zeros(nbytes, dtype=np.uint8)
+        header = OffsetArenaHeader.from_buffer(buffer)
+        header.capacity = capacity
+        header.index_bytes = self._index_dtype.itemsize
+        header.links_offset = links_offset
+        header.records_offset = records_offset
+        header.record_bytes = self._record_dtype.itemsize
+        header.free_head = NIL
+        return buffer
+
+    def _attach(self, buffer):
+        self._buffer = buffer
+        self._header = OffsetArenaHeader.from_buffer(buffer)
+        capacity = self._header.capacity
+        lo = self._header.links_offset
+        ro = self._header.records_offset
+        self._links = buffer[lo:lo + capacity * 2 * self._index_dtype.itemsize].view(self._index_dtype).reshape(capacity, 2)
+        self._records = buffer[ro:ro + capacity * self._record_dtype.itemsize].view(self._record_dtype)
+
+    def _init_slots(self, first):
+        """
+        Puts the slots [first, capacity) into the free list (in ascending order).
+        """
+        capacity = self.capacity
+        if first >= capacity:
+            return
+        self._links[first:, 0] = FREE
+        self._links[first:capacity-1, 1] = np.arange(first+1, capacity, dtype=self._index_dtype)
+        self._links[capacity-1, 1] = self.header.free_head
+        self.header.free_head = first
+
+    @property
+    def header(self):
+        return self._header
+
+    @property
+    def capacity(self):
+        return self._header.capacity
+
+    @property
+    def buffer(self):
+        return self._buffer
+
+    @property
+    def records(self):
+        return self._records
+
+    def __len__(self):
+        return self._header.count
+
+    def c_header(self):
+        """
+        :return: ctypes header of the arena buffer - the argument for the compiled particle loop
+        """
+        return self._header
+
+    def export_c(self, sub_chain=None):
+        """
+        :param sub_chain: not supported - the arena has no particle IDs to describe a run by; the loop always covers
+                          the whole chain
+        :return: tuple (num_particles, header) - the leading arguments of the compiled particle loop, as for the
+                 node storages (see NodeStorage.export_c())
+        """
+        assert sub_chain is None, "OffsetNodeArena has no sub-chains - the loop covers the whole chain"
+        return len(self), self._header
+
+    @property
+    def loopgen_class(self):
+        """
+        :return: loop generator class matching the link width of this arena
+        """
+        return OffsetNode64LoopGenerator if self._index_dtype == np.dtype(np.int64) else OffsetNodeLoopGenerator
+
+    # ==== slots ==== #
+    def grow(self, capacity=None):
+        """
+        Moves the arena into a larger buffer. Links are offsets, so the buffer content is copied as it is; only
+        the record views of the stored particle objects need to be redirected.
+        :param capacity: new number of slots (default: twice the current capacity)
+        """
+        assert self._shm is None, "an arena in shared memory cannot grow - create it with sufficient capacity"
+        old_capacity = self.capacity
+        capacity = 2 * old_capacity if capacity is None else capacity
+        assert capacity > old_capacity
+        old_header = self._header
+        old_links = self._links
+        old_records = self._records
+        buffer = self._create_buffer(capacity)
+        new_header = OffsetArenaHeader.from_buffer(buffer)
+        new_header.count = old_header.count
+        new_header.begin = old_header.begin
+        new_header.end = old_header.end
+        new_header.free_head = old_header.free_head
+        self._attach(buffer)
+        self._links[:old_capacity] = old_links
+        self._records[:old_capacity] = old_records
+        self._init_slots(old_capacity)
+        self._particles.extend([None] * (capacity - old_capacity))
+        for slot, particle in enumerate(self._particles):
+            if particle is not None:
+                particle.set_cptr(self._records[slot:slot+1])
+
+    def allocate(self, particle=None):
+        """
+        Takes a slot from the free list (growing the arena if there is none). The slot is not linked yet.
+        :param particle: JIT particle whose record is moved into the slot (optional)
+        :return: slot index
+        """
+        if self.header.free_head == NIL:
+            self.grow()
+        slot = int(self.header.free_head)
+        self.header.free_head = int(self._links[slot, 1])
+        self._links[slot] = (NIL, NIL)
+        if particle is not None:
+            self._records[slot] = particle.get_cptr()[0]
+            particle.set_cptr(self._records[slot:slot+1])
+        else:
+            self._records[slot:slot+1] = np.zeros(1, dtype=self._record_dtype)
+        self._particles[slot] = particle
+        self.header.count += 1
+        return slot
+
+    def free(self, slot):
+        """
+        Unlinks a slot and returns it to the free list; a stored particle object gets its own copy of the record.
+        :param slot: slot index
+        :return: the particle object stored in the slot (if any)
+        """
+        assert self._links[slot, 0] != FREE
+        self.unlink(slot)
+        particle = self._particles[slot]
+        if particle is not None:
+            particle.set_cptr(self._records[slot:slot+1].copy())
+            self._particles[slot] = None
+        self._links[slot] = (FREE, self.header.free_head)
+        self.header.free_head = slot
+        self.header.count -= 1
+        return particle
+
+    def particle(self, slot):
+        """
+        :return: particle object stored in the slot; None for slots of an attached (loaded / shared) buffer
+        """
+        return self._particles[slot]
+
+    def record(self, slot):
+        """
+        :return: (writable) record view of the slot
+        """
+        return self._records[slot]
+
+    # ==== links ==== #
+    def prev(self, slot):
+        return int(self._links[slot, 0])
+
+    def next(self, slot):
+        return int(self._links[slot, 1])
+
+    def link_between(self, slot, prev, next):
+        """
+        Inserts the slot into the chain between the slots 'prev' and 'next' (either may be NIL).
+        """
+        self._links[slot] = (prev, next)
+        if prev != NIL:
+            self._links[prev, 1] = slot
+        else:
+            self.header.begin = slot
+        if next != NIL:
+            self._links[next, 0] = slot
+        else:
+            self.header.end = slot
+
+    def append(self, particle=None):
+        """
+        Allocates a slot and links it at the end of the chain.
+        :return: slot index
+        """
+        slot = self.allocate(particle)
+        self.link_between(slot, int(self.header.end), NIL)
+        return slot
+
+    def unlink(self, slot):
+        prev, next = int(self._links[slot, 0]), int(self._links[slot, 1])
+        if prev == NIL and next == NIL and self.header.begin != slot:
+            return
+        if prev != NIL:
+            self._links[prev, 1] = next
+        else:
+            self.header.begin = next
+        if next != NIL:
+            self._links[next, 0] = prev
+        else:
+            self.header.end = prev
+        self._links[slot] = (NIL, NIL)
+
+    def slots(self, backward=False):
+        """
+        :return: generator over the linked slots, in chain order
+        """
+        slot = int(self.header.end if backward else self.header.begin)
+        column = 0 if backward else 1
+        links = self._links
+        while slot != NIL:
+            yield slot
+            slot = int(links[slot, column])
+
+    def __iter__(self):
+        return self.slots()
+
+    # ==== persistence and sharing ==== #
+    def save(self, path):
+        """
+        Writes the arena buffer to a file, as it is.
+        :param path: file path
+        """
+        self._buffer.tofile(path)
+
+    @classmethod
+    def load(cls, path, record_dtype, index_dtype=np.int32, mode='r+'):
+        """
+        Memory-maps an arena file written by save(). No pointer needs to be rebuilt; the particle records are
+        accessible via record(slot) (there are no particle objects for the slots of a loaded arena).
+        :param path: file path
+        :param record_dtype: numpy dtype of the particle records
+        :param index_dtype: dtype of the links - np.int32 or np.int64
+        :param mode: numpy.memmap mode ('r+': changes are written to the file; 'c': copy-on-write)
+        :return: OffsetNodeArena
+        """
+        buffer = np.memmap(path, dtype=np.uint8, mode=mode)
+        return cls(record_dtype, index_dtype=index_dtype, buffer=buffer)
+
+    def to_shared_memory(self, name=None):
+        """
+        Copies the arena into a new multiprocessing.shared_memory block and continues to work on that block, so
+        that worker processes can attach to the same chain (attach_shared_memory()) without copying.
+        :param name: name of the shared memory block (default: generated)
+        :return: name of the shared memory block
+        """
+        assert shared_memory is not None, "multiprocessing.shared_memory requires Python 3.8 or newer"
+        shm = shared_memory.SharedMemory(name=name, create=True, size=self._buffer.nbytes)
+        buffer = np.ndarray((self._buffer.nbytes,), dtype=np.uint8, buffer=shm.buf)
+        buffer[:] = self._buffer
+        self._detach_views()
+        self._attach(buffer)
+        for slot, particle in enumerate(self._particles):
+            if particle is not None:
+                particle.set_cptr(self._records[slot:slot+1])
+        self._shm = shm
+        return shm.name
+
+    @classmethod
+    def attach_shared_memory(cls, name, record_dtype, index_dtype=np.int32):
+        """
+        Attaches to an arena that another process placed in shared memory (see to_shared_memory()).
+        :param name: name of the shared memory block
+        :return: OffsetNodeArena
+        """
+        assert shared_memory is not None, "multiprocessing.shared_memory requires Python 3.8 or newer"
+        try:
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # -- before Python 3.13, an attaching process would destroy the block at its exit (resource tracker) -- #
+            shm = shared_memory.SharedMemory(name=name)
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        buffer = np.ndarray((shm.size,), dtype=np.uint8, buffer=shm.buf)
+        arena = cls(record_dtype, index_dtype=index_dtype, buffer=buffer)
+        arena._shm = shm
+        return arena
+
+    def _detach_views(self):
+        self._header = None
+        self._links = None
+        self._records = None
+        self._buffer = None
+
+    def close(self, unlink=False):
+        """
+        Releases the shared memory block of the arena (if any). The arena must not be used afterwards.
+        :param unlink: if True, the shared memory block is destroyed as well (call this in the creating process)
+        """
+        if self._shm is None:
+            return
+        for slot, particle in enumerate(self._particles):
+            if particle is not None:
+                particle.set_cptr(self._records[slot:slot+1].copy())
+        self._particles = []
+        self._detach_views()
+        shm = self._shm
+        self._shm = None
+        shm.close()
+        if unlink:
+            shm.unlink()
@@ -0,0 +1,467 @@
+from bisect import bisect_left, bisect_right
+from itertools import chain
+from sortedcontainers import SortedList
+
+
+class OrderStatisticBackend(object):
+    """
+    Interface of the sorted storage behind OrderedList (and RealList): a sorted sequence with positional access
+    (order statistics). Besides the usual sorted-container operations, a backend has to provide
+    insert_locate(), which inserts a value and reports its new neighbours (so that the node chain can be linked
+    without further positional lookups), and reset(), which replaces the content by already sorted values in O(n).
+    """
+
+    def __len__(self):
+        raise NotImplementedError
+
+    def __iter__(self):
+        raise NotImplementedError
+
+    def __getitem__(self, index):
+        raise NotImplementedError
+
+    def __delitem__(self, index):
+        raise NotImplementedError
+
+    def insert_locate(self, value):
+        """
+        Inserts a value after any equal values.
+        :param value: value to insert
+        :return: tuple (prev_value, next_value, index) - the new neighbours of the value (None at the ends) and its
+                 position
+        """
+        raise NotImplementedError
+
+    def reset(self, values):
+        """
+        Replaces the content by the given values, which have to be sorted already.
+        :param values: list of sorted values
+        """
+        raise NotImplementedError
+
+    def bisect_left(self, value):
+        raise NotImplementedError
+
+    def bisect_right(self, value):
+        raise NotImplementedError
+
+    def index(self, value):
+        raise NotImplementedError
+
+    def pop(self, index=-1):
+        raise NotImplementedError
+
+    def split_off(self, index):
+        """
+        Removes the values from position 'index' on (backends with a cheaper cut override this O(n) default).
+        :param index: position of the first value to remove
+        :return: list of the removed (sorted) values
+        """
+        values = list(self)
+        self.reset(values[:index])
+        return values[index:]
+
+    def append_sorted(self, values):
+        """
+        Appends sorted values, none of which is lower than the current maximum (backends with a cheaper append
+        override this O(n) default).
+        :param values: list of sorted values
+        """
+        self.reset(list(self) + list(values))
+
+    def add(self, value):
+        self.insert_locate(value)
+
+    def remove(self, value):
+        del self[self.index(value)]
+
+    def clear(self):
+        self.reset([])
+
+
+def sortedlist_insert_locate(slist, value):
+    """
+    insert_locate() for a SortedList: the insertion slot is located once in the SortedList's sublists - as
+    SortedList.add() does it - and the neighbours are read off the sublists directly.
+    :param slist: SortedList
+    :param value: value to insert
+    :return: tuple (prev_value, next_value, index)
+    """
+    _lists = slist._lists
+    _maxes = slist._maxes
+    if not _maxes:
+        _lists.append([value])
+        _maxes.append(value)
+        slist._len += 1
+        return None, None, 0
+    pos = bisect_right(_maxes, value)
+    if pos == len(_maxes):
+        # -- not lower than any value: goes to the end of the last sublist -- #
+        pos -= 1
+        idx = len(_lists[pos])
+    else:
+        idx = bisect_right(_lists[pos], value)
+    sublist = _lists[pos]
+    if idx > 0:
+        prev_value = sublist[idx-1]
+    elif pos > 0:
+        prev_value = _lists[pos-1][-1]
+    else:
+        prev_value = None
+    if idx < len(sublist):
+        next_value = sublist[idx]
+    elif pos+1 < len(_lists):
+        next_value = _lists[pos+1][0]
+    else:
+        next_value = None
+    sublist.insert(idx, value)
+    if idx == len(sublist)-1:
+        _maxes[pos] = value
+    slist._len += 1
+    slist._expand(pos)
+    if idx >= len(_lists[pos]):
+        # -- _expand() split the sublist: the value is in the upper half now -- #
+        idx -= len(_lists[pos])
+        pos += 1
+    return prev_value, next_value, slist._loc(pos, idx)
+
+
+def sortedlist_reset(slist, values):
+    """
+    reset() for a SortedList: the sublists are cut directly from the sorted values, without comparing them.
+    :param slist: SortedList
+    :param values: list of sorted values
+    """
+    _load = slist._load
+    slist._lists = [values[pos:pos+_load] for pos in range(0, len(values), _load)]
+    slist._maxes = [sublist[-1] for sublist in slist._lists]
+    slist._len = len(values)
+    del slist._index[:]
+
+
+def sortedlist_split_off(slist, index):
+    """
+    split_off() for a SortedList: the sublists behind the cut are moved out as a whole, only the sublist that
+    contains the cut is split - no value is compared.
+    :param slist: SortedList
+    :param index: position of the first value to remove
+    :return: list of the removed values
+    """
+    if index >= slist._len:
+        return []
+    index = max(index, 0)
+    pos, idx = slist._pos(index)
+    _lists = slist._lists
+    _maxes = slist._maxes
+    tail = _lists[pos][idx:]
+    tail.extend(chain.from_iterable(_lists[pos+1:]))
+    del _lists[pos+1:]
+    del _maxes[pos+1:]
+    if idx > 0:
+        del _lists[pos][idx:]
+        _maxes[pos] = _lists[pos][-1]
+    else:
+        del _lists[pos]
+        del _maxes[pos]
+    slist._len = index
+    del slist._index[:]
+    return tail
+
+
+def sortedlist_append_sorted(slist, values):
+    """
+    append_sorted() for a SortedList: the values are cut into new sublists behind the existing ones.
+    :param slist: SortedList
+    :param values: list of sorted values, none lower than the maximum of the SortedList
+    """
+    _load = slist._load
+    values = list(values)
+    sublists = [values[pos:pos+_load] for pos in range(0, len(values), _load)]
+    slist._lists.extend(sublists)
+    slist._maxes.extend([sublist[-1] for sublist in sublists])
+    slist._len += len(values)
+    del slist._index[:]
+
+
+class SortedListBackend(SortedList, OrderStatisticBackend):
+    """
+    Order-statistic backend on top of sortedcontainers.SortedList: a list of sorted sublists plus a positional
+    index (a tree of sublist lengths), which SortedList rebuilds lazily after sublists are split or removed.
+    """
+
+    def insert_locate(self, value):
+        return sortedlist_insert_locate(self, value)
+
+    def reset(self, values):
+        sortedlist_reset(self, values)
+
+    def split_off(self, index):
+        return sortedlist_split_off(self, index)
+
+    def append_sorted(self, values):
+        sortedlist_append_sorted(self, values)
+
+
+class BPlusLeaf(object):
+    """Leaf of a BPlusTreeList: sorted values, linked to the neighbouring leaves."""
+    __slots__ = ('values', 'prev', 'next')
+
+    def __init__(self, values):
+        self.values = values
+        self.prev = None
+        self.next = None
+
+
+class BPlusInner(object):
+    """Inner node of a BPlusTreeList: children, and the number of values and the maximum value of each child."""
+    __slots__ = ('children', 'counts', 'maxes')
+
+    def __init__(self, children, counts, maxes):
+        self.children = children
+        self.counts = counts
+        self.maxes = maxes
+
+
+def bplus_size(node):
+    return len(node.values) if isinstance(node, BPlusLeaf) else sum(node.counts)
+
+
+def bplus_max(node):
+    return node.values[-1] if isinstance(node, BPlusLeaf) else node.maxes[-1]
+
+
+class BPlusTreeList(OrderStatisticBackend):
+    """
+    Order-statistic B+-tree: the values are kept in sorted leaves of up to 'leaf_size' values (linked to each
+    other for iteration and for the neighbour lookup of insert_locate()), and each inner node keeps the value
+    count and the maximum of each of its (up to 'fanout') children. Searches by value descend along the maxima,
+    positional access descends along the counts; both take O(log n) and, unlike SortedList, never need to rebuild
+    a positional index after an insertion or deletion - every mutation only updates the counts on its path.
+    Full nodes are split in halves; nodes are removed when they become empty (underfull nodes are not merged).
+    """
+    _root = None
+    _first = None
+    _len = 0
+    _leaf_size = 256
+    _fanout = 64
+
+    def __init__(self, iterable=None, leaf_size=256, fanout=64):
+        """
+        :param iterable: initial values
+        :param leaf_size: maximum number of values per leaf
+        :param fanout: maximum number of children per inner node
+        """
+        assert leaf_size >= 4 and fanout >= 4
+        self._leaf_size = leaf_size
+        self._fanout = fanout
+        self.reset(sorted(iterable) if iterable is not None else [])
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        return chain.from_iterable(leaf.values for leaf in self._leaves())
+
+    def __contains__(self, value):
+        try:
+            self.index(value)
+        except ValueError:
+            return False
+        return True
+
+    def _leaves(self):
+        leaf = self._first
+        while leaf is not None:
+            yield leaf
+            leaf = leaf.next
+
+    def reset(self, values):
+        values = list(values)
+        self._len = len(values)
+        leaf_size = self._leaf_size
+        leaves = [BPlusLeaf(values[pos:pos+leaf_size]) for pos in range(0, len(values), leaf_size)]
+        if len(leaves) <= 0:
+            leaves = [BPlusLeaf([])]
+        for leaf, next_leaf in zip(leaves[:-1], leaves[1:]):
+            leaf.next = next_leaf
+            next_leaf.prev = leaf
+        self._first = leaves[0]
+        level = leaves
+        while len(level) > 1:
+            level = [BPlusInner(group, [bplus_size(child) for child in group], [bplus_max(child) for child in group])
+                     for group in [level[pos:pos+self._fanout] for pos in range(0, len(level), self._fanout)]]
+        self._root = level[0]
+
+    def update(self, iterable):
+        values = list(self)
+        values.extend(iterable)
+        values.sort()
+        self.reset(values)
+
+    def _descend_value(self, value, right=True):
+        """
+        :return: tuple (path, leaf, idx, offset) - the (inner node, child index) pairs from the root down, the leaf
+                 and the bisect position of 'value' in the leaf, and the number of values before the leaf
+        """
+        bisect = bisect_right if right else bisect_left
+        path = []
+        offset = 0
+        node = self._root
+        while isinstance(node, BPlusInner):
+            i = bisect(node.maxes, value)
+            if i == len(node.children):
+                i -= 1
+            offset += sum(node.counts[:i])
+            path.append((node, i))
+            node = node.children[i]
+        return path, node, bisect(node.values, value), offset
+
+    def _descend_index(self, index):
+        """
+        :return: tuple (path, leaf, idx) - the (inner node, child index) pairs from the root down, the leaf and the
+                 position within the leaf of the value at 'index'
+        """
+        if index < 0:
+            index += self._len
+        if index < 0 or index >= self._len:
+            raise IndexError("BPlusTreeList index out of range")
+        path = []
+        node = self._root
+        while isinstance(node, BPlusInner):
+            counts = node.counts
+            i = 0
+            while index >= counts[i]:
+                index -= counts[i]
+                i += 1
+            path.append((node, i))
+            node = node.children[i]
+        return path, node, index
+
+    def _update_maxes(self, path, child):
+        # -- a changed maximum only propagates upwards as long as the child is the last one of its parent -- #
+        for node, i in reversed(path):
+            node.maxes[i] = bplus_max(child)
+            if i != len(node.children)-1:
+                break
+            child = node
+
+    def _split(self, path, node):
+        while True:
+            if isinstance(node, BPlusLeaf):
+                if len(node.values) <= self._leaf_size:
+                    return
+                half = len(node.values) // 2
+                new_node = BPlusLeaf(node.values[half:])
+                del node.values[half:]
+                new_node.prev = node
+                new_node.next = node.next
+                if node.next is not None:
+                    node.next.prev = new_node
+                node.next = new_node
+            else:
+                if len(node.children) <= self._fanout:
+                    return
+                half = len(node.children) // 2
+                new_node = BPlusInner(node.children[half:], node.counts[half:], node.maxes[half:])
+                del node.children[half:]
+                del node.counts[half:]
+                del node.maxes[half:]
+            if len(path) <= 0:
+                self._root = BPlusInner([node, new_node], [bplus_size(node), bplus_size(new_node)],
+                                        [bplus_max(node), bplus_max(new_node)])
+                return
+            parent, i = path.pop()
+            parent.children.insert(i+1, new_node)
+            parent.counts[i] = bplus_size(node)
+            parent.counts.insert(i+1, bplus_size(new_node))
+            parent.maxes[i] = bplus_max(node)
+            parent.maxes.insert(i+1, bplus_max(new_node))
+            node = parent
+
+    def _remove_empty(self, path, leaf):
+        if leaf.prev is not None:
+            leaf.prev.next = leaf.next
+        if leaf.next is not None:
+            leaf.next.prev = leaf.prev
+        if leaf is self._first:
+            self._first = leaf.next
+        while len(path) > 0:
+            parent, i = path.pop()
+            del parent.children[i]
+            del parent.counts[i]
+            del parent.maxes[i]
+            if len(parent.children) > 0:
+                if i == len(parent.children):
+                    self._update_maxes(path, parent)
+                break
+        else:
+            self._root = BPlusLeaf([])
+            self._first = self._root
+        while isinstance(self._root, BPlusInner) and len(self._root.children) == 1:
+            self._root = self._root.children[0]
+
+    def insert_locate(self, value):
+        path, leaf, idx, offset = self._descend_value(value)
+        values = leaf.values
+        if idx > 0:
+            prev_value = values[idx-1]
+        elif leaf.prev is not None:
+            prev_value = leaf.prev.values[-1]
+        else:
+            prev_value = None
+        if idx < len(values):
+            next_value = values[idx]
+        elif leaf.next is not None:
+            next_value = leaf.next.values[0]
+        else:
+            next_value = None
+        values.insert(idx, value)
+        self._len += 1
+        for node, i in path:
+            node.counts[i] += 1
+        if idx == len(values)-1:
+            self._update_maxes(path, leaf)
+        if len(values) > self._leaf_size:
+            self._split(path, leaf)
+        return prev_value, next_value, offset + idx
+
+    def __getitem__(self, index):
+        path, leaf, idx = self._descend_index(index)
+        return leaf.values[idx]
+
+    def pop(self, index=-1):
+        path, leaf, idx = self._descend_index(index)
+        value = leaf.values.pop(idx)
+        self._len -= 1
+        for node, i in path:
+            node.counts[i] -= 1
+        if len(leaf.values) <= 0:
+            self._remove_empty(path, leaf)
+        elif idx == len(leaf.values):
+            self._update_maxes(path, leaf)
+        return value
+
+    def __delitem__(self, index):
+        self.pop(index)
+
+    def bisect_left(self, value):
+        path, leaf, idx, offset = self._descend_value(value, right=False)
+        return offset + idx
+
+    def bisect_right(self, value):
+        path, leaf, idx, offset = self._descend_value(value)
+        return offset + idx
+
+    def index(self, value):
+        path, leaf, idx, offset = self._descend_value(value, right=False)
+        pos = offset + idx
+        while leaf is not None:
+            for item in leaf.values[idx:]:
+                if value < item:
+                    raise ValueError('{0!r} not in list'.format(value))
+                if item is value or item == value:
+                    return pos
+                pos += 1
+            leaf = leaf.next
+            idx = 0
+        raise ValueError('{0!r} not in list'.format(value))
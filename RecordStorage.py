@@ -0,0 +1,656 @@
+import weakref
+from ctypes import c_void_p
+from functools import partial
+
+import numpy as np
+import package_globals
+from Node import NodeBase
+from NodeStorage import NodeStorage
+from parcels_mocks.status import StatusCode as ErrorCode
+
+
+# -- values of the variables that are not given when a particle is added -- #
+RECORD_DEFAULTS = {'time': np.nan, 'dt': np.nan, 'state': ErrorCode.Evaluate}
+# -- grid search indices of JIT particles, kept in one int32 block per index (a row per particle) -- #
+GRID_INDICES = ['xi', 'yi', 'zi', 'ti']
+
+
+class RecordNode(NodeBase):
+    """
+    Handle of a particle in a record storage (see RecordStorage), in place of a node: 'id' is the particle ID,
+    'data' a particle object on the particle's record in the storage (see RecordStorage.view()), and 'prev' /
+    'next' are the handles of the neighbouring particles, looked up in the storage on access.
+    A handle that is not (or no longer) part of a storage keeps its particle data itself, as an unlinked node does -
+    e.g. a new handle before it is added, or a handle returned by remove_many() (see DetachedRecord). Handles are created on demand; the
+    storage owns the IDs of the particles it holds, an unbound handle its own ID.
+    """
+    __slots__ = ('id', '_storage', '_data')
+
+    def __init__(self, prev=None, next=None, id=None, data=None):
+        assert prev is None and next is None, "record handles are linked by their storage"
+        if id is None:
+            self.id = package_globals.idgen.nextID()
+        elif isinstance(id, (int, np.integer)) and id >= 0:
+            self.id = int(id)
+        else:
+            self.id = None
+        self._storage = None
+        self._data = data
+
+    def __deepcopy__(self, memodict={}):
+        result = type(self)(id=-1)
+        result.id = self.id
+        result._storage = self._storage
+        result._data = self._data
+        return result
+
+    def __del__(self):
+        # -- the ID of a stored particle belongs to the storage -- #
+        if self._storage is None and self.id is not None:
+            package_globals.idgen.releaseID(self.id)
+
+    @property
+    def storage(self):
+        """
+        :return: record storage that holds the particle; None for an unbound handle
+        """
+        return self._storage
+
+    @property
+    def data(self):
+        if self._storage is None:
+            if isinstance(self._data, DetachedRecord):
+                self._data = self._data.particle()
+            return self._data
+        return self._storage.view(self.id)
+
+    @data.setter
+    def data(self, data):
+        self.set_data(data)
+
+    @property
+    def prev(self):
+        return None if self._storage is None else self._storage.neighbour(self.id, -1)
+
+    @property
+    def next(self):
+        return None if self._storage is None else self._storage.neighbour(self.id, 1)
+
+    def set_data(self, data):
+        """
+        :param data: particle object - a bound handle copies its variables into the stored record
+        """
+        if self._storage is None:
+            self._data = data
+        else:
+            self._storage.set_record(self.id, data)
+
+    def __eq__(self, other):
+        if type(self) is not type(other):
+            return False
+        if self._storage is not None or other._storage is not None:
+            return self._storage is other._storage and self.id == other.id
+        return super(RecordNode, self).__eq__(other)
+
+    def __ne__(self, other):
+        return not (self == other)
+
+    def __hash__(self):
+        return hash(self.id)
+
+
+class RecordRow(object):
+    """
+    Record of one particle in a record storage, addressed by the particle ID. It takes the place of the 1-element
+    record array ('_cptr') of a particle object, so that the particle's variables (see particle.Variable) read and
+    write the arrays of the storage: indexing with a variable name returns a 1-element view, as for a record array.
+    """
+    __slots__ = ('storage', 'id')
+
+    def __init__(self, storage, id):
+        self.storage = storage
+        self.id = id
+
+    def __getitem__(self, name):
+        return self.storage.field(self.id, name)
+
+    def __setitem__(self, name, value):
+        self.storage.field(self.id, name)[:] = value
+
+    def copy(self):
+        """
+        :return: standalone copy of the record (1-element structured array)
+        """
+        return self.storage.gather([self.storage.row_of(self.id)])
+
+
+def new_particle(view_class, cptr, index_rows=None):
+    """
+    :param view_class: particle class with the variables in '_cptr' (JIT particle class or see record_view_class())
+    :param cptr: record of the particle - 1-element structured array or RecordRow
+    :param index_rows: dict - grid search index name -> int32 row (JIT particles only)
+    :return: particle object on the record (without running the particle constructor)
+    """
+    particle = object.__new__(view_class)
+    particle._cptr = cptr
+    particle._next_dt = None
+    particle.exception = None
+    if index_rows is not None:
+        set_index_rows(particle, index_rows)
+    return particle
+
+
+def set_index_rows(particle, index_rows):
+    for index, index_row in index_rows.items():
+        setattr(particle, index, index_row)
+        setattr(particle, index+'p', index_row.ctypes.data_as(c_void_p))
+
+
+class DetachedRecord(object):
+    """
+    Copy of the record of a removed particle, in the batch of copies of its removal: the particle object is only
+    built when the data of the (unbound) handle is asked for.
+    """
+    __slots__ = ('view_class', 'records', 'index_blocks', 'i')
+
+    def __init__(self, view_class, records, index_blocks, i):
+        self.view_class = view_class
+        self.records = records
+        self.index_blocks = index_blocks
+        self.i = i
+
+    def particle(self):
+        i = self.i
+        return new_particle(self.view_class, self.records[i:i+1],
+                            {index: block[i] for index, block in self.index_blocks.items()})
+
+
+def _get_field(particle, name):
+    return particle._cptr[name][0]
+
+
+def _set_field(particle, value, name):
+    particle._cptr[name] = value
+
+
+_view_classes = {}
+
+
+def record_view_class(pclass):
+    """
+    :param pclass: particle class without JIT support (ScipyParticle or a subclass)
+    :return: subclass of 'pclass' that keeps the variables in a record ('_cptr') instead of instance attributes, as
+             JIT particles do - for particle objects on the records of a record storage
+    """
+    view_class = _view_classes.get(pclass, None)
+    if view_class is None:
+        namespace = {'__module__': pclass.__module__}
+        for v in pclass.getPType().variables:
+            namespace['_'+v.name] = property(partial(_get_field, name=v.name), partial(_set_field, name=v.name))
+        view_class = type(pclass.__name__ + 'Record', (pclass,), namespace)
+        _view_classes[pclass] = view_class
+    return view_class
+
+
+class RecordStorage(NodeStorage):
+    """
+    Base class of the record storages (see NodeStorage): the particle data is kept in arrays of the storage, which
+    hands out RecordNode handles in place of nodes, and particle objects on the stored records (see view()) as their
+    data. The ParticleSet and its kernels hence use a record storage like any node storage - without a node or a
+    particle object per stored particle, unless one is asked for.
+
+    The subclasses define the layout of the arrays (_store(), _drop(), _field(), ...); this class keeps the map from
+    IDs to rows, the rows in ID order (built lazily in one vectorised pass, see _order()) and the particle views.
+    JIT particles that are added become views: their record moves into the storage, as with the block nodes of an
+    unrolled list (see BlockNode.BlockNodeJIT.insert()). Other particle objects are copied.
+    """
+    dtype = RecordNode
+    node_based = False
+    _pclass = None
+    _ptype = None
+    _view_class = None
+    _record_dtype = None
+    _default_record = None
+    _ngrids = 1
+    _initial_capacity = 1024
+    _slot_of = {}
+    _views = None
+    _index_blocks = {}
+    _order_ids = None
+    _order_rows = None
+    _tail_ids = []
+    _tail_rows = []
+    _max_id = -1
+
+    def __init__(self, pclass=None, capacity=1024, ngrids=1, dtype=None):
+        """
+        :param pclass: particle class of the stored particles; if None, it is set by the ParticleSet (see attach())
+        :param capacity: initial number of rows
+        :param ngrids: number of grids of the fieldset (length of the grid search index arrays of JIT particles)
+        :param dtype: node class requested by the ParticleSet - ignored (record storages hand out RecordNodes)
+        """
+        assert capacity > 0
+        self._initial_capacity = capacity
+        self._ngrids = ngrids
+        self._slot_of = {}
+        self._views = weakref.WeakValueDictionary()
+        self._index_blocks = {}
+        self._invalidate_order()
+        self._max_id = -1
+        if pclass is not None:
+            self.attach(pclass, ngrids)
+
+    def attach(self, pclass, ngrids):
+        if self._pclass is not None:
+            assert pclass.getPType().dtype == self._record_dtype, "storage holds particles of another type"
+            return
+        self._pclass = pclass
+        self._ptype = pclass.getPType()
+        self._record_dtype = self._ptype.dtype
+        self._default_record = np.zeros(1, dtype=self._record_dtype)
+        for v in self._ptype.variables:
+            if v.dtype != np.uint64:
+                self._default_record[v.name] = RECORD_DEFAULTS.get(v.name, 0)
+        self._ngrids = ngrids
+        self._view_class = pclass if self._ptype.uses_jit else record_view_class(pclass)
+        capacity = self._initial_capacity
+        if self._ptype.uses_jit:
+            self._index_blocks = {index: np.zeros((capacity, ngrids), dtype=np.int32) for index in GRID_INDICES}
+        self._allocate(capacity)
+
+    def __del__(self):
+        if self._ptype is not None:
+            self.clear()
+
+    # ==== layout of the subclasses ==== #
+    def _allocate(self, capacity):
+        """Sets up the (empty) arrays for 'capacity' particles."""
+        raise NotImplementedError
+
+    def _store(self, records, index_rows):
+        """
+        Writes new particles into free rows (growing the arrays if needed).
+        :param records: structured array of the particle records (ptype.dtype), sorted by ID
+        :param index_rows: dict - grid search index name -> int32 array (one row per particle)
+        :return: int64 array of the rows of the particles
+        """
+        raise NotImplementedError
+
+    def _write(self, rows, records):
+        """Overwrites the records at the given rows (except for the pointer variables)."""
+        raise NotImplementedError
+
+    def _drop(self, rows):
+        """Frees the given rows."""
+        raise NotImplementedError
+
+    def _field(self, row, name):
+        """:return: 1-element view of a variable at a row"""
+        raise NotImplementedError
+
+    def _build_order(self):
+        """:return: tuple (ids, rows) - int64 arrays of the stored IDs and their rows, in ID order"""
+        raise NotImplementedError
+
+    def _reset(self):
+        """Drops all rows."""
+        raise NotImplementedError
+
+    def _set_index_pointers(self, index, pointers):
+        """Sets the pointer variable of a grid search index ('c'+index) of all rows."""
+        raise NotImplementedError
+
+    # ==== grid search index blocks (JIT particles) ==== #
+    def _grow_index_blocks(self, capacity, nrows):
+        """
+        Enlarges the grid search index blocks to 'capacity' rows, keeping the first 'nrows' rows.
+        """
+        for index, block in self._index_blocks.items():
+            new_block = np.zeros((capacity, self._ngrids), dtype=np.int32)
+            new_block[:nrows] = block[:nrows]
+            self._index_blocks[index] = new_block
+        self._refresh_index_pointers()
+
+    def _fit_ngrids(self, ngrids):
+        """
+        Adapts the width of the grid search index blocks to the particles that are added (the fieldset may have got
+        grids after the storage was set up).
+        """
+        if ngrids == self._ngrids or len(self._index_blocks) <= 0:
+            return
+        assert len(self) == 0, "particles with {} grid indices can't join ones with {}".format(ngrids, self._ngrids)
+        self._ngrids = ngrids
+        self._grow_index_blocks(len(next(iter(self._index_blocks.values()))), 0)
+
+    def _refresh_index_pointers(self):
+        """Points the pointer variables (cxi, ...) of all rows to their rows of the index blocks; rebinds the views."""
+        for index, block in self._index_blocks.items():
+            n = block.shape[0]
+            self._set_index_pointers(index, np.uint64(block.ctypes.data) + np.arange(n, dtype=np.uint64) * np.uint64(block.strides[0]))
+        self._rebind_views()
+
+    def _bind_indices(self, particle, row):
+        set_index_rows(particle, {index: block[row] for index, block in self._index_blocks.items()})
+
+    def _rebind_views(self):
+        """Points the grid search indices of the particle views to the current rows (after rows moved)."""
+        if len(self._index_blocks) <= 0:
+            return
+        for id, particle in list(self._views.items()):
+            self._bind_indices(particle, self._slot_of[id])
+
+    # ==== positions in ID order ==== #
+    def _invalidate_order(self):
+        self._order_ids = None
+        self._order_rows = None
+        self._tail_ids = []
+        self._tail_rows = []
+
+    def _order(self):
+        """
+        :return: tuple (ids, rows) - arrays of the stored IDs and their rows in ID order; built lazily (particles
+                 appended with ascending IDs are only collected until the next call)
+        """
+        if self._order_ids is None:
+            self._order_ids, self._order_rows = self._build_order()
+            self._tail_ids = []
+            self._tail_rows = []
+            self._max_id = int(self._order_ids[-1]) if len(self._order_ids) > 0 else -1
+        elif len(self._tail_ids) > 0:
+            self._order_ids = np.concatenate([self._order_ids, np.array(self._tail_ids, dtype=np.int64)])
+            self._order_rows = np.concatenate([self._order_rows, np.array(self._tail_rows, dtype=np.int64)])
+            self._tail_ids = []
+            self._tail_rows = []
+        return self._order_ids, self._order_rows
+
+    def _note_inserted(self, ids, rows):
+        """Keeps the positions up to date for new particles (ids sorted)."""
+        if self._order_ids is not None:
+            if ids[0] > self._max_id:
+                self._tail_ids.extend(ids.tolist())
+                self._tail_rows.extend(rows.tolist())
+            elif len(ids) == 1:
+                order_ids, order_rows = self._order()
+                pos = np.searchsorted(order_ids, ids[0])
+                self._order_ids = np.insert(order_ids, pos, ids[0])
+                self._order_rows = np.insert(order_rows, pos, rows[0])
+            else:
+                self._invalidate_order()
+        self._max_id = max(self._max_id, int(ids[-1]))
+
+    # ==== particle views ==== #
+    def view(self, id):
+        """
+        :param id: particle ID
+        :return: particle object on the record of that particle (one per particle, as long as it is referenced)
+        """
+        particle = self._views.get(id, None)
+        if particle is None:
+            particle = new_particle(self._view_class, RecordRow(self, id))
+            self._bind_indices(particle, self._slot_of[id])
+            self._views[id] = particle
+        return particle
+
+    def field(self, id, name):
+        """
+        :return: 1-element view of a variable of the particle with ID 'id'
+        """
+        return self._field(self._slot_of[id], name)
+
+    def row_of(self, id):
+        """
+        :param id: particle ID
+        :return: row of the particle with that ID; None if there is no such particle
+        """
+        return self._slot_of.get(id, None)
+
+    def gather(self, rows):
+        """
+        :param rows: rows of particles
+        :return: structured array (ptype.dtype) with copies of their records
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        records = np.zeros(len(rows), dtype=self._record_dtype)
+        for v in self._ptype.variables:
+            records[v.name] = self._field_column(v.name)[rows]
+        return records
+
+    def _field_column(self, name):
+        """:return: array of a variable over all rows"""
+        raise NotImplementedError
+
+    def set_record(self, id, particle):
+        """
+        Copies the variables (and grid search indices) of a particle object into the record of the particle with
+        ID 'id' (which is kept).
+        """
+        if particle is self._views.get(id, None):
+            return
+        records, index_rows = self._new_records(np.array([id], dtype=np.int64), [particle])
+        row = self._slot_of[id]
+        self._write(np.array([row], dtype=np.int64), records)
+        for index, block in self._index_blocks.items():
+            block[row] = index_rows[index][0]
+
+    def _new_records(self, ids, particles):
+        """
+        :param ids: IDs of new particles
+        :param particles: their particle objects (None: default values)
+        :return: tuple (records, index_rows) - structured array of the records and dict of the grid search index rows
+        """
+        n = len(ids)
+        given = [i for i, particle in enumerate(particles) if particle is not None]
+        if len(given) > 0 and len(self._index_blocks) > 0:
+            self._fit_ngrids(len(particles[given[0]].xi))
+        records = np.repeat(self._default_record, n)
+        index_rows = {index: np.full((n, self._ngrids), -1 if index == 'ti' else 0, dtype=np.int32)
+                      for index in self._index_blocks}
+        if len(given) > 0:
+            particles = [particles[i] for i in given]
+            if self._ptype.uses_jit and all(isinstance(p.get_cptr(), np.ndarray) for p in particles):
+                records[given] = np.concatenate([p.get_cptr() for p in particles])
+            else:
+                for v in self._ptype.variables:
+                    if v.dtype != np.uint64:
+                        values = [getattr(p, v.name) for p in particles]
+                        records[v.name][given] = np.concatenate(values) if self._ptype.uses_jit else values
+            for index in self._index_blocks:
+                index_rows[index][given] = np.stack([getattr(p, index) for p in particles])
+        records['id'] = ids
+        return records, index_rows
+
+    # ==== protocol ==== #
+    def __len__(self):
+        return len(self._slot_of)
+
+    def __contains__(self, id):
+        return id in self._slot_of
+
+    def _handle(self, id):
+        node = RecordNode(id=id)
+        node._storage = self
+        return node
+
+    def __iter__(self):
+        ids = self._order()[0]
+        return (self._handle(id) for id in ids.tolist())
+
+    def __getitem__(self, index):
+        ids = self._order()[0]
+        return self._handle(int(ids[index]))
+
+    def begin(self):
+        return self[0] if len(self) > 0 else None
+
+    def end(self):
+        return self[-1] if len(self) > 0 else None
+
+    def neighbour(self, id, step):
+        """
+        :param id: ID of a stored particle
+        :param step: -1 (previous particle) or 1 (next particle)
+        :return: handle of the neighbouring particle in ID order; None at either end
+        """
+        ids = self._order()[0]
+        pos = int(np.searchsorted(ids, id)) + step
+        if pos < 0 or pos >= len(ids):
+            return None
+        return self._handle(int(ids[pos]))
+
+    def bisect_id(self, id):
+        return int(np.searchsorted(self._order()[0], id, side='left'))
+
+    def bisect_left(self, node):
+        """
+        :param node: handle or particle ID
+        :return: position of the particle (or of the first one with a higher ID)
+        """
+        return self.bisect_id(node.id if isinstance(node, NodeBase) else node)
+
+    def get_by_id(self, id):
+        return self._handle(id) if id in self._slot_of else None
+
+    def _as_node(self, val):
+        if isinstance(val, NodeBase):
+            assert isinstance(val, RecordNode) and val._storage is None, "only unbound record handles can be added"
+            return val
+        elif isinstance(val, (int, np.integer)):
+            return RecordNode(id=val)
+        return RecordNode(data=val)
+
+    def _insert(self, nodes, values=None, copy=False):
+        """
+        Stores the particles of unbound handles and binds the handles to this storage.
+        :param nodes: unbound handles, sorted by ID
+        :param values: values of variables (by name; scalars or arrays over the batch), overriding the particle data
+        :param copy: if True, JIT particles are copied even if they have a record of their own (see update())
+        :return: int64 array of the rows of the particles
+        """
+        assert self._ptype is not None, "the storage needs a particle class first (see attach())"
+        ids = np.array([node.id for node in nodes], dtype=np.int64)
+        particles = [node.data for node in nodes]
+        records, index_rows = self._new_records(ids, particles)
+        if values:
+            for name, value in values.items():
+                records[name] = value
+        nstored = len(self._slot_of)
+        rows = self._store(records, index_rows)
+        self._slot_of.update(zip(ids.tolist(), rows.tolist()))
+        assert len(self._slot_of) == nstored + len(nodes), "particle IDs are already in the storage"
+        for node, particle, row in zip(nodes, particles, rows.tolist()):
+            node._storage = self
+            node._data = None
+            # -- a JIT particle with a record of its own is taken over: it becomes the view of its stored record -- #
+            if not copy and self._ptype.uses_jit and isinstance(particle, self._pclass) and \
+                    isinstance(particle.get_cptr(), np.ndarray):
+                particle._cptr = RecordRow(self, node.id)
+                self._bind_indices(particle, row)
+                self._views[node.id] = particle
+        self._note_inserted(ids, rows)
+        return rows
+
+    def add_locate(self, val):
+        node = self._as_node(val)
+        tail = node.id > self._max_id
+        self._insert([node])
+        if tail:
+            index = len(self) - 1
+            prev_node = self._handle(self._last_before(node.id)) if index > 0 else None
+            return prev_node, None, index
+        index = self.bisect_id(node.id)
+        prev_node = self[index-1] if index > 0 else None
+        next_node = self[index+1] if index+1 < len(self) else None
+        return prev_node, next_node, index
+
+    def _last_before(self, id):
+        """:return: highest stored ID below 'id' (which has just been appended at the end)"""
+        if len(self._tail_ids) > 1:
+            return self._tail_ids[-2]
+        if len(self._tail_ids) == 1:
+            return int(self._order_ids[-1])
+        return int(self._order()[0][-2])
+
+    def update(self, iterable, copy=False):
+        """
+        Inserts a batch of particles (see NodeStorage.update()).
+        :param iterable: unbound handles, particle IDs (int) or particle objects
+        :param copy: if True, JIT particles are copied instead of taken over - for particles that stay in another set
+        """
+        nodes = sorted((self._as_node(val) for val in iterable), key=lambda node: node.id)
+        if len(nodes) > 0:
+            self._insert(nodes, copy=copy)
+
+    def adopt_chain(self, nodes):
+        """Record storages have no chain to take over - the (unbound) handles are inserted as a batch."""
+        assert len(self) == 0
+        self.update(nodes)
+
+    def remove_many(self, indices_or_mask):
+        ids, rows = self._order()
+        indices_or_mask = np.asarray(indices_or_mask)
+        if indices_or_mask.dtype == np.bool_:
+            assert indices_or_mask.shape == (len(ids),)
+            positions = np.flatnonzero(indices_or_mask)
+        else:
+            positions = np.unique(indices_or_mask.astype(np.int64))
+        if len(positions) <= 0:
+            return []
+        return self._remove(ids[positions], rows[positions])
+
+    def remove(self, node):
+        """
+        Removes a single particle, in O(1) (the positions in ID order are rebuilt lazily).
+        :param node: handle or particle ID
+        :return: unbound handle of the removed particle
+        """
+        id = node.id if isinstance(node, NodeBase) else int(node)
+        row = self._slot_of.get(id, None)
+        if row is None:
+            raise ValueError('particle {} not in storage'.format(id))
+        return self._remove(np.array([id], dtype=np.int64), np.array([row], dtype=np.int64))[0]
+
+    def _remove(self, ids, rows):
+        """
+        Hands the particles at the given rows out of the storage: each one gets an unbound handle (that owns its ID)
+        with a copy of its record. Particles with a view keep it (pointed to the copy); for the others, the particle
+        object is only built on access (see DetachedRecord).
+        :return: list of the handles
+        """
+        records = self.gather(rows)
+        index_blocks = {index: block[rows] for index, block in self._index_blocks.items()}
+        victims = []
+        for i, id in enumerate(ids.tolist()):
+            data = DetachedRecord(self._view_class, records, index_blocks, i)
+            particle = self._views.pop(id, None)
+            if particle is not None:
+                particle._cptr = records[i:i+1]
+                set_index_rows(particle, {index: block[i] for index, block in index_blocks.items()})
+                data = particle
+            del self._slot_of[id]
+            victims.append(RecordNode(id=id, data=data))
+        self._invalidate_order()
+        self._drop(rows)
+        return victims
+
+    def pop(self, idx=-1, deepcopy_elem=False):
+        return self.remove(int(self._order()[0][idx]))
+
+    def __delitem__(self, index):
+        self.pop(index)
+
+    def deleted_mask(self):
+        return self._field_column('state')[self._order()[1]] == ErrorCode.Delete
+
+    def clear(self):
+        """Removes all particles (releasing their IDs); particle views that are still referenced keep copies."""
+        if len(self._views) > 0:
+            for particle in list(self._views.values()):
+                set_index_rows(particle, {index: getattr(particle, index).copy() for index in self._index_blocks})
+                particle._cptr = particle._cptr.copy()
+            self._views = weakref.WeakValueDictionary()
+        if len(self._slot_of) > 0:
+            package_globals.idgen.releaseIDs(list(self._slot_of.keys()))
+        self._slot_of = {}
+        self._invalidate_order()
+        self._max_id = -1
+        self._reset()
@@ -0,0 +1,479 @@
+import random
+import numpy as np
+from bisect import bisect_left, bisect_right
+from copy import deepcopy
+from Node import NodeBase, Node, NodeCursor, teardown_nodes
+from LinkedList import node_id, relink_range, removal_mask, unlink_masked
+from NodeStorage import NodeStorage
+
+
+class SkipTower(object):
+    """
+    Express lanes of one node in a SkipList: for each level 1..height, the next tower on that level and the
+    number of chain steps ('width') to it. Level 0 is the node chain itself (node.prev / node.next).
+    """
+    __slots__ = ('node', 'next', 'width')
+
+    def __init__(self, node, height):
+        self.node = node
+        self.next = [None] * height
+        self.width = [0] * height
+
+
+class SkipList(NodeStorage):
+    """
+    Indexable skip list over a chain of nodes, sorted by node ID. The bottom level of the skip list is the node
+    chain itself - only the promoted nodes (on average 1 in 'promotion') carry express lanes (SkipTower objects)
+    to nodes further down the chain. Hence, nodes are found by ID or by position in O(log n) without keeping a
+    separate SortedList of all nodes, and without any extra attribute on the nodes themselves (which means that
+    all node classes, including the __slots__-based compact ones, can be stored).
+
+    The container offers the RealList operations used by the ParticleSet (add, remove, pop, index access,
+    bisect_left/right, iteration), plus O(1) begin() and end().
+    """
+    dtype = None
+    _head = None
+    _begin = None
+    _end = None
+    _len = 0
+    _height = 0
+    _promotion = 4
+    _max_height = 32
+
+    def __init__(self, iterable=None, dtype=Node, promotion=4, max_height=32):
+        """
+        :param iterable: nodes to add initially
+        :param dtype: node class of the list
+        :param promotion: inverse probability of promoting a node to the next-higher level
+        :param max_height: maximum number of express lane levels
+        """
+        assert promotion >= 2
+        self.dtype = dtype
+        self._promotion = promotion
+        self._max_height = max_height
+        self._head = SkipTower(None, max_height)
+        self._height = 0
+        self._begin = None
+        self._end = None
+        self._len = 0
+        if iterable is not None:
+            for node in iterable:
+                self.add(node)
+
+    def __del__(self):
+        self.clear()
+
+    def clear(self):
+        """Remove all the elements from the list (bulk teardown of the nodes, see Node.teardown_nodes())."""
+        n = self._len
+        if n > 0:
+            print("Deleting {} elements ...".format(n))
+            nodes = list(NodeCursor(self._begin))
+            self._begin = None
+            self._end = None
+            teardown_nodes(nodes)
+            del nodes
+        self._head = SkipTower(None, self._max_height)
+        self._height = 0
+        self._begin = None
+        self._end = None
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        return NodeCursor(self._begin)
+
+    def __reversed__(self):
+        return NodeCursor(self._end, backward=True)
+
+    def __contains__(self, node):
+        if not isinstance(node, NodeBase) or node.id is None:
+            return False
+        return self.get_by_id(node.id) is node
+
+    def begin(self):
+        return self._begin
+
+    def end(self):
+        return self._end
+
+    def _random_height(self):
+        height = 0
+        while height < self._max_height and random.randrange(self._promotion) == 0:
+            height += 1
+        return height
+
+    def _locate(self, id):
+        """
+        Searches the last node with an ID lower than 'id'.
+        :param id: search ID
+        :return: tuple (update, positions, prev_node, prev_pos): the last tower before the search position on each
+                 express lane level and its chain position; the last node before the search position (None if the
+                 search position is the begin of the list) and its chain position (-1 for the begin of the list)
+        """
+        update = [self._head] * self._max_height
+        positions = [-1] * self._max_height
+        tower = self._head
+        pos = -1
+        for level in range(self._height-1, -1, -1):
+            next_tower = tower.next[level]
+            while next_tower is not None and next_tower.node.id < id:
+                pos += tower.width[level]
+                tower = next_tower
+                next_tower = tower.next[level]
+            update[level] = tower
+            positions[level] = pos
+        prev_node = tower.node
+        next_node = prev_node.next if prev_node is not None else self._begin
+        while next_node is not None and next_node.id < id:
+            prev_node = next_node
+            next_node = next_node.next
+            pos += 1
+        return update, positions, prev_node, pos
+
+    def _node_at(self, index):
+        tower = self._head
+        pos = -1
+        for level in range(self._height-1, -1, -1):
+            next_tower = tower.next[level]
+            while next_tower is not None and pos + tower.width[level] <= index:
+                pos += tower.width[level]
+                tower = next_tower
+                next_tower = tower.next[level]
+        node = tower.node
+        if node is None:
+            node = self._begin
+            pos = 0
+        while pos < index:
+            node = node.next
+            pos += 1
+        return node
+
+    def _normalize_index(self, index):
+        if index < 0:
+            index += self._len
+        if index < 0 or index >= self._len:
+            raise IndexError("SkipList index out of range")
+        return index
+
+    def __getitem__(self, index):
+        index = self._normalize_index(index)
+        if index == 0:
+            return self._begin
+        if index == self._len-1:
+            return self._end
+        return self._node_at(index)
+
+    def __delitem__(self, index):
+        self.remove(self.__getitem__(index))
+
+    def get_by_id(self, id):
+        """
+        :param id: search node ID
+        :return: node with that ID; None if there is no such node
+        """
+        update, positions, prev_node, pos = self._locate(id)
+        node = prev_node.next if prev_node is not None else self._begin
+        if node is not None and node.id == id:
+            return node
+        return None
+
+    def bisect_left(self, value):
+        """
+        :param value: node or ID
+        :return: position of the first node with an ID not lower than the one of 'value'
+        """
+        id = value.id if isinstance(value, NodeBase) else value
+        return self._locate(id)[3] + 1
+
+    def bisect_id(self, id):
+        """
+        :param id: search node ID
+        :return: position of the first node with an ID not lower than 'id' (see NodeStorage.bisect_id())
+        """
+        return self.bisect_left(id)
+
+    def bisect_right(self, value):
+        """
+        :param value: node or ID
+        :return: position after the last node with an ID not greater than the one of 'value'
+        """
+        id = value.id if isinstance(value, NodeBase) else value
+        update, positions, prev_node, pos = self._locate(id)
+        node = prev_node.next if prev_node is not None else self._begin
+        index = pos + 1
+        while node is not None and node.id == id:
+            node = node.next
+            index += 1
+        return index
+
+    def index(self, node):
+        """
+        :param node: node of this list
+        :return: position of the node in the list
+        """
+        update, positions, prev_node, pos = self._locate(node.id)
+        next_node = prev_node.next if prev_node is not None else self._begin
+        if next_node is not node:
+            raise ValueError('{0!r} not in list'.format(node))
+        return pos + 1
+
+    def _make_node(self, val):
+        if isinstance(val, NodeBase):
+            assert type(val) == self.dtype
+            return val
+        elif isinstance(val, (int, np.integer)):
+            return self.dtype(id=int(val))
+        return self.dtype(data=val)
+
+    def add(self, val):
+        """
+        Inserts a node (or creates a node for an ID or data object) at its sorted position, linking it into the
+        node chain and into the express lanes.
+        :param val: node, node ID (int) or data object
+        :return: inserted node
+        """
+        node = self._make_node(val)
+        self.add_locate(node)
+        return node
+
+    def add_locate(self, val):
+        """
+        As add(), but returns where the node went (same interface as RealList.add_locate()).
+        :param val: node, node ID (int) or data object
+        :return: tuple (prev_node, next_node, index) - the new neighbours of the node and its position in the list
+        """
+        node = self._make_node(val)
+        update, positions, prev_node, pos = self._locate(node.id)
+        next_node = prev_node.next if prev_node is not None else self._begin
+        node.link_between(prev_node, next_node)
+        if prev_node is None:
+            self._begin = node
+        if next_node is None:
+            self._end = node
+        index = pos + 1
+        height = self._random_height()
+        tower = SkipTower(node, height) if height > 0 else None
+        while self._height < height:
+            # -- a new level starts with a lane from the head to the end of the list (at the virtual position len) -- #
+            self._head.width[self._height] = self._len + 1
+            self._height += 1
+        for level in range(self._height):
+            before = update[level]
+            if level < height:
+                # -- split the lane of 'before' at the new node -- #
+                tower.next[level] = before.next[level]
+                tower.width[level] = before.width[level] - (index - positions[level]) + 1
+                before.next[level] = tower
+                before.width[level] = index - positions[level]
+            else:
+                before.width[level] += 1
+        self._len += 1
+        return prev_node, next_node, index
+
+    def adopt_chain(self, nodes):
+        """
+        Indexes an already linked chain of nodes, sorted by ID, in a single pass (the nodes are not relinked).
+        The list has to be empty.
+        :param nodes: sequence of the nodes in chain order
+        """
+        assert self._len == 0
+        n = len(nodes)
+        if n <= 0:
+            return
+        # -- last tower on each level and its chain position (the head sits at position -1) -- #
+        last = [self._head] * self._max_height
+        last_pos = [-1] * self._max_height
+        for index, node in enumerate(nodes):
+            height = self._random_height()
+            if height <= 0:
+                continue
+            tower = SkipTower(node, height)
+            for level in range(height):
+                last[level].next[level] = tower
+                last[level].width[level] = index - last_pos[level]
+                last[level] = tower
+                last_pos[level] = index
+            self._height = max(self._height, height)
+        # -- the last lane of each level ends at the virtual position len -- #
+        for level in range(self._height):
+            last[level].width[level] = n - last_pos[level]
+        self._begin = nodes[0]
+        self._end = nodes[-1]
+        self._len = n
+
+    def _trim_height(self):
+        while self._height > 0 and self._head.next[self._height-1] is None:
+            self._height -= 1
+
+    def split_at(self, id):
+        """
+        Splits the list before the first node with an ID not lower than 'id': this list keeps the lower nodes, the
+        others move to a new list of the same kind. The chain is cut in O(1), and the express lanes are cut where
+        they cross the split position - in O(log n), like a search.
+        :param id: lowest node ID of the upper part
+        :return: tuple (lower list, upper list) - this list and the new one
+        """
+        other = type(self)(dtype=self.dtype, promotion=self._promotion, max_height=self._max_height)
+        update, positions, prev_node, pos = self._locate(id)
+        index = pos + 1
+        if index >= self._len:
+            return self, other
+        nlower = index
+        for level in range(self._height):
+            before = update[level]
+            # -- the lane of 'before' crosses the split: its far end moves to the head of the new list -- #
+            other._head.next[level] = before.next[level]
+            other._head.width[level] = positions[level] + before.width[level] - index + 1
+            before.next[level] = None
+            before.width[level] = nlower - positions[level]
+        other._height = self._height
+        other._trim_height()
+        self._trim_height()
+        first = prev_node.next if prev_node is not None else self._begin
+        first.splice(self._end, None, None)
+        other._begin = first
+        other._end = self._end
+        other._len = self._len - nlower
+        self._begin = self._begin if nlower > 0 else None
+        self._end = prev_node
+        self._len = nlower
+        return self, other
+
+    def concat(self, other):
+        """
+        Moves all nodes of another skip list into this one (the other list is empty afterwards). If all IDs of the
+        other list are greater than the ones of this list, the chains are joined in O(1) and the express lanes of
+        the other list are hooked into the last towers of this one in O(log n); otherwise, the nodes are merged
+        (see update()).
+        :param other: skip list of the same node class
+        :return: this list
+        """
+        assert other.dtype == self.dtype
+        if other._len <= 0:
+            return self
+        nodes_begin, nodes_end, n = other._begin, other._end, other._len
+        if self._len > 0 and not (self._end.id < nodes_begin.id):
+            nodes = list(NodeCursor(nodes_begin))
+            other._reset()
+            self.update(nodes)
+            return self
+        # -- the last tower on each level (and its position) is found by a search past the end of the list -- #
+        update, positions = [self._head] * self._max_height, [-1] * self._max_height
+        if self._len > 0:
+            update, positions, prev_node, pos = self._locate(self._end.id + 1)
+        height = max(self._height, other._height)
+        for level in range(height):
+            before = update[level]
+            if other._head.next[level] is not None:
+                before.next[level] = other._head.next[level]
+                before.width[level] = self._len - positions[level] + other._head.width[level] - 1
+            else:
+                before.next[level] = None
+                before.width[level] = self._len + n - positions[level]
+        nodes_begin.splice(nodes_end, self._end, None)
+        if self._len <= 0:
+            self._begin = nodes_begin
+        self._end = nodes_end
+        self._len += n
+        self._height = height
+        other._reset()
+        return self
+
+    def _reset(self):
+        """Drops all nodes from the list without tearing them down (they have been moved to another list)."""
+        self._head = SkipTower(None, self._max_height)
+        self._height = 0
+        self._begin = None
+        self._end = None
+        self._len = 0
+
+    def update(self, iterable):
+        """
+        Inserts a batch of nodes (or creates nodes for IDs or data objects): the batch is sorted once and merged
+        with the chain, the merged range is relinked in a single sweep and the express lanes are rebuilt in one
+        pass (see adopt_chain()). Small batches (below a quarter of the list length) are inserted one by one.
+        :param iterable: nodes, node IDs (int) or data objects
+        """
+        batch = sorted([self._make_node(val) for val in iterable], key=node_id)
+        if len(batch) <= 0:
+            return
+        if len(batch) * 4 < self._len:
+            for node in batch:
+                self.add_locate(node)
+            return
+        merged = list(NodeCursor(self._begin))
+        merged.extend(batch)
+        merged.sort(key=node_id)
+        first = bisect_left(merged, batch[0])
+        last = bisect_right(merged, batch[-1]) - 1
+        relink_range(merged, first, last)
+        self._head = SkipTower(None, self._max_height)
+        self._height = 0
+        self._len = 0
+        self.adopt_chain(merged)
+
+    def remove_many(self, indices_or_mask):
+        """
+        Removes the nodes at the given positions in a single linear pass: all of them are unlinked from the chain
+        in one sweep (see LinkedList.unlink_masked()) and the express lanes are rebuilt once.
+        :param indices_or_mask: array (or list) of positions, or boolean mask over the list
+        :return: list of the removed (unlinked) nodes
+        """
+        nodes = list(NodeCursor(self._begin))
+        survivors, victims = unlink_masked(nodes, removal_mask(indices_or_mask, len(nodes)))
+        if len(victims) > 0:
+            self._head = SkipTower(None, self._max_height)
+            self._height = 0
+            self._len = 0
+            self._begin = None
+            self._end = None
+            self.adopt_chain(survivors)
+        return victims
+
+    def extend(self, iterable):
+        self.update(iterable)
+
+    def append(self, val):
+        return self.add(val)
+
+    def remove(self, node):
+        """
+        Removes (and unlinks) a node of this list.
+        :param node: node to remove
+        """
+        update, positions, prev_node, pos = self._locate(node.id)
+        next_node = prev_node.next if prev_node is not None else self._begin
+        if next_node is not node:
+            raise ValueError('{0!r} not in list'.format(node))
+        for level in range(self._height):
+            before = update[level]
+            tower = before.next[level]
+            if tower is not None and tower.node is node:
+                before.width[level] += tower.width[level] - 1
+                before.next[level] = tower.next[level]
+            else:
+                before.width[level] -= 1
+        if node is self._begin:
+            self._begin = node.next
+        if node is self._end:
+            self._end = node.prev
+        while self._height > 0 and self._head.next[self._height-1] is None:
+            self._height -= 1
+        node.detach()
+        self._len -= 1
+
+    def pop(self, idx=-1, deepcopy_elem=False):
+        """
+        Removes the node at the given position from the list; the (unlinked) node is returned. As for
+        RealList.pop(), 'deepcopy_elem' returns a deep copy of the node instead.
+        :param idx: position
+        :param deepcopy_elem: if True, a deep copy of the removed node is returned
+        :return: removed node
+        """
+        node = self.__getitem__(idx)
+        result = deepcopy(node) if deepcopy_elem else node
+        self.remove(node)
+        return result
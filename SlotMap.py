@@ -0,0 +1,325 @@
+import ctypes
+import numpy as np
+import package_globals
+from codegenerator import SlotMapLoopGenerator
+from OffsetArena import NIL, FREE
+from RecordStorage import RecordStorage, RecordNode
+
+
+class SlotMapHeader(ctypes.Structure):
+    """
+    Header of a SlotMapStorage (SlotMapHeader in node.h): the particle count, the capacity, the first and last slot
+    of the chain and the pointers to the link columns and the particle records - the argument for the compiled
+    particle loop (see codegenerator.SlotMapLoopGenerator).
+    """
+    _fields_ = [('count', ctypes.c_int64),
+                ('capacity', ctypes.c_int64),
+                ('begin', ctypes.c_int64),
+                ('end', ctypes.c_int64),
+                ('prev', ctypes.c_void_p),
+                ('next', ctypes.c_void_p),
+                ('records', ctypes.c_void_p)]
+
+
+class SlotMapStorage(RecordStorage):
+    """
+    Slot map of particle records: a preallocated structured array of the particle type's dtype (slot k holds one
+    particle record), a stack of free slots, and the chain order threaded through two int32 index columns ('prev'
+    and 'next'; NIL ends the chain, FREE marks unused slots). There is no Python object per particle; removing a
+    particle and stepping to a neighbour are O(1). When no slot is free, all columns double in size; slots keep
+    their index.
+
+    As a record storage (see RecordStorage), it can back a ParticleSet: ParticleSet(storage=SlotMapStorage). The
+    chain is kept in ID order: a particle with an ID above all others is linked at the end in O(1), any other one
+    after its predecessor (found by a binary search over the positions, see RecordStorage._order()); a batch (see
+    update()) is linked in one vectorised pass.
+
+    The compiled particle loop follows the 'next' column (see export_c() and codegenerator.SlotMapLoopGenerator).
+    For JIT particle types, the grid search indices (xi, yi, zi, ti) are kept in one int32 block per index with a
+    row per slot; the pointer fields of the records (cxi, ...) point to the rows of these blocks.
+    """
+    loopgen_class = SlotMapLoopGenerator
+    _records = None
+    _prev = None
+    _next = None
+    _free = None
+    _nfree = 0
+    _begin = NIL
+    _end = NIL
+    _header = None
+
+    def __init__(self, pclass=None, capacity=1024, ngrids=1, dtype=None):
+        """
+        :param pclass: particle class of the stored particles; if None, it is set by the ParticleSet (see attach())
+        :param capacity: initial number of slots
+        :param ngrids: number of grids of the fieldset (length of the grid search index arrays of JIT particles)
+        :param dtype: node class requested by the ParticleSet - ignored (see RecordStorage)
+        """
+        self._header = SlotMapHeader()
+        super(SlotMapStorage, self).__init__(pclass=pclass, capacity=capacity, ngrids=ngrids, dtype=dtype)
+
+    @property
+    def capacity(self):
+        return len(self._records)
+
+    @property
+    def records(self):
+        return self._records
+
+    def _allocate(self, capacity):
+        self._records = np.zeros(capacity, dtype=self._record_dtype)
+        self._prev = np.full(capacity, FREE, dtype=np.int32)
+        self._next = np.full(capacity, NIL, dtype=np.int32)
+        # -- the stack is filled in descending order, so that the lowest slots are handed out first -- #
+        self._free = np.arange(capacity - 1, -1, -1, dtype=np.int32)
+        self._nfree = capacity
+        self._begin = NIL
+        self._end = NIL
+        self._refresh_pointers()
+
+    def _set_index_pointers(self, index, pointers):
+        self._records['c'+index] = pointers
+
+    def _refresh_pointers(self):
+        """Points the header and the pointer fields of the records (cxi, ...) to the current arrays."""
+        self._refresh_index_pointers()
+        self._header.capacity = self.capacity
+        self._header.prev = self._prev.ctypes.data
+        self._header.next = self._next.ctypes.data
+        self._header.records = self._records.ctypes.data
+        self._sync_header()
+
+    def _sync_header(self):
+        self._header.count = len(self)
+        self._header.begin = self._begin
+        self._header.end = self._end
+
+    def grow(self, capacity=None):
+        """
+        Enlarges all columns (by default to twice their size); the slots keep their indices, the new slots are
+        pushed onto the free stack.
+        :param capacity: new number of slots
+        """
+        old_capacity = self.capacity
+        capacity = 2 * old_capacity if capacity is None else capacity
+        assert capacity > old_capacity
+        records = np.zeros(capacity, dtype=self._records.dtype)
+        records[:old_capacity] = self._records
+        self._records = records
+        prev = np.full(capacity, FREE, dtype=np.int32)
+        prev[:old_capacity] = self._prev
+        self._prev = prev
+        next = np.full(capacity, NIL, dtype=np.int32)
+        next[:old_capacity] = self._next
+        self._next = next
+        free = np.zeros(capacity, dtype=np.int32)
+        nnew = capacity - old_capacity
+        free[:nnew] = np.arange(capacity - 1, old_capacity - 1, -1, dtype=np.int32)
+        free[nnew:nnew + self._nfree] = self._free[:self._nfree]
+        self._free = free
+        self._nfree += nnew
+        self._grow_index_blocks(capacity, old_capacity)
+        self._refresh_pointers()
+
+    # ==== slots ==== #
+    def _pop_slots(self, n):
+        """
+        Pops n slots from the free stack (growing the columns if there are not enough). The slots are not linked.
+        :return: int64 array of the slot indices
+        """
+        if self._nfree < n:
+            capacity = self.capacity
+            while capacity - len(self) < n:
+                capacity *= 2
+            self.grow(capacity)
+        slots = self._free[self._nfree - n:self._nfree][::-1].astype(np.int64)
+        self._nfree -= n
+        return slots
+
+    def _store(self, records, index_rows):
+        n = len(records)
+        tail_id = int(self._records['id'][self._end]) if self._end != NIL else -1
+        slots = self._pop_slots(n)
+        self._write(slots, records)
+        for index, block in self._index_blocks.items():
+            block[slots] = index_rows[index]
+        if records['id'][0] > tail_id:
+            # -- IDs above all others: the batch is linked at the end of the chain -- #
+            self._prev[slots[1:]] = slots[:-1]
+            self._next[slots[:-1]] = slots[1:]
+            self._prev[slots[0]] = self._end
+            self._next[slots[-1]] = NIL
+            if self._end != NIL:
+                self._next[self._end] = slots[0]
+            else:
+                self._begin = int(slots[0])
+            self._end = int(slots[-1])
+        elif n == 1:
+            ids, rows = self._order()
+            pos = int(np.searchsorted(ids, records['id'][0]))
+            self._link_between(int(slots[0]), int(rows[pos-1]) if pos > 0 else NIL,
+                               int(rows[pos]) if pos < len(rows) else NIL)
+        else:
+            ids, rows = self._order()
+            ids = np.concatenate([ids, records['id'].astype(np.int64)])
+            rows = np.concatenate([rows, slots])
+            self._relink(rows[np.argsort(ids, kind='stable')])
+        self._sync_header()
+        return slots
+
+    def _write(self, rows, records):
+        for v in self._ptype.variables:
+            # -- the pointer fields point to this storage's own grid search index rows -- #
+            if v.dtype != np.uint64:
+                self._records[v.name][rows] = records[v.name]
+
+    def _link_between(self, slot, prev, next):
+        self._prev[slot] = prev
+        self._next[slot] = next
+        if prev != NIL:
+            self._next[prev] = slot
+        else:
+            self._begin = slot
+        if next != NIL:
+            self._prev[next] = slot
+        else:
+            self._end = slot
+
+    def _unlink(self, slot):
+        prev, next = int(self._prev[slot]), int(self._next[slot])
+        assert prev != FREE
+        if prev != NIL:
+            self._next[prev] = next
+        else:
+            self._begin = next
+        if next != NIL:
+            self._prev[next] = prev
+        else:
+            self._end = prev
+
+    def _relink(self, slots):
+        """Links the given slots into one chain, in the given order (one vectorised pass)."""
+        n = len(slots)
+        if n <= 0:
+            self._begin = NIL
+            self._end = NIL
+            return
+        self._prev[slots[1:]] = slots[:-1]
+        self._next[slots[:-1]] = slots[1:]
+        self._prev[slots[0]] = NIL
+        self._next[slots[-1]] = NIL
+        self._begin = int(slots[0])
+        self._end = int(slots[-1])
+
+    def _drop(self, rows):
+        if len(rows) == 1:
+            self._unlink(int(rows[0]))
+        self._prev[rows] = FREE
+        self._next[rows] = NIL
+        self._free[self._nfree:self._nfree + len(rows)] = rows
+        self._nfree += len(rows)
+        if len(rows) > 1:
+            # -- a batch is unlinked by relinking the remaining slots -- #
+            self._order_ids, self._order_rows = self._build_order()
+            self._relink(self._order_rows)
+        self._sync_header()
+
+    def _reset(self):
+        capacity = self.capacity
+        self._prev[:] = FREE
+        self._next[:] = NIL
+        self._free[:] = np.arange(capacity - 1, -1, -1, dtype=np.int32)
+        self._nfree = capacity
+        self._begin = NIL
+        self._end = NIL
+        self._sync_header()
+
+    def _field(self, row, name):
+        return self._records[name][row:row+1]
+
+    def _field_column(self, name):
+        return self._records[name]
+
+    def _build_order(self):
+        slots = np.flatnonzero(self._prev != FREE).astype(np.int64)
+        ids = self._records['id'][slots].astype(np.int64)
+        order = np.argsort(ids, kind='stable')
+        return ids[order], slots[order]
+
+    def add(self, val=None, **values):
+        """
+        Stores a particle in a free slot and links it at its position in the chain (in ID order).
+        :param val: handle, particle ID or particle object to copy the variables (and grid search indices) from;
+                    optional
+        :param values: values of variables (by name) - override the ones of 'val'; variables given neither way get
+                       their default (0, unless listed in RecordStorage.RECORD_DEFAULTS), 'id' a new ID
+        :return: ID of the particle
+        """
+        if val is None:
+            val = values.pop('id') if 'id' in values else package_globals.idgen.nextID()
+        node = self._as_node(val)
+        self._insert([node], values)
+        return node.id
+
+    def remove_deleted(self):
+        """
+        Removes all particles in state ErrorCode.Delete.
+        :return: list of the (unbound) handles of the removed particles
+        """
+        return self.remove_many(self.deleted_mask())
+
+    # ==== access ==== #
+    def neighbour(self, id, step):
+        slot = self._slot_of[id]
+        slot = int(self._next[slot] if step > 0 else self._prev[slot])
+        return self._handle(int(self._records['id'][slot])) if slot != NIL else None
+
+    def begin(self):
+        return self._handle(int(self._records['id'][self._begin])) if self._begin != NIL else None
+
+    def end(self):
+        return self._handle(int(self._records['id'][self._end])) if self._end != NIL else None
+
+    def begin_slot(self):
+        """:return: first slot of the chain; NIL if the storage is empty"""
+        return self._begin
+
+    def end_slot(self):
+        """:return: last slot of the chain; NIL if the storage is empty"""
+        return self._end
+
+    def prev(self, slot):
+        return int(self._prev[slot])
+
+    def next(self, slot):
+        return int(self._next[slot])
+
+    def record(self, slot):
+        """
+        :return: (writable) record view of the slot
+        """
+        return self._records[slot]
+
+    def slots(self, backward=False):
+        """
+        :return: generator over the linked slots, in chain order
+        """
+        slot = self._end if backward else self._begin
+        links = self._prev if backward else self._next
+        while slot != NIL:
+            yield slot
+            slot = int(links[slot])
+
+    def export_c(self, sub_chain=None):
+        """
+        :param sub_chain: SubChain descriptor (see id_range()) - if given, the loop only covers its particles
+        :return: tuple (num_particles, header) - the leading arguments of the compiled particle loop, as for the
+                 node storages (see NodeStorage.export_c())
+        """
+        if sub_chain is None:
+            return len(self), self._header
+        if len(sub_chain) <= 0:
+            return 0, self._header
+        header = SlotMapHeader.from_buffer_copy(self._header)
+        header.begin = self._slot_of[sub_chain.first.id]
+        return len(sub_chain), header
@@ -0,0 +1,263 @@
+import ctypes
+import numpy as np
+import package_globals
+from codegenerator import SoALoopGenerator
+from RecordStorage import RecordStorage, RecordNode, RECORD_DEFAULTS
+
+
+class SoAHeader(ctypes.Structure):
+    """
+    Header of a SoAParticleStorage (SoAHeader in node.h): the row count, the capacity, the first row of the loop, the
+    tombstone flags and the table of column pointers - the argument for the compiled particle loop (see
+    codegenerator.SoALoopGenerator).
+    """
+    _fields_ = [('count', ctypes.c_int64),
+                ('capacity', ctypes.c_int64),
+                ('begin', ctypes.c_int64),
+                ('alive', ctypes.c_void_p),
+                ('columns', ctypes.c_void_p)]
+
+
+# -- values of the columns that are not given when a particle is added -- #
+SOA_DEFAULTS = RECORD_DEFAULTS
+
+
+class SoAParticleStorage(RecordStorage):
+    """
+    Structure-of-arrays particle storage: one numpy column per Variable of the particle type, with spare capacity
+    at the end. Particles are appended into the spare capacity (the columns double in size when they are full),
+    and deleted particles are only flagged as tombstones; the columns are compacted in one vectorised pass once
+    the share of tombstones exceeds 'compact_ratio'. Adding and removing a particle hence take amortised O(1),
+    while each variable stays in one contiguous array - for vectorised numpy operations on the live rows (see
+    column()) as well as for the compiled particle loop (see export_c() and codegenerator.SoALoopGenerator).
+
+    As a record storage (see RecordStorage), it can back a ParticleSet: ParticleSet(storage=SoAParticleStorage).
+    The rows are kept in ID order as long as the particles come in with ascending IDs; a particle with a lower ID
+    (e.g. a reused one) is appended all the same, and the next compaction sorts the rows again (see compact()).
+
+    For JIT particle types, the grid search indices (xi, yi, zi, ti) are kept in one int32 block per index with a
+    row per particle; the pointer columns (cxi, ...) point to the rows of these blocks.
+    """
+    loopgen_class = SoALoopGenerator
+    _columns = {}
+    _alive = None
+    _count = 0
+    _ntombs = 0
+    _sorted = True
+    _compact_ratio = 0.25
+    _header = None
+    _column_ptrs = None
+
+    def __init__(self, pclass=None, capacity=1024, ngrids=1, compact_ratio=0.25, dtype=None):
+        """
+        :param pclass: particle class of the stored particles; if None, it is set by the ParticleSet (see attach())
+        :param capacity: initial number of rows
+        :param ngrids: number of grids of the fieldset (length of the grid search index arrays of JIT particles)
+        :param compact_ratio: share of tombstones among the used rows above which the columns are compacted
+        :param dtype: node class requested by the ParticleSet - ignored (see RecordStorage)
+        """
+        assert 0. < compact_ratio < 1.
+        self._compact_ratio = compact_ratio
+        self._columns = {}
+        self._header = SoAHeader()
+        super(SoAParticleStorage, self).__init__(pclass=pclass, capacity=capacity, ngrids=ngrids, dtype=dtype)
+
+    @property
+    def capacity(self):
+        return len(self._alive)
+
+    @property
+    def tombstones(self):
+        return self._ntombs
+
+    def _allocate(self, capacity):
+        self._columns = {v.name: np.zeros(capacity, dtype=v.dtype) for v in self._ptype.variables}
+        self._alive = np.zeros(capacity, dtype=np.uint8)
+        self._count = 0
+        self._ntombs = 0
+        self._sorted = True
+        self._refresh_pointers()
+
+    def _set_index_pointers(self, index, pointers):
+        self._columns['c'+index][:] = pointers
+
+    def _refresh_pointers(self):
+        """Points the header, the column table and the pointer columns (cxi, ...) to the current arrays."""
+        self._refresh_index_pointers()
+        self._column_ptrs = (ctypes.c_void_p * len(self._ptype.variables))(
+            *[self._columns[v.name].ctypes.data for v in self._ptype.variables])
+        self._header.count = self._count
+        self._header.capacity = self.capacity
+        self._header.begin = 0
+        self._header.alive = self._alive.ctypes.data
+        self._header.columns = ctypes.cast(self._column_ptrs, ctypes.c_void_p)
+
+    def grow(self, capacity=None):
+        """
+        Enlarges all columns (by default to twice their size); the rows keep their positions.
+        :param capacity: new number of rows
+        """
+        capacity = 2 * self.capacity if capacity is None else capacity
+        assert capacity >= self._count
+        for name, column in self._columns.items():
+            new_column = np.zeros(capacity, dtype=column.dtype)
+            new_column[:self._count] = column[:self._count]
+            self._columns[name] = new_column
+        new_alive = np.zeros(capacity, dtype=np.uint8)
+        new_alive[:self._count] = self._alive[:self._count]
+        self._alive = new_alive
+        self._grow_index_blocks(capacity, self._count)
+        self._refresh_pointers()
+
+    def _reserve(self, n):
+        """:return: first of n new rows at the end of the used rows (growing the columns if needed)"""
+        if self._count + n > self.capacity:
+            capacity = self.capacity
+            while self._count + n > capacity:
+                capacity *= 2
+            self.grow(capacity)
+        first = self._count
+        self._count += n
+        self._header.count = self._count
+        return first
+
+    def _store(self, records, index_rows):
+        n = len(records)
+        if self._sorted and n > 0 and records['id'][0] <= self._max_id:
+            self._sorted = False
+        first = self._reserve(n)
+        rows = np.arange(first, first + n, dtype=np.int64)
+        self._write(rows, records)
+        for index, block in self._index_blocks.items():
+            block[first:first + n] = index_rows[index]
+        self._alive[first:first + n] = 1
+        return rows
+
+    def _write(self, rows, records):
+        for v in self._ptype.variables:
+            # -- the pointer columns point to this storage's own grid search index rows -- #
+            if v.dtype != np.uint64:
+                self._columns[v.name][rows] = records[v.name]
+
+    def _field(self, row, name):
+        return self._columns[name][row:row+1]
+
+    def _field_column(self, name):
+        return self._columns[name]
+
+    def _build_order(self):
+        rows = self.live_rows().astype(np.int64)
+        ids = self._columns['id'][rows].astype(np.int64)
+        if not self._sorted:
+            order = np.argsort(ids, kind='stable')
+            rows = rows[order]
+            ids = ids[order]
+        return ids, rows
+
+    def add(self, val=None, **values):
+        """
+        Appends a particle in the spare capacity of the columns.
+        :param val: handle, particle ID or particle object to copy the variables (and grid search indices) from;
+                    optional
+        :param values: values of variables (by name) - override the ones of 'val'; variables given neither way get
+                       their default (0, unless listed in SOA_DEFAULTS), 'id' a new ID
+        :return: ID of the particle
+        """
+        if val is None:
+            val = values.pop('id') if 'id' in values else package_globals.idgen.nextID()
+        node = self._as_node(val)
+        self._insert([node], values)
+        return node.id
+
+    def add_many(self, **columns):
+        """
+        Appends a batch of particles, one vectorised copy per column.
+        :param columns: arrays of equal length with the values of variables (by name); variables that are not
+                        given get their default (0, unless listed in SOA_DEFAULTS), 'id' new IDs
+        :return: IDs of the particles (array)
+        """
+        n = len(next(iter(columns.values())))
+        ids = np.asarray(columns.pop('id'), dtype=np.int64) if 'id' in columns else \
+            package_globals.idgen.nextIDs(n).astype(np.int64)
+        order = np.argsort(ids, kind='stable')
+        nodes = [RecordNode(id=id) for id in ids[order].tolist()]
+        self._insert(nodes, {name: np.asarray(values)[order] for name, values in columns.items()})
+        return ids
+
+    def live_rows(self):
+        """
+        :return: rows of the live (non-deleted) particles, in row order
+        """
+        return np.flatnonzero(self._alive[:self._count])
+
+    def column(self, name):
+        """
+        :param name: variable name
+        :return: values of that variable of the live particles (copy), in ID order
+        """
+        if not self._sorted:
+            self.compact()
+        return self._columns[name][:self._count][self._alive[:self._count].view(np.bool_)]
+
+    def _drop(self, rows):
+        self._alive[rows] = 0
+        self._ntombs += len(rows)
+        self._compact_if_needed()
+
+    def remove_deleted(self):
+        """
+        Flags all particles in state ErrorCode.Delete as tombstones.
+        :return: list of the (unbound) handles of the removed particles
+        """
+        return self.remove_many(self.deleted_mask())
+
+    def _compact_if_needed(self):
+        if self._ntombs > self._compact_ratio * self._count:
+            self.compact()
+
+    def compact(self):
+        """
+        Moves the live rows to the front of the columns in ID order, dropping all tombstones - one vectorised
+        gather per column.
+        """
+        ids, rows = self._order()
+        n = len(rows)
+        for v in self._ptype.variables:
+            if v.dtype != np.uint64:
+                column = self._columns[v.name]
+                column[:n] = column[rows]
+        for index, block in self._index_blocks.items():
+            block[:n] = block[rows]
+        self._alive[:n] = 1
+        self._alive[n:self._count] = 0
+        self._count = n
+        self._ntombs = 0
+        self._sorted = True
+        self._header.count = n
+        self._slot_of = dict(zip(ids.tolist(), range(n)))
+        self._order_rows = np.arange(n, dtype=np.int64)
+        self._rebind_views()
+
+    def _reset(self):
+        self._alive[:self._count] = 0
+        self._count = 0
+        self._ntombs = 0
+        self._sorted = True
+        self._header.count = 0
+
+    def export_c(self, sub_chain=None):
+        """
+        :param sub_chain: SubChain descriptor (see id_range()) - if given, the loop only covers its particles
+        :return: tuple (num_particles, header) - the leading arguments of the compiled particle loop, as for the
+                 node storages (see NodeStorage.export_c())
+        """
+        if sub_chain is None:
+            return len(self), self._header
+        if len(sub_chain) <= 0:
+            return 0, self._header
+        # -- the loop covers the live rows from the first one of the run: the rows have to be in ID order -- #
+        if not self._sorted:
+            self.compact()
+        header = SoAHeader.from_buffer_copy(self._header)
+        header.begin = self._slot_of[sub_chain.first.id]
+        return len(sub_chain), header
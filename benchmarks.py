@@ -0,0 +1,499 @@
+import os
+import sys
+import random
+import ctypes
+import tracemalloc
+import numpy as np
+from time import process_time, perf_counter
+
+import package_globals
+from package_globals import IdGenerator
+from Node import *
+from NodeArena import NodeArena
+from NodePool import NodePool
+from LinkedList import RealList, OrderedList
+from OrderStatistic import SortedListBackend, BPlusTreeList
+from particle import JITParticle
+from particleset_node import ParticleSet
+from SoAStorage import SoAParticleStorage
+from SlotMap import SlotMapStorage
+from ConcurrentList import ConcurrentRealList
+from BlockNode import UnrolledList
+from OffsetArena import OffsetNodeArena
+from wrapping.code_compiler import GNUCompiler
+import threading
+
+
+def benchmark_node_arena(N):
+    """
+    Compares the per-object NodeJIT construction against the slab-backed NodeArena:
+    creation of N nodes (linked to a chain in creation order) and a Python-side walk of the chain.
+    """
+    stime = process_time()
+    nodes = []
+    prev_node = None
+    for i in range(N):
+        node = NodeJIT(prev=prev_node, id=i)
+        if prev_node is not None:
+            prev_node.set_next(node)
+        nodes.append(node)
+        prev_node = node
+    etime = process_time()
+    print("Time creating {} nodes (NodeJIT): {}".format(N, etime-stime))
+    stime = process_time()
+    walk_chain(nodes[0])
+    etime = process_time()
+    print("Time walking {} nodes (NodeJIT): {}".format(N, etime-stime))
+    stime = process_time()
+    nodes[0].count_chain()
+    etime = process_time()
+    print("Time walking {} nodes in C (NodeJIT): {}".format(N, etime-stime))
+    release_chain(nodes)
+    del nodes
+
+    arena = NodeArena(NodeJIT)
+    stime = process_time()
+    nodes = []
+    prev_node = None
+    for i in range(N):
+        node = arena.allocate(prev=prev_node, id=i)
+        if prev_node is not None:
+            prev_node.set_next(node)
+        nodes.append(node)
+        prev_node = node
+    etime = process_time()
+    print("Time creating {} nodes (NodeArena - {} slabs): {}".format(N, arena.nslabs, etime-stime))
+    stime = process_time()
+    walk_chain(nodes[0])
+    etime = process_time()
+    print("Time walking {} nodes (NodeArena): {}".format(N, etime-stime))
+    stime = process_time()
+    nodes[0].count_chain()
+    etime = process_time()
+    print("Time walking {} nodes in C (NodeArena): {}".format(N, etime-stime))
+    release_chain(nodes)
+    del nodes
+
+
+def report_node_memory(N, nclasses=(Node, CompactNode, NodeJIT, CompactNodeJIT)):
+    """
+    Measures the memory footprint per node for the given node classes, by tracing the allocations needed to
+    create (and hold in a list) N linked nodes without data. The figure includes the node object, its attribute
+    storage, the ID integer, the C struct (for JIT nodes) and the list slot.
+    :param N: number of nodes to create per node class
+    :param nclasses: node classes to measure
+    :return: dictionary {class name: bytes per node}
+    """
+    result = {}
+    for nclass in nclasses:
+        tracemalloc.start()
+        start_bytes = tracemalloc.get_traced_memory()[0]
+        nodes = []
+        prev_node = None
+        for i in range(N):
+            node = nclass(prev=prev_node, id=i)
+            if prev_node is not None:
+                prev_node.set_next(node)
+            nodes.append(node)
+            prev_node = node
+        node_bytes = (tracemalloc.get_traced_memory()[0] - start_bytes) / float(N)
+        tracemalloc.stop()
+        result[nclass.__name__] = node_bytes
+        print("Memory per node ({}; N = {}): {:.1f} bytes -> {:.1f} MB per 10M nodes".format(nclass.__name__, N, node_bytes, node_bytes * 1.0e7 / (1024 * 1024)))
+        release_chain(nodes)
+        del nodes
+        del prev_node
+        del node
+    return result
+
+
+def benchmark_node_pool(N, nclass=NodeJIT):
+    """
+    Compares a high-turnover loop (remove a random node, insert a new node at a random position; N times on a
+    chain of N nodes) with freshly constructed nodes against the same loop with nodes recycled by a NodePool.
+    """
+    for pool in [None, NodePool(nclass)]:
+        label = "{} - {}".format(nclass.__name__, "NodePool" if pool is not None else "new nodes")
+        nodes = []
+        prev_node = None
+        for i in range(N):
+            node = nclass(prev=prev_node, id=i) if pool is None else pool.acquire(prev=prev_node, id=i)
+            if prev_node is not None:
+                prev_node.set_next(node)
+            nodes.append(node)
+            prev_node = node
+        del prev_node
+        del node
+        random.seed(0)
+        next_id = N
+        stime = process_time()
+        for i in range(N):
+            index = random.randrange(N)
+            node = nodes[index]
+            if pool is None:
+                node.unlink()
+            else:
+                pool.release(node)
+            del node
+            # -- the removed node's place in 'nodes' is taken by the new node, which goes to a random position -- #
+            neighbour = nodes[random.randrange(N)]
+            if neighbour is nodes[index]:
+                neighbour = nodes[index-1]
+            new_node = nclass(id=next_id) if pool is None else pool.acquire(id=next_id)
+            new_node.link_between(neighbour, neighbour.next)
+            nodes[index] = new_node
+            next_id += 1
+        etime = process_time()
+        print("Time removing and inserting {} nodes ({}): {}".format(N, label, etime-stime))
+        release_chain(nodes)
+        del nodes
+        del new_node
+
+
+def benchmark_bulk_insert(N, nclass=NodeJIT):
+    """
+    Compares N single RealList.add() calls (nodes in random ID order) with a single RealList.update() of the
+    same nodes.
+    """
+    ids = list(range(N))
+    random.seed(0)
+    random.shuffle(ids)
+    for bulk in [False, True]:
+        nodes = [nclass(id=i) for i in ids]
+        real_list = RealList(dtype=nclass)
+        stime = process_time()
+        if bulk:
+            real_list.update(nodes)
+        else:
+            for node in nodes:
+                real_list.add(node)
+        etime = process_time()
+        print("Time inserting {} nodes into a RealList ({} - {}): {}".format(N, nclass.__name__, "update" if bulk else "add", etime-stime))
+        del nodes
+        real_list.clear()
+
+
+def benchmark_fork(N):
+    """
+    Compares ParticleSet.fork() (bulk clone of the node chain and the particle records) with copying a
+    ParticleSet of N JIT particles particle by particle.
+    """
+    pset = ParticleSet(pclass=JITParticle)
+    fieldset = pset.fieldset
+    for i in range(N):
+        pset.add(JITParticle(lon=float(i), lat=0., pid=i, fieldset=fieldset, depth=0., time=0.))
+    stime = process_time()
+    copy_pset = ParticleSet(pclass=JITParticle)
+    for particle in pset.cursor(payload=True):
+        copy_pset.add(JITParticle(lon=particle.lon, lat=particle.lat, pid=0, fieldset=fieldset,
+                                  depth=particle.depth, time=particle.time))
+    etime = process_time()
+    print("Time copying a ParticleSet of {} particles (particle by particle): {}".format(N, etime-stime))
+    del copy_pset
+    stime = process_time()
+    fork_pset = pset.fork()
+    etime = process_time()
+    print("Time copying a ParticleSet of {} particles (ParticleSet.fork): {}".format(N, etime-stime))
+    del fork_pset
+    del pset
+
+
+def benchmark_order_backends(N, nclass=NodeJIT):
+    """
+    Runs the main.py workload - N insertions in random ID order, then N times removing the node at a random position
+    and re-inserting it, then N positional lookups - on a RealList and on OrderedLists with the different
+    order-statistic backends (see OrderStatistic).
+    """
+    ids = list(range(N))
+    random.seed(0)
+    random.shuffle(ids)
+    positions = [random.randrange(N) for i in range(N)]
+    candidates = [("RealList", lambda: RealList(dtype=nclass)),
+                  ("OrderedList - SortedListBackend", lambda: OrderedList(dtype=nclass, backend=SortedListBackend)),
+                  ("OrderedList - BPlusTreeList", lambda: OrderedList(dtype=nclass, backend=BPlusTreeList))]
+    for label, create in candidates:
+        nodes = [nclass(id=i) for i in ids]
+        ord_list = create()
+        stime = process_time()
+        for node in nodes:
+            ord_list.add(node)
+        etime = process_time()
+        print("Time adding {} nodes ({}): {}".format(N, label, etime-stime))
+        del nodes
+        del node
+        stime = process_time()
+        for index in positions:
+            node = ord_list.pop(index)
+            node.unlink()
+            ord_list.add(node)
+        etime = process_time()
+        print("Time popping and re-inserting {} nodes ({}): {}".format(N, label, etime-stime))
+        del node
+        stime = process_time()
+        for index in positions:
+            node = ord_list[index]
+        etime = process_time()
+        print("Time looking up {} nodes by position ({}): {}".format(N, label, etime-stime))
+        del node
+        ord_list.clear()
+
+
+def benchmark_soa(N):
+    """
+    Runs the main.py NumPy workload - N single appends, then N times deleting a random particle and appending a
+    new one - on a structured array that is reallocated on every change (numpy.concatenate / numpy.delete, as in
+    main.py; only up to 2^15 particles) and on a SoAParticleStorage (tombstones and amortised compaction).
+    """
+    dtype = JITParticle.getPType().dtype
+    random.seed(0)
+    positions = [random.randrange(N) for i in range(N)]
+    if N <= 2 ** 15:
+        stime = process_time()
+        np_list = np.zeros(0, dtype=dtype)
+        for i in range(N):
+            record = np.zeros(1, dtype=dtype)
+            record['lon'] = i
+            np_list = np.concatenate((np_list, record))
+        for index in positions:
+            np_list = np.delete(np_list, index, 0)
+            np_list = np.concatenate((np_list, np.zeros(1, dtype=dtype)))
+        etime = process_time()
+        print("Time adding {} particles and deleting / adding {} particles (NumPy array): {}".format(N, N, etime-stime))
+        del np_list
+    storage = SoAParticleStorage(JITParticle)
+    stime = process_time()
+    ids = [storage.add(lon=i, id=i) for i in range(N)]
+    for i, index in enumerate(positions):
+        # -- a single removal only flags a tombstone: O(1), other than a positional remove_many() -- #
+        storage.remove(ids[index])
+        ids[index] = storage.add(id=N+i)
+    etime = process_time()
+    print("Time adding {} particles and deleting / adding {} particles (SoAParticleStorage): {}".format(N, N, etime-stime))
+    stime = process_time()
+    storage.add_many(lon=np.arange(N, dtype=np.float32), id=np.arange(2*N, 3*N))
+    storage.remove_many(np.arange(0, len(storage), 2))
+    etime = process_time()
+    print("Time bulk-adding and bulk-deleting {} particles (SoAParticleStorage): {}".format(N, etime-stime))
+    del storage
+
+
+
+def benchmark_slot_map(N):
+    """
+    Runs the main.py workload - N single appends, then N times deleting a random particle and appending a new one -
+    on a SlotMapStorage (free-slot stack, chain threaded through int32 index columns), followed by a walk of the chain.
+    """
+    random.seed(0)
+    positions = [random.randrange(N) for i in range(N)]
+    storage = SlotMapStorage(JITParticle)
+    stime = process_time()
+    ids = [storage.add(lon=i, id=i) for i in range(N)]
+    for i, index in enumerate(positions):
+        storage.remove(ids[index])
+        ids[index] = storage.add(id=N+i)
+    etime = process_time()
+    print("Time adding {} particles and deleting / adding {} particles (SlotMapStorage - {} slots): {}".format(N, N, storage.capacity, etime-stime))
+    stime = process_time()
+    n = sum(1 for slot in storage.slots())
+    etime = process_time()
+    print("Time walking {} particles (SlotMapStorage): {}".format(n, etime-stime))
+    del storage
+
+def benchmark_unrolled_list(N, capacity=64):
+    """
+    Compares a ParticleSet on the plain NodeJIT chain with an UnrolledList (blocks of 'capacity' particle records):
+    N single insertions of JIT particles, 10 sweeps of a compiled kernel over all particles, and the removal of
+    N/2 random particles.
+    """
+    random.seed(0)
+    pset = ParticleSet(pclass=JITParticle)
+    fieldset = pset.fieldset
+    ulist = UnrolledList(JITParticle.getPType(), capacity=capacity)
+    candidates = [("NodeJIT chain", pset, pset.add, pset.remove, pset.loopgen_class),
+                  ("UnrolledList - {} per block".format(capacity), ulist, ulist.add, ulist.remove, ulist.loopgen_class)]
+    for label, container, add, remove, loopgen_class in candidates:
+        particles = [JITParticle(lon=float(i), lat=0., pid=i, fieldset=fieldset, depth=0., time=0., dt=3600.)
+                     for i in range(N)]
+        stime = process_time()
+        for particle in particles:
+            add(particle)
+        etime = process_time()
+        print("Time adding {} particles ({}): {}".format(N, label, etime-stime))
+        kernel = compile_loop(pset, move_east, loopgen_class)
+        stime = process_time()
+        for step in range(10):
+            run_loop(kernel, container, endtime=(step+1)*3600., dt=3600.)
+        etime = process_time()
+        print("Time running a kernel 10 times over {} particles ({}): {}".format(N, label, etime-stime))
+        stime = process_time()
+        for particle in random.sample(particles, N // 2):
+            remove(particle)
+        etime = process_time()
+        print("Time removing {} random particles ({}): {}".format(N // 2, label, etime-stime))
+        del particles
+    del pset
+    del ulist
+
+def benchmark_offset_arena(N):
+    """
+    Compares a ParticleSet on the plain NodeJIT chain with OffsetNodeArenas (32- and 64-bit links): N appends of
+    JIT particles, 10 sweeps of a compiled kernel over all particles, and the removal of N/2 random particles.
+    """
+    random.seed(0)
+    pset = ParticleSet(pclass=JITParticle)
+    fieldset = pset.fieldset
+    dtype = JITParticle.getPType().dtype
+    candidates = [("NodeJIT chain", pset), ("OffsetNodeArena - int32 links", OffsetNodeArena(dtype, capacity=N)),
+                  ("OffsetNodeArena - int64 links", OffsetNodeArena(dtype, capacity=N, index_dtype=np.int64))]
+    for label, container in candidates:
+        particles = [JITParticle(lon=float(i), lat=0., pid=i, fieldset=fieldset, depth=0., time=0., dt=3600.)
+                     for i in range(N)]
+        stime = process_time()
+        if container is pset:
+            for particle in particles:
+                pset.add(particle)
+            handles = particles
+        else:
+            # -- the arena is addressed by slot -- #
+            handles = [container.append(particle) for particle in particles]
+        etime = process_time()
+        print("Time adding {} particles ({}): {}".format(N, label, etime-stime))
+        kernel = compile_loop(pset, move_east, container.loopgen_class)
+        stime = process_time()
+        for step in range(10):
+            run_loop(kernel, container, endtime=(step+1)*3600., dt=3600.)
+        etime = process_time()
+        print("Time running a kernel 10 times over {} particles ({}): {}".format(N, label, etime-stime))
+        remove = pset.remove if container is pset else container.free
+        stime = process_time()
+        for handle in random.sample(handles, N // 2):
+            remove(handle)
+        etime = process_time()
+        print("Time removing {} random particles ({}): {}".format(N // 2, label, etime-stime))
+        del handles
+        del particles
+    del candidates
+    del pset
+
+def benchmark_concurrent_insert(N, nthreads=4, nclass=NodeJIT):
+    """
+    Inserts N nodes from 'nthreads' producer threads into a ConcurrentRealList - each thread with its own ID range,
+    i.e. its own segments - and compares with the same insertions into a RealList from a single thread.
+    """
+    random.seed(0)
+    chunk = N // nthreads
+    batches = []
+    for t in range(nthreads):
+        ids = list(range(t * chunk, (t+1) * chunk))
+        random.shuffle(ids)
+        batches.append(ids)
+    stime = perf_counter()
+    rlist = RealList(dtype=nclass)
+    for ids in batches:
+        for id in ids:
+            rlist.add(nclass(id=id))
+    etime = perf_counter()
+    print("Time inserting {} nodes (RealList, 1 thread): {}".format(N, etime-stime))
+    clist = ConcurrentRealList(dtype=nclass, segment_bits=max((chunk - 1).bit_length() - 2, 6))
+
+    def produce(ids):
+        for id in ids:
+            clist.add(nclass(id=id))
+
+    threads = [threading.Thread(target=produce, args=(ids, )) for ids in batches]
+    # -- wall-clock time: process_time() adds up the CPU time of all threads -- #
+    stime = perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    n = walk_chain(clist.begin())
+    etime = perf_counter()
+    print("Time inserting {} nodes (ConcurrentRealList, {} threads) and stitching the chain ({} nodes): {}".format(N, nthreads, n, etime-stime))
+    del rlist
+    del clist
+
+
+def benchmark_id_generator(N):
+    """
+    Pre-generates and permutes N IDs, then allocates and releases them one by one and in one batch each.
+    """
+    idgen = IdGenerator()
+    stime = process_time()
+    idgen.preGenerateIDs(N)
+    idgen.permuteIDs()
+    etime = process_time()
+    print("Time pre-generating and permuting {} IDs: {}".format(N, etime-stime))
+    stime = process_time()
+    ids = [idgen.nextID() for i in range(N)]
+    for id in ids:
+        idgen.releaseID(id)
+    etime = process_time()
+    print("Time allocating and releasing {} IDs one by one: {}".format(N, etime-stime))
+    stime = process_time()
+    idgen.releaseIDs(idgen.nextIDs(N))
+    etime = process_time()
+    print("Time allocating and releasing {} IDs in one batch: {}".format(N, etime-stime))
+
+
+def move_east(particle, fieldset, time):
+    particle.lon += 1.
+
+
+def compile_loop(pset, pyfunc, loopgen_class):
+    """
+    :return: compiled kernel of 'pset' for 'pyfunc', with the particle loop of 'loopgen_class' - also for particle
+             containers outside a ParticleSet (see run_loop())
+    """
+    kernel = pset._kclass(pset.fieldset, pset._ptype, pyfunc=pyfunc, loopgen_class=loopgen_class)
+    kernel.compile(compiler=GNUCompiler(incdirs=[os.path.join(package_globals.get_package_dir(), 'include'), "."],
+                                        libdirs=["."], libs=["node"]))
+    kernel.load_lib()
+    return kernel
+
+
+def run_loop(kernel, container, endtime, dt):
+    """
+    Runs a compiled kernel without field arguments on anything that hands over its particles via export_c().
+    """
+    num_particles, header = container.export_c()
+    if num_particles > 0:
+        kernel._function(ctypes.c_int(num_particles), ctypes.pointer(header), ctypes.c_double(endtime),
+                         ctypes.c_double(dt))
+
+
+def walk_chain(node):
+    n = 0
+    while node is not None:
+        n += 1
+        node = node.next
+    return n
+
+
+def release_chain(nodes):
+    # -- break the chain first so that the destructors don't recurse through prev/next -- #
+    for node in nodes:
+        node.prev = None
+        node.next = None
+
+
+if __name__ == '__main__':
+    # -- sizes from the README: 2^18 particles (with data) and 2^20 entities -- #
+    sizes = [2 ** 18, 2 ** 20]
+    if len(sys.argv) > 1:
+        sizes = [int(arg) for arg in sys.argv[1:]]
+    report_node_memory(2 ** 20)
+    print("===========================================================================")
+    for N in sizes:
+        benchmark_node_arena(N)
+        benchmark_node_pool(N)
+        benchmark_bulk_insert(N)
+        benchmark_fork(N)
+        benchmark_order_backends(N)
+        benchmark_soa(N)
+        benchmark_slot_map(N)
+        benchmark_unrolled_list(N)
+        benchmark_offset_arena(N)
+        benchmark_concurrent_insert(N)
+        benchmark_id_generator(N)
+        print("===========================================================================")
@@ -894,12 +894,45 @@ class KernelGenerator(ast.NodeVisitor):
 
 class NodeLoopGenerator(object):
     """Code generator class that adds type definitions and the outer
-    loop around kernel functions to generate compilable C code."""
+    loop around kernel functions to generate compilable C code.
+
+    The loop over the particles is assembled from overridable parts (loop_args(), loop_declarations(),
+    particle_loop()), so that subclasses can generate loops over other node layouts."""
+
+    # C type name of the nodes handed to the particle_loop() function
+    node_type = "NodeJIT"
 
     def __init__(self, ptype=None, fieldset=None):
         self.fieldset = fieldset
         self.ptype = ptype
 
+    def loop_args(self):
+        """
+        :return: leading arguments of the generated particle_loop() function (before the field- and constant-args)
+        """
+        return [c.Value("int", "num_particles"),
+                c.Pointer(c.Value(self.node_type, "node_begin")),
+                c.Value("double", "endtime"),
+                c.Value("double", "dt")]
+
+    def loop_declarations(self):
+        """
+        :return: declarations of the loop variables used by particle_loop()
+        """
+        return [c.Pointer(c.Value(self.node_type, "node"))]
+
+    def particle_loop(self, particle_body):
+        """
+        :param particle_body: statements executed for each particle - 'particle' is set before, and a 'continue'
+                              within the statements moves on to the next particle
+        :return: loop statement over the particles of the chain, starting at 'node_begin' and stopping after
+                 'num_particles' nodes (so that a sub-chain of a longer chain can be handed over)
+        """
+        return c.Block([c.Value("int", "_n"),
+                        c.For("node = node_begin, _n = 0", "node != NULL && _n < num_particles",
+                              "node = (%s*)(node->_c_next_p), ++_n" % self.node_type,
+                              c.Block([c.Assign("particle", "(%s*)(node->_c_data_p)" % self.ptype.name)] + particle_body))])
+
     def generate(self, funcname, field_args, const_args, kernel_ast, c_include):
         ccode = []
 
@@ -962,11 +995,7 @@ class NodeLoopGenerator(object):
 
         # ctypes.POINTER(NodeJIT)
         # Generate outer loop for repeated kernel invocation
-        args = [c.Value("int", "num_particles"),
-                c.Pointer(c.Value("NodeJIT", "node_begin")),
-                # c.Pointer(c.Value(self.ptype.name, "particles")),
-                c.Value("double", "endtime"),
-                c.Value("double", "dt")]
+        args = self.loop_args()
         if field_args is not None:
             for field, _ in field_args.items():
                 args += [c.Pointer(c.Value("CField", "%s" % field))]
@@ -989,7 +1018,6 @@ class NodeLoopGenerator(object):
         fargs_str = ", ".join(fargs_lst)
 
         # Inner loop nest for forward runs
-        progress_loop = c.Assign("node", "(%s*)(node->_c_next_p)" % ("NodeJIT"))
         reset_res_state = c.Assign("res", "particle->state")
         update_state = c.Assign("particle->state", "res")
         sign_dt = c.Assign("sign_dt", "dt > 0 ? 1 : -1")
@@ -1006,7 +1034,6 @@ class NodeLoopGenerator(object):
                                    c.Block([
                                        c.If("fabs(particle->time) >= fabs(endtime)",
                                             c.Assign("particle->state", "SUCCESS")),
-                                       progress_loop,
                                        c.Statement("continue")
                                    ]))
         body = [c.Statement("set_particle_backup(&particle_backup, particle)")]
@@ -1048,22 +1075,120 @@ class NodeLoopGenerator(object):
         time_loop = c.While("(particle->state == EVALUATE || particle->state == REPEAT) || is_zero_dbl(particle->dt)", c.Block(body))
         # node_loop = c.While("node != NULL", c.Block([c.Assign("particle", "(%s*)(node->_c_data_p)" % (self.ptype.name)),
         #                                              sign_end_part, notstarted_continue, dt_pos, time_loop, progress_loop]))
-        node_loop = c.While("node != NULL", c.Block([c.Assign("particle", "(%s*)(node->_c_data_p)" % (self.ptype.name)),
-                                                     sign_end_part, reset_res_state, dt_pos, notstarted_continue, time_loop, progress_loop]))
+        node_loop = self.particle_loop([sign_end_part, reset_res_state, dt_pos, notstarted_continue, time_loop])
 
         fbody = c.Block([c.Value("int", "sign_dt, sign_end_part"), # p,
                          c.Value("ErrorCode", "res"),
                          c.Value("double", "__pdt_prekernels"),
-                         c.Value("double", "__dt"),
+                         c.Value("double", "__dt")] +
                          # c.Value("double", "__tol"), c.Assign("__tol", "1.e-6"), # 1e-8 = built-in tolerance for np.isclose()
-                         c.Pointer(c.Value("NodeJIT", "node")), c.Assign("node", "node_begin"),
-                         c.Pointer(c.Value(self.ptype.name, "particle")), c.Assign("particle", "(%s*)(node->_c_data_p)" % (self.ptype.name)),
+                        self.loop_declarations() +
+                        [c.Pointer(c.Value(self.ptype.name, "particle")),
                          sign_dt, particle_backup, node_loop])  # part_loop
         fdecl = c.FunctionDeclaration(c.Value("void", "particle_loop"), args)
         ccode += [str(c.FunctionBody(fdecl, fbody))]
         return "\n\n".join(ccode)
 
 
+class BlockNodeLoopGenerator(NodeLoopGenerator):
+    """Loop generator for chains of BlockNodeJIT nodes: for each node, the loop runs over the occupied records of
+    the node's particle block (contiguous memory) before it moves on to the next node, until 'num_particles'
+    particles are done."""
+
+    node_type = "BlockNodeJIT"
+
+    def loop_declarations(self):
+        return super(BlockNodeLoopGenerator, self).loop_declarations() + [c.Value("int", "_k"),
+                                                                          c.Value("int", "_n")]
+
+    def particle_loop(self, particle_body):
+        block_loop = c.For("_k = 0", "_k < node->_c_capacity && _n < num_particles", "++_k",
+                           c.Block([c.If("((unsigned char*)(node->_c_mask_p))[_k] == 0", c.Statement("continue")),
+                                    c.Statement("++_n"),
+                                    c.Assign("particle", "((%s*)(node->_c_data_p)) + _k" % self.ptype.name)] + particle_body))
+        return c.For("node = node_begin, _n = 0", "node != NULL && _n < num_particles",
+                     "node = (%s*)(node->_c_next_p)" % self.node_type,
+                     c.Block([c.If("node->_c_count <= 0", c.Statement("continue")), block_loop]))
+
+
+class OffsetNodeLoopGenerator(NodeLoopGenerator):
+    """Loop generator for relocatable chains (see OffsetArena.OffsetNodeArena): 'node_begin' is the header of the
+    arena buffer, and the loop follows the 'next' slot indices of the arena's link table for 'num_particles'
+    slots."""
+
+    node_type = "OffsetArenaHeader"
+    # C type of the slot indices in the link table (int32_t or int64_t, see OffsetNodeArena's 'index_dtype')
+    index_type = "int32_t"
+
+    def loop_declarations(self):
+        return [c.Pointer(c.Value(self.index_type, "_links")),
+                c.Value("int64_t", "_slot"),
+                c.Value("int", "_n")]
+
+    def particle_loop(self, particle_body):
+        links = c.Assign("_links", "(%s*)(((char*)node_begin) + node_begin->links_offset)" % self.index_type)
+        slot_loop = c.For("_slot = node_begin->begin, _n = 0", "_slot >= 0 && _n < num_particles",
+                          "_slot = _links[2*_slot+1], ++_n",
+                          c.Block([c.Assign("particle", "((%s*)(((char*)node_begin) + node_begin->records_offset)) + _slot" % self.ptype.name)] + particle_body))
+        return c.Block([links, slot_loop])
+
+
+class OffsetNode64LoopGenerator(OffsetNodeLoopGenerator):
+    """OffsetNodeLoopGenerator for arenas with 64-bit links."""
+
+    index_type = "int64_t"
+
+
+class SoALoopGenerator(NodeLoopGenerator):
+    """Loop generator for structure-of-arrays storages (see SoAStorage.SoAParticleStorage): 'node_begin' is the
+    storage's header, and the loop runs over the rows of its columns from row 'begin' on, skipping tombstones, until
+    'num_particles' live rows are done. Each row is gathered into a particle struct, on which the kernel works as
+    usual, and scattered back to the columns afterwards."""
+
+    node_type = "SoAHeader"
+
+    def loop_declarations(self):
+        return [c.Value("int64_t", "_k"),
+                c.Value("int", "_n"),
+                c.Value(self.ptype.name, "_row")]
+
+    def column(self, index, variable):
+        ctype = "uint64_t" if variable.dtype == np.uint64 else c.dtype_to_ctype(variable.dtype)
+        return "((%s*)(node_begin->columns[%d]))[_k]" % (ctype, index)
+
+    def particle_loop(self, particle_body):
+        gather = []
+        scatter = []
+        for index, v in enumerate(self.ptype.variables):
+            if v.dtype == np.uint64:
+                gather.append(c.Assign("_row.%s" % v.name, "(void*)(%s)" % self.column(index, v)))
+                scatter.append(c.Assign(self.column(index, v), "(uint64_t)(_row.%s)" % v.name))
+            else:
+                gather.append(c.Assign("_row.%s" % v.name, self.column(index, v)))
+                scatter.append(c.Assign(self.column(index, v), "_row.%s" % v.name))
+        # -- a 'continue' of the particle body leaves the do-while(0), so the row is always scattered back -- #
+        body = c.DoWhile("0", c.Block(particle_body))
+        return c.For("_k = node_begin->begin, _n = 0", "_k < node_begin->count && _n < num_particles", "++_k",
+                     c.Block([c.If("node_begin->alive[_k] == 0", c.Statement("continue")),
+                              c.Statement("++_n")] + gather + [c.Assign("particle", "&_row"), body] + scatter))
+
+
+class SlotMapLoopGenerator(NodeLoopGenerator):
+    """Loop generator for slot maps (see SlotMap.SlotMapStorage): 'node_begin' is the storage's header, and the
+    loop follows the 'next' index column from slot 'begin' for 'num_particles' slots, working on the particle
+    records in place."""
+
+    node_type = "SlotMapHeader"
+
+    def loop_declarations(self):
+        return [c.Value("int64_t", "_slot"),
+                c.Value("int", "_n")]
+
+    def particle_loop(self, particle_body):
+        return c.For("_slot = node_begin->begin, _n = 0", "_slot >= 0 && _n < num_particles",
+                     "_slot = node_begin->next[_slot], ++_n",
+                     c.Block([c.Assign("particle", "((%s*)(node_begin->records)) + _slot" % self.ptype.name)] + particle_body))
+
 class LoopGenerator(object):
     """Code generator class that adds type definitions and the outer
     loop around kernel functions to generate compilable C code."""
@@ -12,6 +12,7 @@ import numpy as np
 # from copy import deepcopy
 
 from kernelbase import BaseFieldKernel, BaseNoFieldKernel
+from codegenerator import NodeLoopGenerator
 
 # from codegenerator import KernelGenerator, LoopGenerator
 from compiler import get_cache_dir
@@ -39,11 +40,13 @@ def PrintKernel(particle, fieldset, time):
 
 class NodeNoFieldKernel(BaseNoFieldKernel):
     def __init__(self, fieldset, ptype, pyfunc=None, funcname=None, funccode=None, py_ast=None, funcvars=None,
-                 c_include="", delete_cfiles=True):
-        super(NodeNoFieldKernel, self).__init__(fieldset, ptype, pyfunc, funcname, funccode, py_ast, funcvars, c_include, delete_cfiles)
+                 c_include="", delete_cfiles=True, loopgen_class=NodeLoopGenerator):
+        super(NodeNoFieldKernel, self).__init__(fieldset, ptype, pyfunc, funcname, funccode, py_ast, funcvars, c_include, delete_cfiles, loopgen_class)
 
-    def execute_jit(self, pset, endtime, dt):
-        """Invokes JIT engine to perform the core update loop"""
+    def execute_jit(self, pset, endtime, dt, sub_chain=None):
+        """Invokes JIT engine to perform the core update loop (over the nodes of 'sub_chain' only, if given)"""
+        if sub_chain is not None and len(sub_chain) <= 0:
+            return
         # if len(pset.particles) > 0:
         #     assert pset.fieldset.gridset.size == len(pset.particles[0].xi), 'FieldSet has different amount of grids than Particle.xi. Have you added Fields after creating the ParticleSet?'
         if len(pset) > 0:
@@ -85,14 +88,15 @@ class NodeNoFieldKernel(BaseNoFieldKernel):
             fargs += [c_double(f) for f in self.const_args.values()]
 
         # particle_data = pset._particle_data.ctypes.data_as(c_void_p)
-        node_data = pset.begin()
+        # -- the storage hands over its chain (deferred link changes are written to the C nodes first) -- #
+        num_particles, node_data = pset.export_c(sub_chain)
         if len(fargs) > 0:
-            self._function(c_int(len(pset)), pointer(node_data), c_double(endtime), c_double(dt), *fargs)
+            self._function(c_int(num_particles), pointer(node_data), c_double(endtime), c_double(dt), *fargs)
         else:
-            self._function(c_int(len(pset)), pointer(node_data), c_double(endtime), c_double(dt))
+            self._function(c_int(num_particles), pointer(node_data), c_double(endtime), c_double(dt))
 
-    def execute_python(self, pset, endtime, dt):
-        """Performs the core update loop via Python"""
+    def execute_python(self, pset, endtime, dt, sub_chain=None):
+        """Performs the core update loop via Python (over the nodes of 'sub_chain' only, if given)"""
         sign_dt = np.sign(dt)
 
         # back up variables in case of ErrorCode.Repeat
@@ -106,66 +110,66 @@ class NodeNoFieldKernel(BaseNoFieldKernel):
         # ========= OLD ======= #
         # for p in pset.particles:
         # ===================== #
-        node = pset.begin()
-        while node is not None:
-            p = node.data
-            ptype = p.getPType()
-            # Don't execute particles that aren't started yet
-            sign_end_part = np.sign(endtime - p.time)
-            if (sign_end_part != sign_dt) and (dt != 0):
-                node = node.next
-                continue
-
-            # Compute min/max dt for first timestep
-            dt_pos = min(abs(p.dt), abs(endtime - p.time))
-            while dt_pos > 1e-6 or dt == 0:
-                for var in ptype.variables:
-                    p_var_back[var.name] = getattr(p, var.name)
-                try:
-                    pdt_prekernels = sign_dt * dt_pos
-                    p.dt = pdt_prekernels
-                    res = self.pyfunc(p, pset.fieldset, p.time)
-                #     res = self.pyfunc(p, None, p.time)
-                    if (res is None or res == ErrorCode.Success) and not np.isclose(p.dt, pdt_prekernels):
-                        res = ErrorCode.Repeat
-                # except FieldOutOfBoundError as fse:
-                #     res = ErrorCode.ErrorOutOfBounds
-                #     p.exception = fse
-                # except FieldOutOfBoundSurfaceError as fse_z:
-                #     res = ErrorCode.ErrorThroughSurface
-                #     p.exception = fse_z
-                except Exception as e:
-                    res = ErrorCode.Error
-                    p.exception = e
-
-                # Update particle state for explicit returns
-                if res is not None:
-                    p.state = res
-
-                # Handle particle time and time loop
-                if res is None or res == ErrorCode.Success:
-                    # Update time and repeat
-                    p.time += p.dt
-                    p.update_next_dt()
-                    dt_pos = min(abs(p.dt), abs(endtime - p.time))
-                    if dt == 0:
-                        break
+        for pbatch in pset.iter_batches(payload=True, sub_chain=sub_chain):
+            for p in pbatch:
+                ptype = p.getPType()
+                # Don't execute particles that aren't started yet
+                sign_end_part = np.sign(endtime - p.time)
+                if (sign_end_part != sign_dt) and (dt != 0):
                     continue
-                else:
-                    # Try again without time update
+
+                # Compute min/max dt for first timestep
+                dt_pos = min(abs(p.dt), abs(endtime - p.time))
+                while dt_pos > 1e-6 or dt == 0:
                     for var in ptype.variables:
-                        if var.name not in ['dt', 'state']:
-                            setattr(p, var.name, p_var_back[var.name])
-                    dt_pos = min(abs(p.dt), abs(endtime - p.time))
-                    break
-            node = node.next
+                        p_var_back[var.name] = getattr(p, var.name)
+                    try:
+                        pdt_prekernels = sign_dt * dt_pos
+                        p.dt = pdt_prekernels
+                        res = self.pyfunc(p, pset.fieldset, p.time)
+                    #     res = self.pyfunc(p, None, p.time)
+                        if (res is None or res == ErrorCode.Success) and not np.isclose(p.dt, pdt_prekernels):
+                            res = ErrorCode.Repeat
+                    # except FieldOutOfBoundError as fse:
+                    #     res = ErrorCode.ErrorOutOfBounds
+                    #     p.exception = fse
+                    # except FieldOutOfBoundSurfaceError as fse_z:
+                    #     res = ErrorCode.ErrorThroughSurface
+                    #     p.exception = fse_z
+                    except Exception as e:
+                        res = ErrorCode.Error
+                        p.exception = e
+
+                    # Update particle state for explicit returns
+                    if res is not None:
+                        p.state = res
+
+                    # Handle particle time and time loop
+                    if res is None or res == ErrorCode.Success:
+                        # Update time and repeat
+                        p.time += p.dt
+                        p.update_next_dt()
+                        dt_pos = min(abs(p.dt), abs(endtime - p.time))
+                        if dt == 0:
+                            break
+                        continue
+                    else:
+                        # Try again without time update
+                        for var in ptype.variables:
+                            if var.name not in ['dt', 'state']:
+                                setattr(p, var.name, p_var_back[var.name])
+                        dt_pos = min(abs(p.dt), abs(endtime - p.time))
+                        break
 
-    def execute(self, pset, endtime, dt, recovery=None, output_file=None):
-        """Execute this Kernel over a ParticleSet for several timesteps"""
+    def execute(self, pset, endtime, dt, recovery=None, output_file=None, sub_chain=None):
+        """Execute this Kernel over a ParticleSet for several timesteps
+        :param sub_chain: SubChain descriptor (see ParticleSet.id_range()) - if given, only its particles are
+                          executed (the descriptor is renewed by ID bounds after deleted particles are removed)
+        """
+        id_bounds = sub_chain.id_bounds() if sub_chain is not None else (None, None)
 
-        node = pset.begin()
-        while node is not None:
-            node.data.reset_state()
+        for p in (pset.cursor(payload=True) if sub_chain is None else sub_chain.cursor(payload=True)):
+            p.reset_state()
 
         def _print_error_occurred_(particle, fieldset, time):
             print("An error occurred during execution with particle={} at time={}".format(particle, time))
@@ -204,19 +208,21 @@ class NodeNoFieldKernel(BaseNoFieldKernel):
 
         # Execute the kernel over the particle set
         if self.ptype.uses_jit:
-            self.execute_jit(pset, endtime, dt)
+            self.execute_jit(pset, endtime, dt, sub_chain)
         else:
-            self.execute_python(pset, endtime, dt)
+            self.execute_python(pset, endtime, dt, sub_chain)
 
         # Remove all particles that signalled deletion
         _remove_deleted_(pset)
+        if id_bounds[0] is not None:
+            sub_chain = pset.id_range(id_bounds[0], id_bounds[1] + 1)
 
         # Identify particles that threw errors
         # ====================================== #
         # ==== EXPENSIVE LIST COMPREHENSION ==== #
         # ====================================== #
         # error_particles = [p for p in pset.particles if p.state != ErrorCode.Success]
-        error_particles = [n.data for n in pset.data if n.data.state not in [ErrorCode.Success, ErrorCode.Evaluate]]
+        error_particles = [n.data for n in (pset.data if sub_chain is None else sub_chain) if n.data.state not in [ErrorCode.Success, ErrorCode.Evaluate]]
 
         error_loop_iter = 0
         while len(error_particles) > 0:
@@ -243,6 +249,8 @@ class NodeNoFieldKernel(BaseNoFieldKernel):
 
             # Remove all particles that signalled deletion
             _remove_deleted_(pset)
+            if id_bounds[0] is not None:
+                sub_chain = pset.id_range(id_bounds[0], id_bounds[1] + 1)
 
             if DEBUG_MODE:
                 after_len = len(pset.particles)
@@ -251,9 +259,9 @@ class NodeNoFieldKernel(BaseNoFieldKernel):
 
             # Execute core loop again to continue interrupted particles
             if self.ptype.uses_jit:
-                self.execute_jit(pset, endtime, dt)
+                self.execute_jit(pset, endtime, dt, sub_chain)
             else:
-                self.execute_python(pset, endtime, dt)
+                self.execute_python(pset, endtime, dt, sub_chain)
 
             if DEBUG_MODE:
                 # recalc_delete_indices = len([i for i, p in enumerate(pset.particles) if p.state in [ErrorCode.Delete]])
@@ -267,17 +275,19 @@ class NodeNoFieldKernel(BaseNoFieldKernel):
             # ==== EXPENSIVE LIST COMPREHENSION ==== #
             # ====================================== #
             # error_particles = [p for p in pset.particles if p.state != ErrorCode.Success]
-            error_particles = [n.data for n in pset.data if n.data.state not in [ErrorCode.Success, ErrorCode.Evaluate]]
+            error_particles = [n.data for n in (pset.data if sub_chain is None else sub_chain) if n.data.state not in [ErrorCode.Success, ErrorCode.Evaluate]]
             error_loop_iter += 1
 
 
 class NodeFieldKernel(BaseFieldKernel):
     def __init__(self, fieldset, ptype, pyfunc=None, funcname=None, funccode=None, py_ast=None, funcvars=None,
-                 c_include="", delete_cfiles=True):
-        super(NodeFieldKernel, self).__init__(fieldset, ptype, pyfunc, funcname, funccode, py_ast, funcvars, c_include, delete_cfiles)
+                 c_include="", delete_cfiles=True, loopgen_class=NodeLoopGenerator):
+        super(NodeFieldKernel, self).__init__(fieldset, ptype, pyfunc, funcname, funccode, py_ast, funcvars, c_include, delete_cfiles, loopgen_class)
 
-    def execute_jit(self, pset, endtime, dt):
-        """Invokes JIT engine to perform the core update loop"""
+    def execute_jit(self, pset, endtime, dt, sub_chain=None):
+        """Invokes JIT engine to perform the core update loop (over the nodes of 'sub_chain' only, if given)"""
+        if sub_chain is not None and len(sub_chain) <= 0:
+            return
         # if len(pset.particles) > 0:
         #     assert pset.fieldset.gridset.size == len(pset.particles[0].xi), 'FieldSet has different amount of grids than Particle.xi. Have you added Fields after creating the ParticleSet?'
         if len(pset) > 0:
@@ -315,11 +325,12 @@ class NodeFieldKernel(BaseFieldKernel):
         fargs = [byref(f.ctypes_struct) for f in self.field_args.values()]
         fargs += [c_double(f) for f in self.const_args.values()]
         # particle_data = pset._particle_data.ctypes.data_as(c_void_p)
-        node_data = pset.begin()
-        self._function(c_int(len(pset)), pointer(node_data), c_double(endtime), c_double(dt), *fargs)
+        # -- the storage hands over its chain (deferred link changes are written to the C nodes first) -- #
+        num_particles, node_data = pset.export_c(sub_chain)
+        self._function(c_int(num_particles), pointer(node_data), c_double(endtime), c_double(dt), *fargs)
 
-    def execute_python(self, pset, endtime, dt):
-        """Performs the core update loop via Python"""
+    def execute_python(self, pset, endtime, dt, sub_chain=None):
+        """Performs the core update loop via Python (over the nodes of 'sub_chain' only, if given)"""
         sign_dt = np.sign(dt)
 
         # back up variables in case of ErrorCode.Repeat
@@ -333,66 +344,66 @@ class NodeFieldKernel(BaseFieldKernel):
         # ========= OLD ======= #
         # for p in pset.particles:
         # ===================== #
-        node = pset.begin()
-        while node is not None:
-            p = node.data
-            ptype = p.getPType()
-            # Don't execute particles that aren't started yet
-            sign_end_part = np.sign(endtime - p.time)
-            if (sign_end_part != sign_dt) and (dt != 0):
-                node = node.next
-                continue
-
-            # Compute min/max dt for first timestep
-            dt_pos = min(abs(p.dt), abs(endtime - p.time))
-            while dt_pos > 1e-6 or dt == 0:
-                for var in ptype.variables:
-                    p_var_back[var.name] = getattr(p, var.name)
-                try:
-                    pdt_prekernels = sign_dt * dt_pos
-                    p.dt = pdt_prekernels
-                    res = self.pyfunc(p, pset.fieldset, p.time)
-                #     res = self.pyfunc(p, None, p.time)
-                    if (res is None or res == ErrorCode.Success) and not np.isclose(p.dt, pdt_prekernels):
-                        res = ErrorCode.Repeat
-                # except FieldOutOfBoundError as fse:
-                #     res = ErrorCode.ErrorOutOfBounds
-                #     p.exception = fse
-                # except FieldOutOfBoundSurfaceError as fse_z:
-                #     res = ErrorCode.ErrorThroughSurface
-                #     p.exception = fse_z
-                except Exception as e:
-                    res = ErrorCode.Error
-                    p.exception = e
-
-                # Update particle state for explicit returns
-                if res is not None:
-                    p.state = res
-
-                # Handle particle time and time loop
-                if res is None or res == ErrorCode.Success:
-                    # Update time and repeat
-                    p.time += p.dt
-                    p.update_next_dt()
-                    dt_pos = min(abs(p.dt), abs(endtime - p.time))
-                    if dt == 0:
-                        break
+        for pbatch in pset.iter_batches(payload=True, sub_chain=sub_chain):
+            for p in pbatch:
+                ptype = p.getPType()
+                # Don't execute particles that aren't started yet
+                sign_end_part = np.sign(endtime - p.time)
+                if (sign_end_part != sign_dt) and (dt != 0):
                     continue
-                else:
-                    # Try again without time update
+
+                # Compute min/max dt for first timestep
+                dt_pos = min(abs(p.dt), abs(endtime - p.time))
+                while dt_pos > 1e-6 or dt == 0:
                     for var in ptype.variables:
-                        if var.name not in ['dt', 'state']:
-                            setattr(p, var.name, p_var_back[var.name])
-                    dt_pos = min(abs(p.dt), abs(endtime - p.time))
-                    break
-            node = node.next
+                        p_var_back[var.name] = getattr(p, var.name)
+                    try:
+                        pdt_prekernels = sign_dt * dt_pos
+                        p.dt = pdt_prekernels
+                        res = self.pyfunc(p, pset.fieldset, p.time)
+                    #     res = self.pyfunc(p, None, p.time)
+                        if (res is None or res == ErrorCode.Success) and not np.isclose(p.dt, pdt_prekernels):
+                            res = ErrorCode.Repeat
+                    # except FieldOutOfBoundError as fse:
+                    #     res = ErrorCode.ErrorOutOfBounds
+                    #     p.exception = fse
+                    # except FieldOutOfBoundSurfaceError as fse_z:
+                    #     res = ErrorCode.ErrorThroughSurface
+                    #     p.exception = fse_z
+                    except Exception as e:
+                        res = ErrorCode.Error
+                        p.exception = e
+
+                    # Update particle state for explicit returns
+                    if res is not None:
+                        p.state = res
+
+                    # Handle particle time and time loop
+                    if res is None or res == ErrorCode.Success:
+                        # Update time and repeat
+                        p.time += p.dt
+                        p.update_next_dt()
+                        dt_pos = min(abs(p.dt), abs(endtime - p.time))
+                        if dt == 0:
+                            break
+                        continue
+                    else:
+                        # Try again without time update
+                        for var in ptype.variables:
+                            if var.name not in ['dt', 'state']:
+                                setattr(p, var.name, p_var_back[var.name])
+                        dt_pos = min(abs(p.dt), abs(endtime - p.time))
+                        break
 
-    def execute(self, pset, endtime, dt, recovery=None, output_file=None):
-        """Execute this Kernel over a ParticleSet for several timesteps"""
+    def execute(self, pset, endtime, dt, recovery=None, output_file=None, sub_chain=None):
+        """Execute this Kernel over a ParticleSet for several timesteps
+        :param sub_chain: SubChain descriptor (see ParticleSet.id_range()) - if given, only its particles are
+                          executed (the descriptor is renewed by ID bounds after deleted particles are removed)
+        """
+        id_bounds = sub_chain.id_bounds() if sub_chain is not None else (None, None)
 
-        node = pset.begin()
-        while node is not None:
-            node.data.reset_state()
+        for p in (pset.cursor(payload=True) if sub_chain is None else sub_chain.cursor(payload=True)):
+            p.reset_state()
 
         def _print_error_occurred_(particle, fieldset, time):
             print("An error occurred during execution with particle={} at time={}".format(particle, time))
@@ -431,19 +442,21 @@ class NodeFieldKernel(BaseFieldKernel):
 
         # Execute the kernel over the particle set
         if self.ptype.uses_jit:
-            self.execute_jit(pset, endtime, dt)
+            self.execute_jit(pset, endtime, dt, sub_chain)
         else:
-            self.execute_python(pset, endtime, dt)
+            self.execute_python(pset, endtime, dt, sub_chain)
 
         # Remove all particles that signalled deletion
         _remove_deleted_(pset)
+        if id_bounds[0] is not None:
+            sub_chain = pset.id_range(id_bounds[0], id_bounds[1] + 1)
 
         # Identify particles that threw errors
         # ====================================== #
         # ==== EXPENSIVE LIST COMPREHENSION ==== #
         # ====================================== #
         # error_particles = [p for p in pset.particles if p.state != ErrorCode.Success]
-        error_particles = [n.data for n in pset.data if n.data.state not in [ErrorCode.Success, ErrorCode.Evaluate]]
+        error_particles = [n.data for n in (pset.data if sub_chain is None else sub_chain) if n.data.state not in [ErrorCode.Success, ErrorCode.Evaluate]]
 
         error_loop_iter = 0
         while len(error_particles) > 0:
@@ -470,6 +483,8 @@ class NodeFieldKernel(BaseFieldKernel):
 
             # Remove all particles that signalled deletion
             _remove_deleted_(pset)
+            if id_bounds[0] is not None:
+                sub_chain = pset.id_range(id_bounds[0], id_bounds[1] + 1)
 
             if DEBUG_MODE:
                 after_len = len(pset.particles)
@@ -478,9 +493,9 @@ class NodeFieldKernel(BaseFieldKernel):
 
             # Execute core loop again to continue interrupted particles
             if self.ptype.uses_jit:
-                self.execute_jit(pset, endtime, dt)
+                self.execute_jit(pset, endtime, dt, sub_chain)
             else:
-                self.execute_python(pset, endtime, dt)
+                self.execute_python(pset, endtime, dt, sub_chain)
 
             if DEBUG_MODE:
                 # recalc_delete_indices = len([i for i, p in enumerate(pset.particles) if p.state in [ErrorCode.Delete]])
@@ -494,7 +509,7 @@ class NodeFieldKernel(BaseFieldKernel):
             # ==== EXPENSIVE LIST COMPREHENSION ==== #
             # ====================================== #
             # error_particles = [p for p in pset.particles if p.state != ErrorCode.Success]
-            error_particles = [n.data for n in pset.data if n.data.state not in [ErrorCode.Success, ErrorCode.Evaluate]]
+            error_particles = [n.data for n in (pset.data if sub_chain is None else sub_chain) if n.data.state not in [ErrorCode.Success, ErrorCode.Evaluate]]
             error_loop_iter += 1
 
 
@@ -68,6 +68,7 @@ class BaseKernel(object):
     :arg pyfunc: (aggregated) Kernel function
     :arg funcname: function name
     :param delete_cfiles: Boolean whether to delete the C-files after compilation in JIT mode (default is True)
+    :param loopgen_class: loop generator class that generates the C loop over the particle chain (default is NodeLoopGenerator)
 
     Note: A Kernel is either created from a compiled <function ...> object
     or the necessary information (funcname, funccode, funcvars) is provided.
@@ -76,8 +77,9 @@ class BaseKernel(object):
     """
 
     def __init__(self, fieldset, ptype, pyfunc=None, funcname=None, funccode=None, py_ast=None, funcvars=None,
-                 c_include="", delete_cfiles=True):
+                 c_include="", delete_cfiles=True, loopgen_class=NodeLoopGenerator):
         self.fieldset = fieldset
+        self.loopgen_class = loopgen_class
         self.field_args = None
         self.const_args = None
         self.ptype = ptype
@@ -179,7 +181,7 @@ class BaseKernel(object):
         return kclass(self.fieldset, self.ptype, pyfunc=None,
                       funcname=funcname, funccode=self.funccode + kernel.funccode,
                       py_ast=func_ast, funcvars=self.funcvars + kernel.funcvars,
-                      delete_cfiles=delete_cfiles)
+                      delete_cfiles=delete_cfiles, loopgen_class=self.loopgen_class)
 
     def __add__(self, kernel):
         if not isinstance(kernel, BaseKernel):
@@ -207,6 +209,7 @@ class BaseNoFieldKernel(BaseKernel):
     :arg fieldset: FieldSet object providing the field information
     :arg ptype: PType object for the kernel particle
     :param delete_cfiles: Boolean whether to delete the C-files after compilation in JIT mode (default is True)
+    :param loopgen_class: loop generator class that generates the C loop over the particle chain (default is NodeLoopGenerator)
 
     Note: A Kernel is either created from a compiled <function ...> object
     or the necessary information (funcname, funccode, funcvars) is provided.
@@ -214,8 +217,8 @@ class BaseNoFieldKernel(BaseKernel):
     concatenation, the merged AST plus the new header definition is required.
     """
 
-    def __init__(self, fieldset, ptype, pyfunc=None, funcname=None, funccode=None, py_ast=None, funcvars=None, c_include="", delete_cfiles=True):
-        super(BaseNoFieldKernel, self).__init__(fieldset, ptype, pyfunc=pyfunc, funcname=funcname, funccode=funccode, py_ast=py_ast, funcvars=funcvars, c_include=c_include, delete_cfiles=delete_cfiles)
+    def __init__(self, fieldset, ptype, pyfunc=None, funcname=None, funccode=None, py_ast=None, funcvars=None, c_include="", delete_cfiles=True, loopgen_class=NodeLoopGenerator):
+        super(BaseNoFieldKernel, self).__init__(fieldset, ptype, pyfunc=pyfunc, funcname=funcname, funccode=funccode, py_ast=py_ast, funcvars=funcvars, c_include=c_include, delete_cfiles=delete_cfiles, loopgen_class=loopgen_class)
 
         # ====== TO BE DONE - IN SPECIFIC SUBCLASSES ====== #
         #if pyfunc is AdvectionRK4_3D:   # would be better if the idea of a Kernel being '2D', '3D, '4D' or 'uncertain' is captured as Attribute or as class stucture
@@ -288,7 +291,7 @@ class BaseNoFieldKernel(BaseKernel):
             kernelgen = KernelGenerator(ptype)
             kernel_ccode = kernelgen.generate(deepcopy(self.py_ast), self.funcvars)
             # loopgen = LoopGenerator(ptype)
-            loopgen = NodeLoopGenerator(ptype)
+            loopgen = self.loopgen_class(ptype)
 
             if path.isfile(c_include):
                 with open(c_include, 'r') as f:
@@ -337,6 +340,7 @@ class BaseFieldKernel(BaseKernel):
     :arg fieldset: FieldSet object providing the field information
     :arg ptype: PType object for the kernel particle
     :param delete_cfiles: Boolean whether to delete the C-files after compilation in JIT mode (default is True)
+    :param loopgen_class: loop generator class that generates the C loop over the particle chain (default is NodeLoopGenerator)
 
     Note: A Kernel is either created from a compiled <function ...> object
     or the necessary information (funcname, funccode, funcvars) is provided.
@@ -344,8 +348,8 @@ class BaseFieldKernel(BaseKernel):
     concatenation, the merged AST plus the new header definition is required.
     """
 
-    def __init__(self, fieldset, ptype, pyfunc=None, funcname=None, funccode=None, py_ast=None, funcvars=None, c_include="", delete_cfiles=True):
-        super(BaseFieldKernel, self).__init__(fieldset, ptype, pyfunc=pyfunc, funcname=funcname, funccode=funccode, py_ast=py_ast, funcvars=funcvars, c_include=c_include, delete_cfiles=delete_cfiles)
+    def __init__(self, fieldset, ptype, pyfunc=None, funcname=None, funccode=None, py_ast=None, funcvars=None, c_include="", delete_cfiles=True, loopgen_class=NodeLoopGenerator):
+        super(BaseFieldKernel, self).__init__(fieldset, ptype, pyfunc=pyfunc, funcname=funcname, funccode=funccode, py_ast=py_ast, funcvars=funcvars, c_include=c_include, delete_cfiles=delete_cfiles, loopgen_class=loopgen_class)
 
         # ====== TO BE DONE - IN SPECIFIC SUBCLASSES ====== #
         #if pyfunc is AdvectionRK4_3D:   # would be better if the idea of a Kernel being '2D', '3D, '4D' or 'uncertain' is captured as Attribute or as class stucture
@@ -415,7 +419,7 @@ class BaseFieldKernel(BaseKernel):
             self.const_args = kernelgen.const_args
 
             # loopgen = LoopGenerator(ptype)
-            loopgen = NodeLoopGenerator(ptype)
+            loopgen = self.loopgen_class(ptype)
 
             if path.isfile(c_include):
                 with open(c_include, 'r') as f:
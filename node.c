@@ -33,4 +33,102 @@ void reset_next_ptr(NodeJIT* self_node) {
 
 void reset_data_ptr(NodeJIT* self_node) {
     (*self_node)._c_data_p = NULL;
-}
\ No newline at end of file
+}
+
+/* ==== list operations ==== */
+void insert_between(NodeJIT* self_node, NodeJIT* prev_node, NodeJIT* next_node) {
+    (*self_node)._c_prev_p = (void*)prev_node;
+    (*self_node)._c_next_p = (void*)next_node;
+    if (prev_node != NULL)
+        (*prev_node)._c_next_p = (void*)self_node;
+    if (next_node != NULL)
+        (*next_node)._c_prev_p = (void*)self_node;
+}
+
+void unlink_node(NodeJIT* self_node) {
+    NodeJIT* prev_node = (NodeJIT*)((*self_node)._c_prev_p);
+    NodeJIT* next_node = (NodeJIT*)((*self_node)._c_next_p);
+    if (prev_node != NULL)
+        (*prev_node)._c_next_p = (void*)next_node;
+    if (next_node != NULL)
+        (*next_node)._c_prev_p = (void*)prev_node;
+    (*self_node)._c_prev_p = NULL;
+    (*self_node)._c_next_p = NULL;
+}
+
+void splice_chain(NodeJIT* first_node, NodeJIT* last_node, NodeJIT* prev_node, NodeJIT* next_node) {
+    NodeJIT* before_first = (NodeJIT*)((*first_node)._c_prev_p);
+    NodeJIT* after_last = (NodeJIT*)((*last_node)._c_next_p);
+    /* detach [first_node, last_node] from the chain it currently belongs to */
+    if (before_first != NULL)
+        (*before_first)._c_next_p = (void*)after_last;
+    if (after_last != NULL)
+        (*after_last)._c_prev_p = (void*)before_first;
+    /* ... and insert it between prev_node and next_node */
+    (*first_node)._c_prev_p = (void*)prev_node;
+    (*last_node)._c_next_p = (void*)next_node;
+    if (prev_node != NULL)
+        (*prev_node)._c_next_p = (void*)first_node;
+    if (next_node != NULL)
+        (*next_node)._c_prev_p = (void*)last_node;
+}
+
+size_t count_nodes(NodeJIT* begin_node) {
+    size_t n = 0;
+    NodeJIT* node = begin_node;
+    while (node != NULL) {
+        n++;
+        node = (NodeJIT*)((*node)._c_next_p);
+    }
+    return n;
+}
+
+NodeJIT* find_by_index(NodeJIT* begin_node, size_t index) {
+    size_t i = 0;
+    NodeJIT* node = begin_node;
+    while ((node != NULL) && (i < index)) {
+        i++;
+        node = (NodeJIT*)((*node)._c_next_p);
+    }
+    return node;
+}
+
+void sync_node_links(void** entries, size_t n) {
+    /* entries: n records of [node, prev, next, data] */
+    size_t i;
+    NodeJIT* node = NULL;
+    for (i = 0; i < n; i++) {
+        node = (NodeJIT*)(entries[4*i]);
+        (*node)._c_prev_p = entries[4*i+1];
+        (*node)._c_next_p = entries[4*i+2];
+        (*node)._c_data_p = entries[4*i+3];
+    }
+}
+
+size_t clone_chain(NodeJIT* begin_node, void* dst_nodes, size_t node_bytes, void* dst_records, size_t record_bytes, size_t n) {
+    /* copies the data records of (up to) n nodes of the chain starting at begin_node contiguously into dst_records,
+     * and links the n node structs of node_bytes each in dst_nodes into a chain of the copies */
+    size_t i = 0;
+    char* nodes = (char*)dst_nodes;
+    char* records = (char*)dst_records;
+    NodeJIT* node = begin_node;
+    NodeJIT* dst_node = NULL;
+    NodeJIT* dst_prev = NULL;
+    while ((node != NULL) && (i < n)) {
+        dst_node = (NodeJIT*)(nodes + i*node_bytes);
+        (*dst_node)._c_prev_p = (void*)dst_prev;
+        (*dst_node)._c_next_p = NULL;
+        if (dst_prev != NULL)
+            (*dst_prev)._c_next_p = (void*)dst_node;
+        if ((*node)._c_data_p != NULL) {
+            memcpy(records + i*record_bytes, (*node)._c_data_p, record_bytes);
+            (*dst_node)._c_data_p = (void*)(records + i*record_bytes);
+        } else {
+            (*dst_node)._c_data_p = NULL;
+        }
+        dst_prev = dst_node;
+        node = (NodeJIT*)((*node)._c_next_p);
+        i++;
+    }
+    return i;
+}
@@ -9,6 +9,8 @@ extern "C" {
 #include <stdbool.h>
 #include <math.h>
 #include <float.h>
+#include <stdint.h>
+#include <string.h>
 
 typedef struct _NodeJIT {
     void* _c_prev_p;
@@ -17,6 +19,56 @@ typedef struct _NodeJIT {
     void* _c_data_p;
 } NodeJIT;
 
+/* Node of an unrolled list: the first three members are identical to NodeJIT (so the link functions below
+ * apply to block nodes as well); '_c_data_p' points to a block of '_c_capacity' particle records, of which the
+ * ones with a non-zero entry in the occupancy mask '_c_mask_p' are valid. */
+typedef struct _BlockNodeJIT {
+    void* _c_prev_p;
+    void* _c_next_p;
+    void* _c_data_p;
+    void* _c_mask_p;
+    int _c_capacity;
+    int _c_count;
+} BlockNodeJIT;
+
+/* Header of a relocatable (offset-linked) node arena: the buffer holds this header, a table of 'capacity'
+ * (prev, next) slot index pairs of 'index_bytes' each at 'links_offset', and 'capacity' particle records of
+ * 'record_bytes' each at 'records_offset' (all offsets relative to the header). A link of -1 means 'no node'. */
+typedef struct _OffsetArenaHeader {
+    int64_t capacity;
+    int64_t count;
+    int64_t begin;
+    int64_t end;
+    int64_t free_head;
+    int64_t index_bytes;
+    int64_t links_offset;
+    int64_t records_offset;
+    int64_t record_bytes;
+} OffsetArenaHeader;
+
+/* Header of a structure-of-arrays particle storage: 'columns' holds one pointer per particle variable (in the
+ * order of the particle type's variables), each to an array of 'capacity' values; rows 0..count-1 are in use,
+ * and rows with a zero entry in 'alive' are tombstones (deleted particles, not yet compacted away). */
+typedef struct _SoAHeader {
+    int64_t count;
+    int64_t capacity;
+    int64_t begin;
+    unsigned char* alive;
+    void** columns;
+} SoAHeader;
+
+/* Header of a slot-map particle storage: 'records' holds 'capacity' particle records, and the chain order is
+ * threaded through the 'prev' / 'next' slot index columns, from slot 'begin' to slot 'end' (-1 ends the chain). */
+typedef struct _SlotMapHeader {
+    int64_t count;
+    int64_t capacity;
+    int64_t begin;
+    int64_t end;
+    int32_t* prev;
+    int32_t* next;
+    void* records;
+} SlotMapHeader;
+
 void init_node(NodeJIT* self_node);
 void set_prev_ptr(NodeJIT* self_node, NodeJIT* prev_node);
 void set_next_ptr(NodeJIT* self_node, NodeJIT* next_node);
@@ -25,6 +77,14 @@ void reset_prev_ptr(NodeJIT* self_node);
 void reset_next_ptr(NodeJIT* self_node);
 void reset_data_ptr(NodeJIT* self_node);
 
+void insert_between(NodeJIT* self_node, NodeJIT* prev_node, NodeJIT* next_node);
+void unlink_node(NodeJIT* self_node);
+void splice_chain(NodeJIT* first_node, NodeJIT* last_node, NodeJIT* prev_node, NodeJIT* next_node);
+size_t count_nodes(NodeJIT* begin_node);
+NodeJIT* find_by_index(NodeJIT* begin_node, size_t index);
+void sync_node_links(void** entries, size_t n);
+size_t clone_chain(NodeJIT* begin_node, void* dst_nodes, size_t node_bytes, void* dst_records, size_t record_bytes, size_t n);
+
 
 
 
@@ -3,45 +3,88 @@ from numpy import random
 import numpy as np
 
 class IdGenerator:
-    released_ids = []
+    """
+    Generates 64-bit IDs: released IDs are handed out again (last released, first reused) before new ones are
+    counted up. The released IDs are kept on a numpy uint64 stack that grows by doubling, so that batches of IDs
+    are allocated (nextIDs()) and released (releaseIDs()) with single array operations.
+    """
+    _released = None
+    _nreleased = 0
     next_id = 0
 
     def __init__(self):
-        self.released_ids = []
-        self.next_id = np.uint64(0)
+        self._released = np.zeros(1024, dtype=np.uint64)
+        self._nreleased = 0
+        self.next_id = 0
+
+    @property
+    def released_ids(self):
+        """
+        :return: view of the stack of released IDs (the top is the last element)
+        """
+        return self._released[:self._nreleased]
+
+    def _reserve(self, n):
+        """
+        Enlarges the stack (to at least twice its size) if 'n' more IDs do not fit.
+        """
+        required = self._nreleased + n
+        if required > len(self._released):
+            released = np.zeros(max(required, 2 * len(self._released)), dtype=np.uint64)
+            released[:self._nreleased] = self._released[:self._nreleased]
+            self._released = released
 
     def nextID(self):
-        n = len(self.released_ids)
-        if n == 0:
+        """
+        :return: next ID (int)
+        """
+        if self._nreleased == 0:
             result = self.next_id
             self.next_id += 1
-            return np.uint64(result)
-        else:
-            result = self.released_ids.pop(n-1)
-            return np.uint64(result)
+            return result
+        self._nreleased -= 1
+        return int(self._released[self._nreleased])
+
+    def nextIDs(self, n):
+        """
+        Allocates n IDs at once - in the order in which n calls of nextID() would return them.
+        :param n: number of IDs
+        :return: uint64 array of the IDs
+        """
+        result = np.empty(n, dtype=np.uint64)
+        m = min(n, self._nreleased)
+        # -- reused IDs first, from the top of the stack down -- #
+        result[:m] = self._released[self._nreleased-m:self._nreleased][::-1]
+        self._nreleased -= m
+        result[m:] = np.arange(self.next_id, self.next_id + n - m, dtype=np.uint64)
+        self.next_id += n - m
+        return result
 
     def releaseID(self, id):
-        self.released_ids.append(id)
+        self._reserve(1)
+        self._released[self._nreleased] = id
+        self._nreleased += 1
+
+    def releaseIDs(self, ids):
+        """
+        :param ids: array (or list) of IDs to release
+        """
+        ids = np.asarray(ids, dtype=np.uint64).ravel()
+        n = len(ids)
+        self._reserve(n)
+        self._released[self._nreleased:self._nreleased+n] = ids
+        self._nreleased += n
 
     def preGenerateIDs(self, high_value):
-        if len(self.released_ids) > 0:
-            self.released_ids.clear()
-        #for i in range(0, high_value):
-        #    self.released_ids.append(i)
-        self.released_ids = [i for i in range(0, high_value)]
+        self._released = np.arange(0, high_value, dtype=np.uint64)
+        self._nreleased = high_value
         self.next_id = high_value
 
     def permuteIDs(self):
-        n = len(self.released_ids)
-        indices = random.randint(0, n, 2*n)
-        for index in indices:
-            id = self.released_ids.pop(index)
-            self.released_ids.append(id)
-
-        #for iter in range(0, 2*n):
-        #    index = random.randint(0, n)
-        #    id = self.released_ids.pop(index)
-        #    self.released_ids.append(id)
+        """
+        Shuffles the released IDs in place, in O(n) (numpy's Fisher-Yates shuffle on the stack).
+        """
+        random.shuffle(self._released[:self._nreleased])
 
     def __len__(self):
         return self.next_id
@@ -111,6 +154,10 @@ class SpatioTemporalIdGenerator:
             self.released_ids[spatiotemporal_id] = []
         self.released_ids[spatiotemporal_id].append(local_id)
 
+    def releaseIDs(self, ids):
+        for id in ids:
+            self.releaseID(id)
+
     def __len__(self):
         return np.sum(self.local_ids)+sum([len(entity) for entity in self.released_ids])
 
@@ -1,10 +1,23 @@
 import time as time_module
+import ctypes
+import gc
+import threading
+from copy import copy
+from functools import partial
 from datetime import date
 from datetime import datetime as dtime
 from datetime import timedelta as delta
 
 from LinkedList import *
+from NodeArena import NodeArena
+from NodePool import NodePool
+from NodeStorage import NodeStorage
+from SkipList import SkipList
+from SoAStorage import SoAParticleStorage
+from SlotMap import SlotMapStorage
+from IdBitmap import IdBitmap
 import package_globals
+from wrapping import c_lib_register
 
 from particle import ScipyParticle, JITParticle
 from parcels_mocks import Grid, Field, GridSet, FieldSet
@@ -16,6 +29,14 @@ from kernel import NodeNoFieldKernel as Kernel
 from parcels_mocks.status import StatusCode as ErrorCode
 
 
+def plain_id(id):
+    """
+    :param id: particle ID - int, numpy integer or 1-element array (as the 'id' of a JIT particle)
+    :return: the ID as Python int
+    """
+    return int(id[0]) if isinstance(id, np.ndarray) else int(id)
+
+
 class RepeatParameters(object):
     _n_pts = 0
     _lon = []
@@ -85,9 +106,33 @@ class ParticleSet(object):
     _ptype = None
     _fieldset = None
     _kernel = None
+    _pool = None
+    _storage = None
+    _id_index = None
+    _id_lock = None
+    _deferred_links = False
     lonlatdepth_dtype = None
 
-    def __init__(self, fieldset = FieldSet(), pclass=JITParticle, lon=None, lat=None, depth=None, time=None, repeatdt=None, lonlatdepth_dtype=None, pid_orig=None, **kwargs):
+    def __init__(self, fieldset = FieldSet(), pclass=JITParticle, lon=None, lat=None, depth=None, time=None, repeatdt=None, lonlatdepth_dtype=None, pid_orig=None, deferred_links=False, compact_nodes=False, node_pool=False, skip_list=False, order_backend=None, storage=None, **kwargs):
+        """
+        :param deferred_links: if True, Python-side link changes of the (JIT) nodes are journaled and only
+                               written to C right before a compiled kernel is executed (see Node.LinkJournal).
+                               The journal is shared by the whole process: it stays enabled until this set (and
+                               every other set with deferred links) is destroyed
+        :param compact_nodes: if True, the particles are stored in __slots__-based nodes (CompactNode,
+                              CompactNodeJIT), which need less memory per particle than Node / NodeJIT
+        :param node_pool: if True, nodes of removed particles are recycled for newly added particles (see NodePool),
+                          instead of being destroyed and re-created
+        :param skip_list: if True, the nodes are indexed by a SkipList (express lanes over the node chain) instead of
+                          a RealList (SortedList of all nodes next to the chain)
+        :param order_backend: order-statistic backend class (see OrderStatistic, e.g. BPlusTreeList) - if given, the
+                              nodes are indexed by an OrderedList on top of that backend instead of a RealList
+        :param storage: node storage class (or factory), called as storage(dtype=<node class>) - any implementation
+                        of the NodeStorage protocol; overrides 'skip_list' and 'order_backend'. With
+                        ConcurrentList.ConcurrentRealList, several threads may add() particles at the same time.
+                        Record storages (e.g. SoAStorage.SoAParticleStorage) bring their own node class, which
+                        replaces the one chosen by 'compact_nodes'; they don't use a node pool
+        """
         self._fieldset = fieldset
         if lonlatdepth_dtype is not None:
             self.lonlatdepth_dtype = lonlatdepth_dtype
@@ -101,10 +146,30 @@ class ParticleSet(object):
         self._kernel = None
         self._ptype = self._pclass.getPType()
         if self._ptype.uses_jit:
-            self._nclass = NodeJIT
+            self._nclass = CompactNodeJIT if compact_nodes else NodeJIT
         else:
-            self._nclass = Node
-        self._nodes = RealList(dtype=self._nclass)
+            self._nclass = CompactNode if compact_nodes else Node
+        if storage is None:
+            if skip_list:
+                storage = SkipList
+            elif order_backend is not None:
+                storage = partial(OrderedList, backend=order_backend)
+            else:
+                storage = RealList
+        self._storage = storage
+        self._nodes = storage(dtype=self._nclass)
+        assert isinstance(self._nodes, NodeStorage)
+        self._nodes.attach(self._pclass, self._fieldset.gridset.size)
+        self._nclass = self._nodes.dtype
+        # -- membership of the particle IDs, as one bit per ID (kept up to date by all adding / removing methods) -- #
+        self._id_index = IdBitmap()
+        # -- the ID generator and the ID bitmap are shared by all producers that add particles (the storage - e.g.
+        #    ConcurrentList.ConcurrentRealList - takes care of its own locking) -- #
+        self._id_lock = threading.Lock()
+        self._pool = NodePool(self._nclass) if node_pool and self._nodes.node_based else None
+        self._deferred_links = deferred_links and self._ptype.uses_jit
+        if self._deferred_links:
+            node_link_journal.enable()
 
         self.repeatdt = repeatdt.total_seconds() if isinstance(repeatdt, delta) else repeatdt
         rdata_available = True
@@ -118,6 +183,12 @@ class ParticleSet(object):
 
         # fill / initialize the list
 
+    def __del__(self):
+        # -- this set's hold on the process-wide link journal ends with the set -- #
+        if self._deferred_links:
+            self._deferred_links = False
+            node_link_journal.disable()
+
     def cptr(self, index):
         if self._ptype.uses_jit:
             node = self._nodes[index]
@@ -133,12 +204,7 @@ class ParticleSet(object):
         Returns the begin of the linked particle list (like C++ STL begin() function)
         :return: begin Node (Node whose prev element is None); returns None if ParticleSet is empty
         """
-        if not self.empty():
-            node = self._nodes[0]
-            while node.prev is not None:
-                node = node.prev
-            return node
-        return None
+        return self._nodes.begin()
 
     def end(self):
         """
@@ -146,12 +212,116 @@ class ParticleSet(object):
         not the element past the last element (invalid element). (see http://www.cplusplus.com/reference/list/list/end/)
         :return: end Node (Node whose next element is None); returns None if ParticleSet is empty
         """
-        if not self.empty():
-            node = self._nodes[self.size-1]
-            while node.next is not None:
-                node = node.next
-            return node
-        return None
+        return self._nodes.end()
+
+    def cursor(self, start=None, backward=False, payload=False):
+        """
+        Returns a cursor over the linked particle list (see Node.NodeCursor).
+        :param start: node to start from; defaults to begin() (forward) or end() (backward)
+        :param backward: if True, the cursor moves from the end towards the begin of the list
+        :param payload: if True, the cursor returns the particle data instead of the nodes
+        :return: NodeCursor
+        """
+        if start is None:
+            start = self.end() if backward else self.begin()
+        return NodeCursor(start, backward=backward, payload=payload)
+
+    def iter_batches(self, batch_size=1024, start=None, backward=False, payload=False, sub_chain=None):
+        """
+        Iterates the linked particle list in batches (lists) of up to 'batch_size' nodes or particles.
+        :param batch_size: maximum number of items per batch
+        :param start: node to start from; defaults to begin() (forward) or end() (backward)
+        :param backward: if True, iterates from the end towards the begin of the list
+        :param payload: if True, the batches contain the particle data instead of the nodes
+        :param sub_chain: SubChain descriptor (see id_range()) - if given, only its nodes are iterated (forward)
+        :return: generator of lists
+        """
+        if sub_chain is not None:
+            return sub_chain.batches(batch_size, payload=payload)
+        return self.cursor(start=start, backward=backward, payload=payload).batches(batch_size)
+
+    def id_range(self, lo, hi):
+        """
+        Returns a descriptor of the contiguous block of particles with IDs in [lo, hi) - without building a list of
+        its nodes. The descriptor can be handed to the kernels (see Kernel.execute()), e.g. to process ID blocks
+        of the set in separate partitions.
+        :param lo: lowest particle ID of the block
+        :param hi: particle ID after the block
+        :return: SubChain (first node, last node, count)
+        """
+        return self._nodes.id_range(lo, hi)
+
+    def index_range(self, start, stop):
+        """
+        Returns a descriptor of the particles at the list positions [start, stop) (see id_range()).
+        :param start: position of the first particle
+        :param stop: position after the last particle
+        :return: SubChain (first node, last node, count)
+        """
+        return self._nodes.index_range(start, stop)
+
+    def flush_links(self):
+        """
+        Writes all journaled (deferred) link changes to the C nodes; needs to be called before the C code walks the list.
+        """
+        node_link_journal.flush()
+
+    def export_c(self, sub_chain=None):
+        """
+        Prepares the node chain for the compiled particle loop (flushing all deferred link changes first).
+        :param sub_chain: SubChain descriptor (see id_range()) - if given, the loop only covers its nodes
+        :return: tuple (num_particles, node_begin) - the leading arguments of the particle loop (see
+                 NodeStorage.export_c())
+        """
+        self.flush_links()
+        return self._nodes.export_c(sub_chain)
+
+    @property
+    def loopgen_class(self):
+        """
+        :return: loop generator class for the compiled particle loop over the node storage
+        """
+        return self._nodes.loopgen_class
+
+    def supports(self, method):
+        """
+        :param method: name of an optional storage operation (see NodeStorage.OPTIONAL_METHODS)
+        :return: True if the node storage of this set implements it (see NodeStorage.supports())
+        """
+        return self._nodes.supports(method)
+
+    def _require(self, method):
+        """
+        Refuses an optional storage operation that the node storage of this set does not implement, before any
+        part of the set is changed.
+        :param method: name of the operation (see NodeStorage.OPTIONAL_METHODS)
+        """
+        if not self._nodes.supports(method):
+            raise NotImplementedError("{}() is not supported by the node storage of this ParticleSet ({})".format(
+                method, type(self._nodes).__name__))
+
+    def snapshot(self):
+        """
+        Takes a copy-on-write snapshot of the particles (see LinkedList.RealListSnapshot), e.g. for an output writer
+        thread: the snapshot's records() stay those of the time of the snapshot, while execute() already continues
+        with the next kernel step on the live set. Only storages that implement snapshots (see supports()) can be
+        used - others are refused with a NotImplementedError.
+
+        The particle records are only copied when the set is about to change them: execute() and __setitem__() do
+        this on their own. Code that changes particle data directly (e.g. 'pset[i].data.lon = ...') while a snapshot
+        is alive has to call materialize_snapshots() first; otherwise the change shows up in the snapshot.
+        :return: snapshot of the node storage
+        """
+        self._require('snapshot')
+        self.flush_links()
+        return self._nodes.snapshot()
+
+    def materialize_snapshots(self):
+        """
+        Lets all live snapshots of the set copy the particle records they share (see snapshot()) - to be called
+        before particle data is changed outside of execute().
+        """
+        self._nodes.materialize_snapshots()
 
     def set_kernel_class(self, kclass):
         self._kclass = kclass
@@ -173,13 +343,8 @@ class ParticleSet(object):
 
     def __repr__(self):
         result = "\n"
-        node = self._nodes[0]
-        while node.prev is not None:
-            node = node.prev
-        while node.next is not None:
+        for node in self.cursor():
             result += str(node) + "\n"
-            node = node.next
-        result += str(node) + "\n"
         return result
         #return "\n".join([str(p) for p in self])
 
@@ -191,25 +356,22 @@ class ParticleSet(object):
 
     def get_by_id(self, id):
         """
-        divide-and-conquer search of SORTED list
         :param id: search Node ID
-        :return: Node attached to ID
-        """
-        lower = 0
-        upper = len(self._nodes)-1
-        pos = lower + int((upper-lower)/2.0)
-        current_node = self._nodes[pos]
-        while current_node.id != id:
-            if id < current_node.id:
-                lower = lower
-                upper = pos-1
-                pos = lower + int((upper-lower)/2.0)
-            else:
-                lower = pos
-                upper = upper
-                pos = lower + int((upper-lower)/2.0)+1
-            current_node = self._nodes[pos]
-        return current_node
+        :return: Node attached to ID (see NodeStorage.get_by_id()); None if the ID is not in the set, which is
+                 answered by the ID bitmap without searching the storage
+        """
+        id = plain_id(id)
+        if id not in self._id_index:
+            return None
+        return self._nodes.get_by_id(id)
+
+    def __contains__(self, item):
+        """
+        O(1) membership test on the ID bitmap (see IdBitmap).
+        :param item: particle ID, Node or particle data
+        """
+        id = item if isinstance(item, (int, np.integer)) else item.id
+        return id is not None and plain_id(id) in self._id_index
 
     def get_particle(self, index):
         return self.get(index).data
@@ -234,11 +396,12 @@ class ParticleSet(object):
         except AssertionError:
             print("setting value not of type '{}'".format(str(self._pclass)))
             exit()
+        self._nodes.materialize_snapshots()
         if isinstance(key, int) or isinstance(key, np.int32):
             search_node = self._nodes[key]
             search_node.set_data(value)
         elif isinstance(key, self._nclass):
-            assert (key in self._nodes)
+            assert key.id in self._id_index
             key.set_data(value)
 
     def __iadd__(self, pdata):
@@ -251,20 +414,40 @@ class ParticleSet(object):
         :param pdata: new Node or pdata
         :return: index of inserted node
         """
-        index = -1
         if isinstance(pdata, self._nclass):
-            self._nodes.add(pdata)
-            index = self._nodes.bisect_right(pdata)
+            node = pdata
         else:
-            index = package_globals.idgen.nextID()
-            pdata.id = int(index)
-            node = NodeJIT(id=int(index), data=pdata)
-            self._nodes.add(node)
-            index = self._nodes.bisect_right(node)
-        if index > 0:
-            # return self._nodes[index]
-            return index
-        return None
+            with self._id_lock:
+                id = int(package_globals.idgen.nextID())
+            pdata.id = id
+            node = self._new_node(id=id, data=pdata)
+        prev_node, next_node, index = self._nodes.add_locate(node)
+        with self._id_lock:
+            self._id_index.add(node.id)
+        # -- as bisect_right() of the inserted node: the position after it -- #
+        return index + 1
+
+    def add_many(self, pdata_array):
+        """
+        Adds a batch of new data (or nodes) to the list with one sort, one merge and one linking pass, instead of
+        one add() per element (see LinkedList.update_linked()).
+        :param pdata_array: iterable of new Nodes or pdata
+        """
+        pdata_array = list(pdata_array)
+        # -- the IDs of the new particle data are allocated in one call -- #
+        with self._id_lock:
+            ids = iter(package_globals.idgen.nextIDs(sum(1 for pdata in pdata_array if not isinstance(pdata, self._nclass))).tolist())
+        nodes = []
+        for pdata in pdata_array:
+            if isinstance(pdata, self._nclass):
+                nodes.append(pdata)
+            else:
+                id = next(ids)
+                pdata.id = id
+                nodes.append(self._new_node(id=id, data=pdata))
+        self._nodes.update(nodes)
+        with self._id_lock:
+            self._id_index.add_many([node.id for node in nodes])
 
     def remove(self, ndata):
         if ndata is None:
@@ -275,48 +458,85 @@ class ParticleSet(object):
         else:
             self.remove_entity(ndata)
 
+    def _new_node(self, id=None, data=None):
+        """
+        Creates a node for new particle data - recycled from the node pool, if the ParticleSet uses one.
+        :param id: node ID
+        :param data: particle data
+        :return: new node (not yet inserted into the list)
+        """
+        if self._pool is not None:
+            return self._pool.acquire(id=id, data=data)
+        return self._nclass(id=id, data=data)
+
+    def _release_node(self, node):
+        """
+        Hands a node that has just been removed from the list back to the node pool (if any).
+        :param node: removed node
+        """
+        if self._pool is not None:
+            # -- the recycled node gets new particle data: snapshots sharing it need their copy first -- #
+            self._nodes.materialize_snapshots()
+            self._pool.release(node)
+
     def remove_entity(self, ndata):
         if isinstance(ndata, int) or isinstance(ndata, np.int32):
-            del self._nodes[ndata]
+            self._id_index.discard(self._nodes[ndata].id)
+            if self._pool is not None:
+                self._release_node(self._nodes.pop(ndata))
+            else:
+                del self._nodes[ndata]
             # search_node = self._nodes[ndata]
             # self._nodes.remove(search_node)
         elif isinstance(ndata, self._nclass):
+            self._id_index.discard(ndata.id)
             self._nodes.remove(ndata)
+            self._release_node(ndata)
         elif isinstance(ndata, self._pclass):
             node = self.get_by_id(ndata.id)
+            self._id_index.discard(node.id)
             self._nodes.remove(node)
+            self._release_node(node)
 
     def remove_entities(self, ndata_array):
-        rm_list = ndata_array
         if len(ndata_array) <= 0:
             return
-        if isinstance(rm_list[0], int) or isinstance(rm_list[0], np.int32) or isinstance(rm_list[0], np.int64):
-            rm_list = []
-            for index in ndata_array:
-                rm_list.append(self.get_by_index(index))
-        for ndata in rm_list:
-            self.remove_entity(ndata)
+        # -- list positions or a boolean mask (np.bool_ is no np.integer) -- #
+        if isinstance(ndata_array[0], (int, np.integer, np.bool_)):
+            self.remove_many(ndata_array)
+            return
+        indices = []
+        for ndata in ndata_array:
+            node = ndata if isinstance(ndata, self._nclass) else self.get_by_id(ndata.id)
+            indices.append(self._nodes.bisect_left(node))
+        self.remove_many(indices)
+
+    def remove_many(self, indices_or_mask):
+        """
+        Removes many particles at once (e.g. after mass beaching or out-of-bounds events) in a single linear pass
+        over the list, instead of one removal per particle (see LinkedList.RealList.remove_many()).
+        :param indices_or_mask: array (or list) of list positions, or boolean mask over the list
+        """
+        victims = self._nodes.remove_many(indices_or_mask)
+        self._id_index.discard_many([node.id for node in victims])
+        for node in victims:
+            self._release_node(node)
 
     def get_deleted_item_indices(self):
-        indices = [i for i, n in enumerate(self._nodes) if n.data.state == ErrorCode.Delete]
+        indices = np.flatnonzero(self._nodes.deleted_mask()).tolist()
         return indices
 
     def remove_deleted_items_by_indices(self, indices):
         if len(indices)> 0:
-            indices.sort(reverse=True)
-            for index in indices:
-                del self._nodes[index]
+            self.remove_many(indices)
 
     def remove_deleted_items(self):
-        node = self.begin()
-        while node is not None:
-            next_node = node.next
-            if node.data.state == ErrorCode.Delete:
-                self._nodes.remove(node)
-            node = next_node
+        self.remove_many(self._nodes.deleted_mask())
 
     def pop(self, idx=-1, deepcopy_elem=False):
-        return self._nodes.pop(idx, deepcopy_elem)
+        node = self._nodes.pop(idx, deepcopy_elem)
+        self._id_index.discard(node.id)
+        return node
 
     def insert(self, node_or_pdata):
         """
@@ -326,16 +546,237 @@ class ParticleSet(object):
         """
         return self.add(node_or_pdata)
 
-    def merge(self, key1, key2):
-        pass
+    def merge(self, other, sub_chain=None):
+        """
+        Moves the particles of another ParticleSet into this one - all of them (see concat()), or only a run of them
+        (see splice()).
+        :param other: ParticleSet of the same particle and node class
+        :param sub_chain: SubChain descriptor of the run to move, taken from 'other' (see id_range()); default: all
+        :return: this ParticleSet
+        """
+        if sub_chain is None:
+            return self.concat(other)
+        return self.splice(other, sub_chain)
 
     def split(self, key):
         """
-        splits a node, returning the result 2 new nodes
-        :param key: index (int; np.int32), Node
-        :return: 'node1, node2' or 'index1, index2'
+        Splits the set in two before a particle (see split_at()).
+        :param key: index (int; np.int32), Node or particle data of the first particle of the new set
+        :return: new ParticleSet with the particles from 'key' on; this set keeps the ones before
+        """
+        if isinstance(key, (int, np.integer)):
+            key = self._nodes[key]
+        return self.split_at(key.id)
+
+    def fork(self):
+        """
+        Creates an independent copy of this ParticleSet, e.g. for ensemble perturbation runs or for snapshots.
+        The node chain and all particle data are cloned in bulk: for JIT particles, a single call into the 'node'
+        library copies all particle records into one contiguous array and links the cloned C nodes (which are
+        placed in one NodeArena slab). The node index of the copy is then built in a single pass over the (sorted)
+        chain, instead of inserting the clones one by one.
+        The cloned particles get new IDs, handed out in the order of the original IDs - hence, the i-th particle
+        of the fork is the clone of the i-th particle of this set.
+        :return: new ParticleSet
+        """
+        if not self._nodes.node_based:
+            # -- record storages copy the particle records in one batch -- #
+            return self._copy_records(self._storage)
+        self.flush_links()
+        result = self._empty_like()
+        sources = list(self.cursor())
+        n = len(sources)
+        if n <= 0:
+            return result
+        with self._id_lock:
+            ids = np.sort(package_globals.idgen.nextIDs(n)).tolist()
+        # -- none of the new objects can be garbage yet: don't let the collector scan them while they are created -- #
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            if self._ptype.uses_jit:
+                nodes = result._clone_chain_jit(sources, ids)
+            else:
+                nodes = result._clone_chain(sources, ids)
+            # -- the nodes are already sorted and linked: no per-node add() (and no relinking) needed -- #
+            result._nodes.adopt_chain(nodes)
+            result._id_index.add_many(ids)
+        finally:
+            if gc_enabled:
+                gc.enable()
+        return result
+
+    def _empty_like(self, storage=None):
+        """
+        :param storage: node storage class (or factory) of the new set; default: the one of this set
+        :return: new, empty ParticleSet with the configuration (fieldset, particle class, node class, storage,
+                 repeat parameters, ...) of this one
+        """
+        result = type(self)(fieldset=self._fieldset, pclass=self._pclass, repeatdt=self.repeatdt,
+                            lonlatdepth_dtype=self.lonlatdepth_dtype,
+                            compact_nodes=self._nclass in (CompactNode, CompactNodeJIT),
+                            node_pool=self._pool is not None,
+                            storage=self._storage if storage is None else storage)
+        result._kclass = self._kclass
+        if hasattr(self, 'rparam'):
+            result.repeat_starttime = self.repeat_starttime
+            result.rparam = self.rparam
+        return result
+
+    def split_at(self, id):
+        """
+        Moves the particles with IDs from 'id' on into a new ParticleSet (e.g. to hand an ID range to another
+        worker), without re-adding them one by one: the node chain is cut in O(1) (see RealList.split_at()).
+        :param id: lowest particle ID of the new set (int, numpy integer or the 1-element 'id' of a JIT particle)
+        :return: new ParticleSet with the upper particles; this set keeps the lower ones
+        """
+        # -- everything that can fail comes before the first change to this set -- #
+        self._require('split_at')
+        id = plain_id(id)
+        result = self._empty_like()
+        self.flush_links()
+        lower, upper = self._nodes.split_at(id)
+        result._nodes.concat(upper)
+        result._id_index = self._id_index.split_off(id)
+        return result
+
+    def concat(self, other):
+        """
+        Moves all particles of another ParticleSet (of the same particle and node class) into this one; for
+        disjoint ID ranges, the node chains are joined in O(1) (see RealList.concat()).
+        :param other: ParticleSet; empty afterwards
+        :return: this ParticleSet
+        """
+        assert other._nclass == self._nclass
+        self._require('concat')
+        self.flush_links()
+        self._nodes.concat(other._nodes)
+        self._id_index.update(other._id_index)
+        other._id_index.clear()
+        return self
+
+    def splice(self, other, sub_chain):
+        """
+        Moves a run of particles (see id_range()) out of another ParticleSet into this one.
+        :param other: ParticleSet that holds the particles of the run
+        :param sub_chain: SubChain descriptor of the run, taken from 'other'
+        :return: this ParticleSet
+        """
+        assert other._nclass == self._nclass
+        self._require('splice')
+        self.flush_links()
+        ids = [node.id for node in sub_chain]
+        self._nodes.splice(other._nodes, sub_chain)
+        other._id_index.discard_many(ids)
+        self._id_index.add_many(ids)
+        return self
+
+    def to_soa(self, capacity=None, compact_ratio=0.25):
+        """
+        Copies the particles into a new ParticleSet on a structure-of-arrays storage (see
+        SoAStorage.SoAParticleStorage) - one numpy column per particle variable, for vectorised operations on the
+        particle data (see SoAParticleStorage.column()) and for the compiled particle loop of SoALoopGenerator.
+        As with fork(), the copies get new IDs, handed out in the order of the original IDs.
+        :param capacity: initial number of rows of the storage (default: twice the number of particles)
+        :param compact_ratio: share of tombstones above which the storage compacts its columns
+        :return: ParticleSet
+        """
+        if capacity is None:
+            capacity = max(2 * self.size, 1)
+        return self._copy_records(partial(SoAParticleStorage, capacity=capacity, compact_ratio=compact_ratio))
+
+    def to_slot_map(self, capacity=None):
+        """
+        Copies the particles into a new ParticleSet on a slot map (see SlotMap.SlotMapStorage) - particle records in
+        one preallocated array, chained in ID order through int32 index columns, without Python objects per
+        particle; its kernels use the loop of SlotMapLoopGenerator. As with fork(), the copies get new IDs, handed
+        out in the order of the original IDs.
+        :param capacity: initial number of slots of the storage (default: twice the number of particles)
+        :return: ParticleSet
+        """
+        if capacity is None:
+            capacity = max(2 * self.size, 1)
+        return self._copy_records(partial(SlotMapStorage, capacity=capacity))
+
+    def _copy_records(self, storage):
+        """
+        Copies the particles into a new ParticleSet on a record storage (see RecordStorage), in one batch.
+        :param storage: record storage class (or factory)
+        :return: new ParticleSet; the i-th particle of it is the copy of the i-th particle of this set
+        """
+        self.flush_links()
+        result = self._empty_like(storage=storage)
+        assert not result._nodes.node_based
+        sources = list(self.cursor(payload=True))
+        with self._id_lock:
+            ids = np.sort(package_globals.idgen.nextIDs(len(sources))).tolist()
+        result._nodes.update([result._nclass(id=id, data=particle) for particle, id in zip(sources, ids)], copy=True)
+        result._id_index.add_many(ids)
+        return result
+
+    def _clone_chain(self, sources, ids):
+        """
+        Clones a chain of (non-JIT) nodes and their particles for fork().
+        :param sources: nodes to clone, in chain order
+        :param ids: IDs of the clones, in chain order
+        :return: list of the linked clone nodes
+        """
+        nodes = []
+        prev = None
+        for source, id in zip(sources, ids):
+            data = None
+            if source.data is not None:
+                data = copy(source.data)
+                data.id = id
+            node = self._nclass(prev=prev, id=id, data=data)
+            if prev is not None:
+                prev.next = node
+            nodes.append(node)
+            prev = node
+        return nodes
+
+    def _clone_chain_jit(self, sources, ids):
+        """
+        Clones a chain of JIT nodes and their particles for fork(): the C nodes and the particle records are
+        copied by a single call into the 'node' library, then the Python-side objects are set up as views on them.
+        :param sources: nodes to clone, in chain order
+        :param ids: IDs of the clones, in chain order
+        :return: list of the linked clone nodes
         """
-        pass
+        n = len(sources)
+        records = np.zeros(n, dtype=self._ptype.dtype)
+        nodes = NodeArena(self._nclass, slab_size=n).claim_slab()
+        self._nclass.bind_c_functions()
+        ncloned = self._nclass.clone_chain_c(sources[0], ctypes.addressof(nodes[0]), ctypes.sizeof(self._nclass),
+                                             records.ctypes.data, self._ptype.dtype.itemsize, n)
+        assert ncloned == n
+        records['id'] = ids
+
+        particles = [node.data for node in sources]
+        # -- the grid search indices get copied as well, into one block per index (one row per particle) -- #
+        index_rows = []
+        for index in ['xi', 'yi', 'zi', 'ti']:
+            block = np.stack([getattr(p, index) for p in particles])
+            base, stride = block.ctypes.data, block.strides[0]
+            records['c'+index] = np.uint64(base) + np.arange(n, dtype=np.uint64) * np.uint64(stride)
+            index_rows.append((index, list(block), base, stride))
+
+        for i in range(n):
+            source = particles[i]
+            particle = object.__new__(type(source))
+            particle.__dict__.update(source.__dict__)
+            particle.set_cptr(records[i:i+1])
+            for index, rows, base, stride in index_rows:
+                setattr(particle, index, rows[i])
+                setattr(particle, index+'p', ctypes.c_void_p(base + i*stride))
+            node = nodes[i]
+            node.prev = nodes[i-1] if i > 0 else None
+            node.next = nodes[i+1] if i < n-1 else None
+            node.id = ids[i]
+            node.data = particle
+            node.registered = True
+        c_lib_register.register("node", n)
+        return nodes
 
     def execute(self, pyfunc=DoNothing, endtime=None, runtime=None, dt=1.,
                 recovery=None, output_file=None, verbose_progress=None):
@@ -455,6 +896,8 @@ class ParticleSet(object):
                 time = min(next_prelease, next_input, next_output, endtime)
             else:
                 time = max(next_prelease, next_input, next_output, endtime)
+            # -- snapshots taken for output still share the particle records, which the kernel is about to change -- #
+            self.materialize_snapshots()
             self._kernel.execute(self, endtime=time, dt=dt, recovery=recovery, output_file=output_file)
             if abs(time-next_prelease) < tol:
                 add_iter = 0
@@ -463,7 +906,7 @@ class ParticleSet(object):
                     pindex = package_globals.idgen.nextID() if gen_id is None else gen_id
                     pdata = JITParticle(lon=self.rparam.get_longitude(add_iter), lat=self.rparam.get_latitude(add_iter), pid=pindex, fieldset=self._fieldset, depth=self.rparam.get_depth_value(add_iter), time=time[add_iter])
                     pdata.dt = dt
-                    self.add(self._nclass(id=pindex, data=pdata))
+                    self.add(self._new_node(id=pindex, data=pdata))
                 next_prelease += self.repeatdt * np.sign(dt)
             if abs(time-next_output) < tol:
                 if output_file is not None:
@@ -484,7 +927,8 @@ class ParticleSet(object):
         based on `fieldset` and `ptype` of the ParticleSet
         :param delete_cfiles: Boolean whether to delete the C-files after compilation in JIT mode (default is True)
         """
-        return self._kclass(self._fieldset, self._ptype, pyfunc=pyfunc, c_include=c_include, delete_cfiles=delete_cfiles)
+        return self._kclass(self._fieldset, self._ptype, pyfunc=pyfunc, c_include=c_include, delete_cfiles=delete_cfiles,
+                            loopgen_class=self.loopgen_class)
 
     #def ParticleFile(self, *args, **kwargs):
     #    """Wrapper method to initialise a :class:`parcels.particlefile.ParticleFile`
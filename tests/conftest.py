@@ -0,0 +1,79 @@
+import ctypes
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import numpy as np
+import pytest
+
+import package_globals
+from parcels_mocks import FieldSet, Field, Grid
+from particle import ScipyParticle, JITParticle
+
+
+@pytest.fixture
+def fieldset():
+    """:return: FieldSet with a single (2x2x2) grid and U / V fields over 20 days"""
+    time = np.arange(0, 86400*30, 86400*10, dtype=np.float64)
+    grid = Grid(time, 2, 2, 2, time.shape[0])
+    fieldset = FieldSet()
+    fieldset.append(Field(fieldset, time, 'U', grid))
+    fieldset.append(Field(fieldset, time, 'V', grid))
+    fieldset.gridset.append(grid)
+    fieldset.gridset.set_time_by_numpy(time)
+    return fieldset
+
+
+@pytest.fixture(params=[ScipyParticle, JITParticle], ids=['scipy', 'jit'])
+def pclass(request):
+    return request.param
+
+
+def make_particles(pclass, fieldset, lons):
+    """:return: list of new particles (not yet in a set) at the given longitudes"""
+    return [pclass(lon=float(lon), lat=0., pid=0, fieldset=fieldset, depth=0., time=0., dt=3600.) for lon in lons]
+
+
+def scalar(value):
+    """:return: Python scalar of a particle variable (JIT particles return 1-element arrays)"""
+    return np.ravel(value)[0].item()
+
+
+def ids_of(pset):
+    return [int(node.id) for node in pset.data]
+
+
+def lons_of(pset):
+    return [scalar(node.data.lon) for node in pset.data]
+
+
+def compile_kernel(pset, pyfunc, loopgen_class=None):
+    """
+    :param loopgen_class: loop generator to use instead of the one of the set's storage (for containers that are
+                          run directly, see run_loop())
+    :return: kernel of the set for 'pyfunc', compiled and loaded for JIT particle sets
+    """
+    from particleset_node import GNUCompiler
+    if loopgen_class is None:
+        kernel = pset.Kernel(pyfunc)
+    else:
+        kernel = pset._kclass(pset.fieldset, pset._ptype, pyfunc=pyfunc, loopgen_class=loopgen_class)
+    if pset._ptype.uses_jit:
+        kernel.compile(compiler=GNUCompiler(incdirs=[os.path.join(package_globals.get_package_dir(), 'include'), ROOT],
+                                            libdirs=[ROOT], libs=['node']))
+        kernel.load_lib()
+    return kernel
+
+
+def run_loop(kernel, container, endtime, dt, num_particles=None):
+    """
+    Runs a compiled kernel (without field arguments) directly on a particle container outside a ParticleSet.
+    :param container: object with export_c() (e.g. UnrolledList, OffsetNodeArena)
+    :param num_particles: particle count handed to the loop (default: the one of export_c())
+    """
+    count, header = container.export_c()
+    count = count if num_particles is None else num_particles
+    kernel._function(ctypes.c_int(count), ctypes.pointer(header), ctypes.c_double(endtime), ctypes.c_double(dt))
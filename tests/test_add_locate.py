@@ -0,0 +1,78 @@
+import random
+from bisect import bisect_left
+from functools import partial
+
+import numpy as np
+import pytest
+
+import package_globals
+from Node import Node, NodeJIT
+from LinkedList import RealList, OrderedList
+from OrderStatistic import BPlusTreeList
+from SkipList import SkipList
+
+
+LISTS = {'real_list': RealList,
+         'ordered_list': OrderedList,
+         'ordered_bplus': partial(OrderedList, backend=partial(BPlusTreeList, leaf_size=4, fanout=4)),
+         'skip_list': SkipList}
+
+
+@pytest.fixture(params=sorted(LISTS.keys()))
+def lclass(request):
+    return LISTS[request.param]
+
+
+@pytest.fixture(params=[Node, NodeJIT], ids=['node', 'jit'])
+def nclass(request):
+    return request.param
+
+
+def fresh_ids(n):
+    """:return: n new IDs, ascending - the nodes release their IDs when they are torn down"""
+    return np.sort(package_globals.idgen.nextIDs(n)).tolist()
+
+
+def chain_ids(nlist):
+    forward = []
+    node = nlist.begin()
+    while node is not None:
+        forward.append(node.id)
+        node = node.next
+    backward = []
+    node = nlist.end()
+    while node is not None:
+        backward.append(node.id)
+        node = node.prev
+    assert backward == forward[::-1]
+    if len(forward) > 0 and isinstance(nlist.begin(), NodeJIT):
+        assert nlist.begin().count_chain() == len(forward)
+    return forward
+
+
+def test_add_locate_returns_the_neighbours(lclass, nclass):
+    ids = fresh_ids(40)
+    order = list(ids)
+    random.Random(1).shuffle(order)
+    nlist = lclass(dtype=nclass)
+    inserted = []
+    for id in order:
+        index = bisect_left(inserted, id)
+        prev_node, next_node, position = nlist.add_locate(nclass(id=id))
+        assert position == index
+        assert (prev_node.id if prev_node is not None else None) == (inserted[index-1] if index > 0 else None)
+        assert (next_node.id if next_node is not None else None) == \
+            (inserted[index] if index < len(inserted) else None)
+        inserted.insert(index, id)
+        node = nlist[index]
+        assert node.id == id and node.prev is prev_node and node.next is next_node
+    assert chain_ids(nlist) == ids and len(nlist) == len(ids)
+
+
+def test_add_locate_creates_nodes_for_ids(lclass, nclass):
+    low, high = fresh_ids(2)
+    nlist = lclass(dtype=nclass)
+    assert nlist.add_locate(high) == (None, None, 0)
+    prev_node, next_node, position = nlist.add_locate(np.int64(low))
+    assert prev_node is None and next_node.id == high and position == 0
+    assert type(nlist.begin()) is nclass and chain_ids(nlist) == [low, high]
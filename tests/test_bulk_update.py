@@ -0,0 +1,89 @@
+import ctypes
+import random
+from functools import partial
+
+import numpy as np
+import pytest
+
+import package_globals
+from conftest import make_particles
+from particle import JITParticle
+from Node import Node, NodeJIT
+from LinkedList import RealList, OrderedList
+from OrderStatistic import BPlusTreeList
+from SkipList import SkipList
+
+
+LISTS = {'real_list': RealList,
+         'ordered_list': partial(OrderedList, backend=BPlusTreeList),
+         'skip_list': SkipList}
+
+
+@pytest.fixture(params=sorted(LISTS.keys()))
+def lclass(request):
+    return LISTS[request.param]
+
+
+@pytest.fixture(params=[Node, NodeJIT], ids=['node', 'jit'])
+def nclass(request):
+    return request.param
+
+
+def fresh_ids(n):
+    """:return: n new IDs, ascending - the nodes release their IDs when they are torn down"""
+    return np.sort(package_globals.idgen.nextIDs(n)).tolist()
+
+
+def check_links(nlist):
+    """:return: IDs along the links, checked in both directions and - for JIT nodes - against the C links"""
+    nodes = []
+    node = nlist.begin()
+    while node is not None:
+        nodes.append(node)
+        node = node.next
+    assert all(node.prev is prev_node for prev_node, node in zip([None] + nodes[:-1], nodes))
+    assert nlist.end() is (nodes[-1] if len(nodes) > 0 else None)
+    if len(nodes) > 0 and isinstance(nodes[0], NodeJIT):
+        addresses = [None] + [ctypes.addressof(node) for node in nodes] + [None]
+        assert [node._c_prev_p for node in nodes] == addresses[:-2]
+        assert [node._c_next_p for node in nodes] == addresses[2:]
+    return [node.id for node in nodes]
+
+
+@pytest.mark.parametrize('nbatch', [3, 30])
+def test_update_merges_a_batch(lclass, nclass, nbatch):
+    # -- a small batch is inserted node by node, a large one merged and relinked in one sweep -- #
+    ids = fresh_ids(20 + nbatch)
+    rng = random.Random(nbatch)
+    present = sorted(rng.sample(ids, 20))
+    batch = [id for id in ids if id not in present]
+    rng.shuffle(batch)
+    nlist = lclass(dtype=nclass)
+    nlist.update(nclass(id=id) for id in present)
+    assert check_links(nlist) == present
+    nlist.update([nclass(id=id) for id in batch[:-1]] + [np.int64(batch[-1])])
+    assert check_links(nlist) == ids and len(nlist) == len(ids)
+    assert [node.id for node in nlist] == ids and nlist[len(ids) // 2].id == ids[len(ids) // 2]
+    nlist.update([])
+    assert len(nlist) == len(ids)
+
+
+def test_update_into_an_empty_list(lclass, nclass):
+    ids = fresh_ids(12)
+    nlist = lclass(dtype=nclass)
+    nlist.update(ids[::-1])
+    assert check_links(nlist) == ids
+
+
+def test_update_relinks_removed_jit_nodes(fieldset, lclass):
+    particles = make_particles(JITParticle, fieldset, range(8))
+    nlist = lclass(dtype=NodeJIT)
+    nlist.update(NodeJIT(id=id, data=p) for id, p in zip(fresh_ids(8), particles))
+    removed = [nlist[i] for i in [1, 4, 5, 6, 7]]
+    for node in removed:
+        nlist.remove(node)
+    assert all(node._c_data_p is None for node in removed)
+    # -- the nodes come back in one batch: their C data pointers have to be written again -- #
+    nlist.update(removed)
+    assert len(check_links(nlist)) == 8
+    assert all(node._c_data_p == node.c_data_address() is not None for node in nlist)
@@ -0,0 +1,60 @@
+import ctypes
+import sys
+
+import numpy as np
+import pytest
+
+import package_globals
+from conftest import make_particles, lons_of, compile_kernel
+from Node import Node, NodeJIT, CompactNode, CompactNodeJIT
+from particleset_node import ParticleSet
+
+
+def fresh_ids(n):
+    """:return: n new IDs, ascending - the nodes release their IDs when they are torn down"""
+    return np.sort(package_globals.idgen.nextIDs(n)).tolist()
+
+
+def move(particle, fieldset, time):
+    particle.lon += 1.
+
+
+@pytest.mark.parametrize('nclass', [CompactNode, CompactNodeJIT])
+def test_slots_instead_of_dict(nclass):
+    node = nclass(id=fresh_ids(1)[0])
+    assert not hasattr(node, '__dict__')
+    assert node.prev is None and node.next is None and node.data is None
+    with pytest.raises(AttributeError):
+        node.weight = 1.
+
+
+@pytest.mark.parametrize('nclass, compact', [(Node, CompactNode), (NodeJIT, CompactNodeJIT)])
+def test_compact_nodes_are_smaller(nclass, compact):
+    first, second = fresh_ids(2)
+    node = nclass(id=first)
+    compact_node = compact(id=second)
+    assert hasattr(node, '__dict__')
+    assert sys.getsizeof(compact_node) < sys.getsizeof(node)
+
+
+def test_compact_jit_struct_matches_nodejit():
+    assert ctypes.sizeof(CompactNodeJIT) == ctypes.sizeof(NodeJIT) == 3 * ctypes.sizeof(ctypes.c_void_p)
+    first, second = fresh_ids(2)
+    head = CompactNodeJIT(id=first)
+    tail = CompactNodeJIT(id=second)
+    tail.link_between(head, None)
+    assert head._c_next_p == ctypes.addressof(tail) and tail._c_prev_p == ctypes.addressof(head)
+    assert head.count_chain() == 2
+    # -- the C struct is part of the reported size (unless the node lives in an arena) -- #
+    assert sys.getsizeof(head) >= object.__sizeof__(head) + ctypes.sizeof(head)
+
+
+def test_particle_set_with_compact_nodes(fieldset, pclass):
+    pset = ParticleSet(fieldset=fieldset, pclass=pclass, compact_nodes=True)
+    pset.add_many(make_particles(pclass, fieldset, range(8)))
+    assert type(pset.begin()) is (CompactNodeJIT if pclass.getPType().uses_jit else CompactNode)
+    pset.remove(3)
+    lons = lons_of(pset)
+    kernel = compile_kernel(pset, move)
+    kernel.execute(pset, endtime=3600., dt=3600.)
+    assert lons_of(pset) == [lon + 1. for lon in lons]
@@ -0,0 +1,86 @@
+import random
+import threading
+
+import numpy as np
+import pytest
+
+import package_globals
+from Node import Node, NodeJIT
+from ConcurrentList import ConcurrentRealList
+
+
+@pytest.fixture(params=[Node, NodeJIT], ids=['node', 'jit'])
+def nclass(request):
+    return request.param
+
+
+def fresh_ids(n):
+    """:return: n new IDs, ascending - the nodes release their IDs when they are torn down"""
+    return np.sort(package_globals.idgen.nextIDs(n)).tolist()
+
+
+def chain_ids(clist):
+    """:return: IDs along the node links (checked against the backward walk and, for JIT nodes, the C chain)"""
+    forward = []
+    node = clist.begin()
+    while node is not None:
+        forward.append(node.id)
+        node = node.next
+    backward = []
+    node = clist.end()
+    while node is not None:
+        backward.append(node.id)
+        node = node.prev
+    assert backward == forward[::-1]
+    if len(forward) > 0 and isinstance(clist.begin(), NodeJIT):
+        assert clist.begin().count_chain() == len(forward)
+    return forward
+
+
+def test_stitching_across_segments(nclass):
+    ids = fresh_ids(40)
+    clist = ConcurrentRealList(dtype=nclass, segment_bits=2)
+    shuffled = list(ids)
+    random.Random(0).shuffle(shuffled)
+    for id in shuffled:
+        clist.add(nclass(id=id))
+    assert len(clist._segments) > 1
+    assert chain_ids(clist) == ids
+    assert [node.id for node in clist] == ids
+    assert clist[17].id == ids[17] and clist.bisect_id(ids[17]) == 17
+
+
+def test_removal_at_segment_boundaries(nclass):
+    ids = fresh_ids(24)
+    clist = ConcurrentRealList(dtype=nclass, segment_bits=2)
+    clist.update(ids)
+    chain_ids(clist)
+    # -- the first node of the list, the first and last node of inner segments, and a whole segment -- #
+    segments = clist._ordered_segments()
+    victims = [ids[0], segments[2].nodes[0].id, segments[2].nodes[-1].id] + [node.id for node in segments[4].nodes]
+    for id in victims:
+        clist.remove(clist.get_by_id(id))
+    expected = [id for id in ids if id not in victims]
+    assert chain_ids(clist) == expected and len(clist) == len(expected)
+    clist.remove_many([0, len(clist) - 1])
+    assert chain_ids(clist) == expected[1:-1]
+
+
+def test_concurrent_producers(nclass):
+    ids = fresh_ids(400)
+    clist = ConcurrentRealList(dtype=nclass, segment_bits=4)
+    batches = [ids[i::4] for i in range(4)]
+
+    def produce(batch):
+        batch = list(batch)
+        random.Random(len(batch)).shuffle(batch)
+        for id in batch:
+            clist.add(nclass(id=id))
+
+    threads = [threading.Thread(target=produce, args=(batch, )) for batch in batches]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(clist) == len(ids)
+    assert chain_ids(clist) == ids
@@ -0,0 +1,68 @@
+import gc
+
+from conftest import make_particles, lons_of, scalar, compile_kernel, run_loop
+from particle import JITParticle
+from particleset_node import ParticleSet
+from Node import node_link_journal
+from BlockNode import UnrolledList
+
+
+def move(particle, fieldset, time):
+    particle.lon += 1.
+
+
+def new_set(fieldset, lons, **kwargs):
+    pset = ParticleSet(fieldset=fieldset, pclass=JITParticle, **kwargs)
+    pset.add_many(make_particles(JITParticle, fieldset, lons))
+    return pset
+
+
+def test_links_are_flushed_before_execute(fieldset):
+    assert not node_link_journal.enabled
+    pset = new_set(fieldset, range(10), deferred_links=True)
+    assert node_link_journal.enabled
+    # -- removals and a re-added node: the C links lag behind until the kernel flushes them -- #
+    for index in [7, 0, 3]:
+        pset.remove(index)
+    node = pset[2]
+    pset.remove(node)
+    pset.add(node)
+    lons = sorted(lons_of(pset))
+    assert len(node_link_journal) > 0
+    kernel = compile_kernel(pset, move)
+    kernel.execute(pset, endtime=3600., dt=3600.)
+    assert len(node_link_journal) == 0 and pset.begin().count_chain() == 7
+    assert sorted(lons_of(pset)) == [lon + 1. for lon in lons]
+    del kernel, node, pset
+    gc.collect()
+    assert not node_link_journal.enabled
+
+
+def test_other_chains_are_not_affected(fieldset):
+    deferred = new_set(fieldset, range(4), deferred_links=True)
+    other = new_set(fieldset, range(6))
+    other.remove(2)
+    lons = lons_of(other)
+    kernel = compile_kernel(other, move)
+    kernel.execute(other, endtime=3600., dt=3600.)
+    assert lons_of(other) == [lon + 1. for lon in lons]
+    # -- a container outside any set, whose block links are journaled as well -- #
+    ulist = UnrolledList(JITParticle.getPType(), capacity=4)
+    for i in range(40):
+        ulist.add(JITParticle(lon=0., lat=0., pid=i, fieldset=fieldset, depth=0., time=0., dt=3600.))
+    block_kernel = compile_kernel(other, move, loopgen_class=UnrolledList.loopgen_class)
+    run_loop(block_kernel, ulist, endtime=3600., dt=3600.)
+    assert [scalar(p.lon) for p in ulist] == [1.] * 40
+    # -- the journal stays enabled until the last set with deferred links is gone -- #
+    second = new_set(fieldset, range(2), deferred_links=True)
+    del deferred
+    gc.collect()
+    assert node_link_journal.enabled
+    del second
+    gc.collect()
+    assert not node_link_journal.enabled
+    # -- without a deferred set, links are written to C right away -- #
+    other.remove(0)
+    assert len(node_link_journal) == 0 and other.begin().count_chain() == 4
+    kernel.execute(other, endtime=7200., dt=3600.)
+    assert lons_of(other) == [lon + 2. for lon in lons[1:]]
@@ -0,0 +1,56 @@
+import numpy as np
+
+import package_globals
+from Node import Node
+from LinkedList import DoubleLinkedList
+
+
+def fresh_ids(n):
+    """:return: n new IDs, ascending - the nodes release their IDs when they are torn down"""
+    return np.sort(package_globals.idgen.nextIDs(n)).astype(np.int64)
+
+
+def chain_ids(dlist):
+    forward = [node.id for node in dlist]
+    backward = [node.id for node in reversed(dlist)]
+    assert backward == forward[::-1]
+    return forward
+
+
+def test_sorted_insert_and_delete():
+    ids = fresh_ids(8).tolist()
+    dlist = DoubleLinkedList(nodeType=Node, sorted=True)
+    for i in [4, 1, 6, 3, 5, 0, 7]:
+        dlist.insert(ids[i])
+    assert chain_ids(dlist) == [ids[i] for i in [0, 1, 3, 4, 5, 6, 7]]
+    assert dlist.begin().id == ids[0] and dlist.end().id == ids[7]
+    for i in [4, 0, 7]:
+        dlist.delete(ids[i])
+    dlist.insert(ids[2])
+    expected = [ids[i] for i in [1, 2, 3, 5, 6]]
+    assert chain_ids(dlist) == expected
+    assert list(dlist._keys) == expected and len(dlist) == 5
+    dlist.clear()
+    assert len(dlist) == 0 and len(dlist._keys) == 0
+
+
+def test_numpy_ids():
+    ids = fresh_ids(3)
+    dlist = DoubleLinkedList(nodeType=Node, sorted=True)
+    for id in ids[[1, 0, 2]]:
+        dlist.insert(id)
+    assert chain_ids(dlist) == ids.tolist()
+    assert all(type(node.id) is int for node in dlist)
+    assert dlist.get(ids.astype(np.int32)[1]).id == ids[1]
+    assert dlist.delete(ids[0]).id == ids[0]
+    assert chain_ids(dlist) == ids[1:].tolist()
+
+
+def test_insertion_order():
+    ids = fresh_ids(4).tolist()
+    dlist = DoubleLinkedList(nodeType=Node)
+    for i in [2, 0, 3]:
+        dlist.insert(ids[i])
+    dlist.insert_after(dlist.get_by_id(ids[0]), ids[1])
+    assert chain_ids(dlist) == [ids[i] for i in [2, 0, 1, 3]]
+    assert not dlist.sorted
@@ -0,0 +1,66 @@
+import ctypes
+import gc
+
+import numpy as np
+
+from conftest import make_particles, ids_of, lons_of, scalar, compile_kernel
+from particle import JITParticle
+from particleset_node import ParticleSet
+
+
+def move(particle, fieldset, time):
+    particle.lon += 1.
+
+
+def new_set(fieldset, pclass, lons, **kwargs):
+    pset = ParticleSet(fieldset=fieldset, pclass=pclass, **kwargs)
+    pset.add_many(make_particles(pclass, fieldset, lons))
+    return pset
+
+
+def test_fork_copies_in_order(fieldset, pclass):
+    pset = new_set(fieldset, pclass, range(9))
+    pset.remove(4)
+    forked = pset.fork()
+    ids = ids_of(forked)
+    assert len(forked) == 8 and lons_of(forked) == lons_of(pset)
+    # -- new IDs, handed out in the order of the original ones -- #
+    assert ids == sorted(ids) and set(ids).isdisjoint(ids_of(pset))
+    assert [int(scalar(node.data.id)) for node in forked.data] == ids
+    assert all(id in forked for id in ids) and len(forked._id_index) == 8
+    assert len(ParticleSet(fieldset=fieldset, pclass=pclass).fork()) == 0
+
+
+def test_fork_is_independent(fieldset, pclass):
+    pset = new_set(fieldset, pclass, range(6))
+    lons = lons_of(pset)
+    forked = pset.fork()
+    forked[0].data.lon = -5.
+    kernel = compile_kernel(pset, move)
+    kernel.execute(pset, endtime=3600., dt=3600.)
+    assert lons_of(pset) == [lon + 1. for lon in lons]
+    assert lons_of(forked) == [-5.] + lons[1:]
+    # -- the fork outlives its origin -- #
+    del pset, kernel
+    gc.collect()
+    kernel = compile_kernel(forked, move)
+    kernel.execute(forked, endtime=3600., dt=3600.)
+    assert lons_of(forked) == [-4.] + [lon + 1. for lon in lons[1:]]
+
+
+def test_jit_clone_chain(fieldset):
+    pset = new_set(fieldset, JITParticle, range(5))
+    pset.remove(2)
+    forked = pset.fork()
+    nodes = list(forked.data)
+    # -- the cloned C nodes sit in one slab, linked in chain order, and point to the cloned records -- #
+    assert forked.begin().count_chain() == 4
+    assert [forked.begin().chain_address(i) for i in range(4)] == [ctypes.addressof(node) for node in nodes]
+    assert all(np.diff([ctypes.addressof(node) for node in nodes]) == ctypes.sizeof(type(nodes[0])))
+    assert all(node.registered and node._c_data_p == node.c_data_address() for node in nodes)
+    assert set(node._c_data_p for node in nodes).isdisjoint(node._c_data_p for node in pset.data)
+    # -- the grid search indices are copied, not shared -- #
+    source, clone = pset.begin().data, forked.begin().data
+    assert np.array_equal(source.xi, clone.xi) and clone.xi is not source.xi
+    clone.xi[0] = source.xi[0] + 7
+    assert clone.xi[0] != source.xi[0]
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from conftest import make_particles, ids_of
+from particleset_node import ParticleSet
+from IdBitmap import IdBitmap, popcount
+
+
+def members(bitmap, candidates):
+    return sorted(id for id in candidates if id in bitmap)
+
+
+def test_add_and_discard():
+    bitmap = IdBitmap(page_bits=6)
+    # -- word and page boundaries, and an ID in a far page -- #
+    ids = [0, 63, 64, 127, 128, 1000, 2 ** 40 + 5]
+    for id in ids:
+        assert bitmap.add(id)
+    assert not bitmap.add(64)
+    assert len(bitmap) == len(ids) and members(bitmap, range(200)) == [0, 63, 64, 127, 128]
+    assert 2 ** 40 + 5 in bitmap and 2 ** 40 + 4 not in bitmap
+    assert bitmap.discard(63) and not bitmap.discard(63) and not bitmap.discard(5000)
+    assert len(bitmap) == len(ids) - 1 and 63 not in bitmap and 64 in bitmap
+    assert np.uint64(1000) in bitmap and np.int32(128) in bitmap
+
+
+@pytest.mark.parametrize('page_bits', [6, 8, 16])
+def test_batches_match_a_set(page_bits):
+    rng = np.random.RandomState(0)
+    bitmap = IdBitmap(page_bits=page_bits)
+    reference = set()
+    for step in range(20):
+        ids = rng.randint(0, 5000, size=rng.randint(0, 300))
+        if step % 3 == 2:
+            bitmap.discard_many(ids)
+            reference.difference_update(ids.tolist())
+        else:
+            bitmap.add_many(ids)
+            reference.update(ids.tolist())
+        assert len(bitmap) == len(reference)
+    assert members(bitmap, range(5000)) == sorted(reference)
+    assert len(IdBitmap(sorted(reference), page_bits=page_bits)) == len(reference)
+
+
+def test_update():
+    first = IdBitmap([1, 2, 3, 700], page_bits=8)
+    second = IdBitmap([3, 4, 5000], page_bits=8)
+    first.update(second)
+    assert len(first) == 6 and members(first, range(6000)) == [1, 2, 3, 4, 700, 5000]
+    # -- the pages are copied, not shared -- #
+    second.discard(5000)
+    assert 5000 in first
+    with pytest.raises(AssertionError):
+        first.update(IdBitmap(page_bits=6))
+
+
+@pytest.mark.parametrize('split', [0, 63, 64, 100, 256, 300, 10000])
+def test_split_off(split):
+    ids = [0, 1, 63, 64, 65, 100, 255, 256, 257, 300, 1023, 4096]
+    bitmap = IdBitmap(ids, page_bits=8)
+    upper = bitmap.split_off(split)
+    assert members(bitmap, range(5000)) == [id for id in ids if id < split]
+    assert members(upper, range(5000)) == [id for id in ids if id >= split]
+    assert len(bitmap) + len(upper) == len(ids) and len(upper) == sum(id >= split for id in ids)
+
+
+def test_popcount():
+    words = np.array([0, 1, 2 ** 64 - 1, 2 ** 63 + 3], dtype=np.uint64)
+    assert popcount(words) == 0 + 1 + 64 + 3
+    assert popcount(np.zeros(4, dtype=np.uint64)) == 0
+
+
+def test_particle_set_index(fieldset, pclass):
+    pset = ParticleSet(fieldset=fieldset, pclass=pclass)
+    pset.add_many(make_particles(pclass, fieldset, range(6)))
+    ids = ids_of(pset)
+    assert len(pset._id_index) == 6 and all(id in pset for id in ids)
+    pset.remove(pset.get_by_id(ids[1]))
+    node = pset.pop(0)
+    assert ids[1] not in pset and node.id not in pset and pset.get_by_id(ids[1]) is None
+    assert len(pset._id_index) == len(pset) == 4
+    particle = make_particles(pclass, fieldset, [10.])[0]
+    pset.add(particle)
+    assert len(pset._id_index) == 5 and all(id in pset for id in ids_of(pset))
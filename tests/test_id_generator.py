@@ -0,0 +1,57 @@
+import numpy as np
+
+from package_globals import IdGenerator
+
+
+def test_fresh_ids_count_up():
+    idgen = IdGenerator()
+    assert [idgen.nextID() for i in range(3)] == [0, 1, 2]
+    ids = idgen.nextIDs(3)
+    assert ids.dtype == np.uint64 and ids.tolist() == [3, 4, 5]
+    assert len(idgen) == 6 and len(idgen.released_ids) == 0
+    assert idgen.nextIDs(0).tolist() == []
+
+
+def test_released_ids_are_reused_last_first():
+    idgen = IdGenerator()
+    idgen.nextIDs(6)
+    idgen.releaseID(1)
+    idgen.releaseID(4)
+    assert idgen.released_ids.tolist() == [1, 4]
+    assert [idgen.nextID() for i in range(3)] == [4, 1, 6]
+    assert type(idgen.nextID()) is int
+
+
+def test_batch_matches_single_allocations():
+    single = IdGenerator()
+    batch = IdGenerator()
+    for idgen in [single, batch]:
+        idgen.nextIDs(10)
+        idgen.releaseIDs([2, 7, 5])
+        idgen.releaseID(np.uint64(9))
+    # -- the batch runs from the released IDs into fresh ones -- #
+    expected = [single.nextID() for i in range(6)]
+    assert batch.nextIDs(6).tolist() == expected == [9, 5, 7, 2, 10, 11]
+    assert single.nextID() == batch.nextID() == 12
+
+
+def test_release_many_grows_the_stack():
+    idgen = IdGenerator()
+    idgen.nextIDs(5000)
+    idgen.releaseIDs(np.arange(3000, dtype=np.uint64).reshape(30, 100))
+    idgen.releaseIDs(np.array([4000]))
+    assert len(idgen.released_ids) == 3001 and idgen.released_ids[-1] == 4000
+    assert idgen.nextIDs(3001).tolist() == [4000] + list(range(2999, -1, -1))
+    assert idgen.nextID() == 5000
+
+
+def test_pregenerate_and_permute():
+    np.random.seed(0)
+    idgen = IdGenerator()
+    idgen.preGenerateIDs(1000)
+    idgen.permuteIDs()
+    released = idgen.released_ids.tolist()
+    assert sorted(released) == list(range(1000)) and released != list(range(1000))
+    ids = idgen.nextIDs(1000).tolist()
+    assert ids == released[::-1]
+    assert idgen.nextID() == 1000 and len(idgen) == 1001
@@ -0,0 +1,74 @@
+import ctypes
+import gc
+
+import numpy as np
+
+import package_globals
+from Node import NodeJIT, CompactNodeJIT
+from NodeArena import NodeArena
+from wrapping import c_lib_register
+
+
+def fresh_ids(n):
+    """:return: n new IDs, ascending - the nodes release their IDs when they are torn down"""
+    return np.sort(package_globals.idgen.nextIDs(n)).tolist()
+
+
+def test_allocate_fills_slabs_front_to_back():
+    arena = NodeArena(NodeJIT, slab_size=4)
+    ids = fresh_ids(6)
+    nodes = [arena.allocate(id=id) for id in ids]
+    assert len(arena) == 6 and arena.nslabs == 2 and arena.capacity == 8
+    assert [node.arena_slot for node in nodes] == list(range(6))
+    assert all(ctypes.addressof(node) == arena.address(node.arena_slot) for node in nodes)
+    # -- within a slab, the structs are contiguous -- #
+    assert ctypes.addressof(nodes[3]) - ctypes.addressof(nodes[0]) == 3 * ctypes.sizeof(NodeJIT)
+    assert all(node.registered and node.arena is arena for node in nodes)
+
+
+def test_allocate_writes_the_c_links():
+    arena = NodeArena(CompactNodeJIT, slab_size=8)
+    first, second = fresh_ids(2)
+    head = arena.allocate(id=first)
+    tail = arena.allocate(prev=head, id=second)
+    head.set_next(tail)
+    assert tail._c_prev_p == ctypes.addressof(head) and tail._c_next_p is None
+    assert head.count_chain() == 2
+
+
+def test_reclaimed_slots_are_zeroed_and_reused():
+    arena = NodeArena(NodeJIT, slab_size=4)
+    nodes = [arena.allocate(id=id) for id in fresh_ids(3)]
+    nodes[1].link_between(nodes[0], nodes[2])
+    slot = nodes[1].arena_slot
+    gc.collect()
+    registered = c_lib_register.get("node").register_count
+    removed = nodes.pop(1)
+    removed.detach()
+    del removed
+    gc.collect()
+    assert nodes[0].next is nodes[1] and nodes[0].count_chain() == 2
+    assert len(arena) == 2 and c_lib_register.get("node").register_count == registered - 1
+    assert bytes((ctypes.c_byte * ctypes.sizeof(NodeJIT)).from_address(arena.address(slot))) == \
+        bytes(ctypes.sizeof(NodeJIT))
+    # -- the freed slot is handed out before any other free slot -- #
+    node = arena.allocate(id=fresh_ids(1)[0])
+    assert node.arena_slot == slot and arena.nslabs == 1
+
+
+def test_claim_slab():
+    arena = NodeArena(NodeJIT, slab_size=4)
+    single = arena.allocate(id=fresh_ids(1)[0])
+    gc.collect()
+    registered = c_lib_register.get("node").register_count
+    nodes = arena.claim_slab()
+    assert len(nodes) == 4 and len(arena) == 5 and arena.nslabs == 2
+    assert [node.arena_slot for node in nodes] == [4, 5, 6, 7]
+    assert all(not node.registered and node.id is None and node.prev is None for node in nodes)
+    assert c_lib_register.get("node").register_count == registered
+    # -- the claimed slots are not free: the next allocation takes the remaining slots of the first slab -- #
+    other = arena.allocate(id=fresh_ids(1)[0])
+    assert other.arena_slot == single.arena_slot + 1
+    del nodes
+    gc.collect()
+    assert len(arena) == 2 and arena.allocate().arena_slot in range(4, 8) and arena.nslabs == 2
@@ -0,0 +1,65 @@
+import pytest
+
+from conftest import make_particles, ids_of, lons_of
+from particleset_node import ParticleSet
+from Node import NodeCursor
+
+
+def new_set(fieldset, pclass, lons):
+    pset = ParticleSet(fieldset=fieldset, pclass=pclass)
+    pset.add_many(make_particles(pclass, fieldset, lons))
+    return pset
+
+
+def test_forward_and_backward(fieldset, pclass):
+    pset = new_set(fieldset, pclass, range(7))
+    ids = ids_of(pset)
+    assert [node.id for node in pset.cursor()] == ids
+    assert [node.id for node in pset.cursor(backward=True)] == ids[::-1]
+    assert [node.id for node in pset.cursor(start=pset[4])] == ids[4:]
+    assert [node.id for node in pset.cursor(start=pset[4], backward=True)] == ids[4::-1]
+    assert list(pset.cursor(payload=True)) == [node.data for node in pset.data]
+    assert list(NodeCursor(None)) == []
+
+
+@pytest.mark.parametrize('batch_size', [1, 3, 7, 100])
+def test_batches(fieldset, pclass, batch_size):
+    pset = new_set(fieldset, pclass, range(7))
+    ids = ids_of(pset)
+    for backward in [False, True]:
+        batches = list(pset.iter_batches(batch_size, backward=backward))
+        assert all(0 < len(batch) <= batch_size for batch in batches)
+        assert len(batches) == -(-7 // batch_size)
+        assert [node.id for batch in batches for node in batch] == (ids[::-1] if backward else ids)
+    payloads = [data for batch in pset.iter_batches(batch_size, payload=True) for data in batch]
+    assert payloads == [node.data for node in pset.data]
+
+
+def test_next_batch_and_reversed(fieldset, pclass):
+    pset = new_set(fieldset, pclass, range(6))
+    ids = ids_of(pset)
+    cursor = pset.cursor()
+    assert [node.id for node in cursor.next_batch(4)] == ids[:4]
+    assert cursor.node.id == ids[4] and not cursor.exhausted()
+    # -- the reversed cursor starts at the current node -- #
+    assert [node.id for node in cursor.reversed()] == ids[4::-1]
+    assert [node.id for node in cursor.next_batch(4)] == ids[4:]
+    assert cursor.exhausted() and cursor.next_batch(4) == []
+
+
+def test_removing_returned_nodes(fieldset, pclass):
+    pset = new_set(fieldset, pclass, range(10))
+    lons = lons_of(pset)
+    for batch in pset.iter_batches(3):
+        # -- the nodes of a batch have all been returned: they may be removed while the cursor goes on -- #
+        pset.remove(batch[0])
+    assert lons_of(pset) == [lon for i, lon in enumerate(lons) if i % 3 != 0]
+
+
+def test_sub_chain_batches(fieldset, pclass):
+    pset = new_set(fieldset, pclass, range(10))
+    ids = ids_of(pset)
+    sub_chain = pset.index_range(2, 8)
+    batches = list(pset.iter_batches(4, sub_chain=sub_chain))
+    assert [len(batch) for batch in batches] == [4, 2]
+    assert [node.id for batch in batches for node in batch] == ids[2:8]
@@ -0,0 +1,141 @@
+from functools import partial
+
+import numpy as np
+import pytest
+
+from conftest import make_particles, ids_of, lons_of, compile_kernel
+from particleset_node import ParticleSet
+from NodeStorage import NodeStorage
+from LinkedList import RealList, OrderedList
+from OrderStatistic import BPlusTreeList
+from SkipList import SkipList
+from ConcurrentList import ConcurrentRealList
+from particle import JITParticle
+from parcels_mocks.status import StatusCode as ErrorCode
+from wrapping import c_lib_register
+
+
+STORAGES = {'real_list': RealList,
+            'ordered_list': partial(OrderedList, backend=BPlusTreeList),
+            'skip_list': SkipList,
+            'concurrent': partial(ConcurrentRealList, segment_bits=2)}
+
+
+@pytest.fixture(params=sorted(STORAGES.keys()))
+def storage(request):
+    return STORAGES[request.param]
+
+
+def test_storage_is_protocol_instance(fieldset, pclass, storage):
+    pset = ParticleSet(fieldset=fieldset, pclass=pclass, storage=storage)
+    assert isinstance(pset.data, NodeStorage)
+    assert pset.data.node_based
+    pset.add_many(make_particles(pclass, fieldset, range(8)))
+    ids = ids_of(pset)
+    assert ids == sorted(ids)
+    assert len(pset) == 8
+    assert pset.begin().id == ids[0] and pset.end().id == ids[-1]
+    assert pset.get_by_id(ids[3]).id == ids[3]
+    num_particles, node_begin = pset.export_c(pset.id_range(ids[2], ids[5]))
+    assert num_particles == 3 and node_begin.id == ids[2]
+
+
+def test_deleted_mask(fieldset, pclass, storage):
+    pset = ParticleSet(fieldset=fieldset, pclass=pclass, storage=storage)
+    pset.add_many(make_particles(pclass, fieldset, range(6)))
+    lons = lons_of(pset)
+    for index in [1, 4]:
+        pset[index].data.state = ErrorCode.Delete
+    assert pset.data.deleted_mask().tolist() == [False, True, False, False, True, False]
+    assert pset.get_deleted_item_indices() == [1, 4]
+    pset.remove_deleted_items()
+    assert lons_of(pset) == [lons[i] for i in [0, 2, 3, 5]]
+
+
+def chain_ids(pset):
+    """:return: IDs along the node links, from the first node on (checked against the backward walk)"""
+    forward = []
+    node = pset.begin()
+    while node is not None:
+        forward.append(node.id)
+        node = node.next
+    backward = []
+    node = pset.end()
+    while node is not None:
+        backward.append(node.id)
+        node = node.prev
+    assert backward == forward[::-1]
+    return forward
+
+
+def test_single_removal_unlinks(fieldset, pclass, storage):
+    pset = ParticleSet(fieldset=fieldset, pclass=pclass, storage=storage)
+    pset.add_many(make_particles(pclass, fieldset, range(8)))
+    ids = ids_of(pset)
+    removed = pset.get_by_id(ids[2])
+    pset.remove(removed)
+    pset.remove(5)
+    pset.remove(pset.get_by_id(ids[7]).data)
+    expected = [id for i, id in enumerate(ids) if i not in (2, 6, 7)]
+    assert ids_of(pset) == expected and chain_ids(pset) == expected
+    assert removed.prev is None and removed.next is None
+    if pclass.getPType().uses_jit:
+        pset.flush_links()
+        assert pset.begin().count_chain() == len(expected)
+
+
+def move(particle, fieldset, time):
+    particle.lon += 1.
+
+
+def test_readded_node_runs_in_kernel(fieldset, pclass, storage):
+    pset = ParticleSet(fieldset=fieldset, pclass=pclass, storage=storage)
+    pset.add_many(make_particles(pclass, fieldset, range(6)))
+    ids = ids_of(pset)
+    # -- the removed nodes are linked again, in the middle and at both ends of the chain -- #
+    for id in [ids[3], ids[0], ids[5]]:
+        node = pset.get_by_id(id)
+        pset.remove(node)
+        pset.add(node)
+    assert ids_of(pset) == ids and chain_ids(pset) == ids
+    if pclass.getPType().uses_jit:
+        assert all(node.registered and node._c_data_p == node.c_data_address() for node in pset.data)
+    kernel = compile_kernel(pset, move)
+    kernel.execute(pset, endtime=3600., dt=3600.)
+    assert sorted(lons_of(pset)) == [lon + 1. for lon in range(6)]
+
+
+@pytest.mark.parametrize('node_pool', [False, True])
+def test_removal_keeps_registration(fieldset, storage, node_pool):
+    pset = ParticleSet(fieldset=fieldset, pclass=JITParticle, storage=storage, node_pool=node_pool)
+    pset.add_many(make_particles(JITParticle, fieldset, range(6)))
+    registered = c_lib_register.get("node").register_count
+    # -- removed nodes are only detached: the 'node' library registrations are kept (or handed over by the pool) -- #
+    removed = [pset.get_by_id(ids_of(pset)[2]), pset[0]]
+    for node in removed:
+        pset.remove(node)
+    assert c_lib_register.get("node").register_count == registered
+    if not node_pool:
+        assert all(node.registered and node.prev is None and node.next is None for node in removed)
+    # -- new particles get new nodes, unless the pool hands out the removed ones again -- #
+    pset.add_many(make_particles(JITParticle, fieldset, [10., 11.]))
+    assert c_lib_register.get("node").register_count == registered + (0 if node_pool else 2)
+    assert all(node.registered for node in pset.data) and pset.begin().count_chain() == 6
+
+
+def test_supports():
+    for storage in [RealList, OrderedList, SkipList, ConcurrentRealList]:
+        for method in ['split_at', 'concat', 'splice']:
+            assert storage.supports(method)
+    assert RealList.supports('snapshot')
+    for storage in [OrderedList, SkipList, ConcurrentRealList]:
+        assert not storage.supports('snapshot')
+
+
+def test_unsupported_operation_is_refused(fieldset, pclass):
+    pset = ParticleSet(fieldset=fieldset, pclass=pclass, skip_list=True)
+    pset.add_many(make_particles(pclass, fieldset, range(4)))
+    assert not pset.supports('snapshot')
+    with pytest.raises(NotImplementedError, match='snapshot'):
+        pset.snapshot()
+    assert len(pset) == 4
@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+from conftest import make_particles, lons_of, scalar, compile_kernel, run_loop
+from particle import JITParticle
+from particleset_node import ParticleSet
+from OffsetArena import OffsetNodeArena, NIL, FREE
+
+
+DTYPE = JITParticle.getPType().dtype
+
+
+def move(particle, fieldset, time):
+    particle.lon += 1.
+
+
+def new_arena(fieldset, lons, **kwargs):
+    arena = OffsetNodeArena(DTYPE, **kwargs)
+    for particle in make_particles(JITParticle, fieldset, lons):
+        arena.append(particle)
+    return arena
+
+
+def chain_lons(arena):
+    forward = [float(arena.record(slot)['lon']) for slot in arena.slots()]
+    backward = [float(arena.record(slot)['lon']) for slot in arena.slots(backward=True)]
+    assert backward == forward[::-1]
+    return forward
+
+
+@pytest.mark.parametrize('index_dtype', [np.int32, np.int64])
+def test_chain_and_free_list(fieldset, index_dtype):
+    arena = new_arena(fieldset, range(10), capacity=4, index_dtype=index_dtype)
+    assert len(arena) == 10 and arena.capacity == 16
+    assert chain_lons(arena) == [float(lon) for lon in range(10)]
+    slots = list(arena.slots())
+    particle = arena.free(slots[3])
+    assert scalar(particle.lon) == 3. and arena.particle(slots[3]) is None
+    arena.free(slots[0])
+    assert arena.prev(slots[0]) == FREE and arena.header.begin == slots[1]
+    assert chain_lons(arena) == [float(lon) for lon in [1, 2, 4, 5, 6, 7, 8, 9]]
+    # -- freed slots are handed out again, last freed first -- #
+    assert arena.append(particle) == slots[0]
+    assert arena.next(slots[0]) == NIL and arena.header.end == slots[0]
+    assert chain_lons(arena)[-1] == 3. and len(arena) == 9
+
+
+def test_particles_follow_the_records(fieldset):
+    arena = new_arena(fieldset, range(3), capacity=2)
+    particle = arena.particle(arena.header.end)
+    particle.lon = 42.
+    assert float(arena.record(arena.header.end)['lon']) == 42.
+    # -- a freed particle keeps its values in a record of its own -- #
+    arena.free(arena.header.end)
+    arena.append()
+    assert scalar(particle.lon) == 42. and float(arena.record(arena.header.end)['lon']) == 0.
+
+
+@pytest.mark.parametrize('index_dtype', [np.int32, np.int64])
+def test_kernel_matches_node_chain(fieldset, index_dtype):
+    lons = np.arange(30, dtype=np.float32)
+    pset = ParticleSet(fieldset=fieldset, pclass=JITParticle)
+    pset.add_many(make_particles(JITParticle, fieldset, lons))
+    arena = new_arena(fieldset, lons, capacity=8, index_dtype=index_dtype)
+    for lon in [0., 11., 29.]:
+        pset.remove(next(node for node in pset.data if scalar(node.data.lon) == lon))
+        arena.free(next(slot for slot in arena.slots() if float(arena.record(slot)['lon']) == lon))
+    kernel = compile_kernel(pset, move)
+    arena_kernel = compile_kernel(pset, move, loopgen_class=arena.loopgen_class)
+    kernel.execute(pset, endtime=3600., dt=3600.)
+    run_loop(arena_kernel, arena, endtime=3600., dt=3600.)
+    assert sorted(chain_lons(arena)) == sorted(lons_of(pset))
+
+
+def test_loop_honours_num_particles(fieldset):
+    arena = new_arena(fieldset, np.zeros(10), capacity=16)
+    pset = ParticleSet(fieldset=fieldset, pclass=JITParticle)
+    kernel = compile_kernel(pset, move, loopgen_class=arena.loopgen_class)
+    run_loop(kernel, arena, endtime=3600., dt=3600., num_particles=4)
+    assert chain_lons(arena) == [1.] * 4 + [0.] * 6
+    with pytest.raises(AssertionError):
+        arena.export_c(sub_chain=pset.index_range(0, 0))
+
+
+def test_save_and_load(fieldset, tmp_path):
+    arena = new_arena(fieldset, range(6), capacity=4)
+    arena.free(list(arena.slots())[2])
+    path = str(tmp_path / 'arena.bin')
+    arena.save(path)
+    loaded = OffsetNodeArena.load(path, DTYPE, mode='c')
+    assert len(loaded) == 5 and loaded.capacity == arena.capacity
+    assert chain_lons(loaded) == chain_lons(arena)
+    assert list(loaded.slots()) == list(arena.slots())
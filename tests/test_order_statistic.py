@@ -0,0 +1,80 @@
+import random
+
+import pytest
+from sortedcontainers import SortedList
+
+from OrderStatistic import BPlusTreeList, SortedListBackend
+
+
+def check(tree, reference):
+    assert len(tree) == len(reference) and list(tree) == list(reference)
+
+
+@pytest.mark.parametrize('leaf_size, fanout', [(4, 4), (8, 5), (256, 64)])
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_bplus_tree_matches_sorted_list(leaf_size, fanout, seed):
+    rng = random.Random(seed)
+    tree = BPlusTreeList(leaf_size=leaf_size, fanout=fanout)
+    reference = SortedList()
+    for step in range(3000):
+        op = rng.random()
+        if op < 0.45 or len(reference) == 0:
+            # -- a small value range, so that there are plenty of equal values -- #
+            value = rng.randint(0, 300)
+            prev_value, next_value, index = tree.insert_locate(value)
+            reference.add(value)
+            assert index == reference.bisect_right(value) - 1
+            assert prev_value == (reference[index-1] if index > 0 else None)
+            assert next_value == (reference[index+1] if index+1 < len(reference) else None)
+        elif op < 0.7:
+            index = rng.randrange(-len(reference), len(reference))
+            assert tree.pop(index) == reference.pop(index)
+        elif op < 0.8:
+            value = rng.choice(reference)
+            tree.remove(value)
+            reference.remove(value)
+        elif op < 0.95:
+            value = rng.randint(-5, 305)
+            assert tree.bisect_left(value) == reference.bisect_left(value)
+            assert tree.bisect_right(value) == reference.bisect_right(value)
+            index = rng.randrange(len(reference))
+            assert tree[index] == reference[index] and tree[-index-1] == reference[-index-1]
+            if value in reference:
+                assert tree.index(value) == reference.index(value)
+            else:
+                with pytest.raises(ValueError):
+                    tree.index(value)
+        else:
+            index = rng.randint(0, len(reference))
+            tail = tree.split_off(index)
+            assert tail == list(reference[index:])
+            check(tree, reference[:index])
+            tree.append_sorted(tail)
+        if step % 100 == 0:
+            check(tree, reference)
+    check(tree, reference)
+
+
+def test_bplus_tree_empties_and_refills():
+    tree = BPlusTreeList(range(50), leaf_size=4, fanout=4)
+    while len(tree) > 0:
+        tree.pop(len(tree) // 2)
+    assert list(tree) == [] and 3 not in tree
+    with pytest.raises(IndexError):
+        tree.pop()
+    for value in [5, 1, 3]:
+        tree.add(value)
+    assert list(tree) == [1, 3, 5] and tree[0] == 1 and 3 in tree
+    tree.update([4, 0])
+    assert list(tree) == [0, 1, 3, 4, 5]
+    tree.clear()
+    assert len(tree) == 0
+
+
+def test_sorted_list_backend_insert_locate():
+    backend = SortedListBackend([10, 20, 20, 30])
+    assert backend.insert_locate(20) == (20, 30, 3)
+    assert backend.insert_locate(5) == (None, 10, 0)
+    assert backend.split_off(4) == [20, 30] and list(backend) == [5, 10, 20, 20]
+    backend.append_sorted([40])
+    assert list(backend) == [5, 10, 20, 20, 40]
@@ -0,0 +1,122 @@
+from functools import partial
+
+import numpy as np
+import pytest
+
+import package_globals
+from conftest import make_particles, ids_of, lons_of
+from particleset_node import ParticleSet
+from LinkedList import RealList, OrderedList, removal_mask, unlink_masked
+from OrderStatistic import BPlusTreeList
+from SkipList import SkipList
+from ConcurrentList import ConcurrentRealList
+from SoAStorage import SoAParticleStorage
+from SlotMap import SlotMapStorage
+from Node import Node, NodeJITBase
+
+
+STORAGES = {'real_list': RealList,
+            'ordered_list': partial(OrderedList, backend=BPlusTreeList),
+            'skip_list': SkipList,
+            'concurrent': partial(ConcurrentRealList, segment_bits=2),
+            'soa': SoAParticleStorage,
+            'slot_map': SlotMapStorage}
+
+
+@pytest.fixture(params=sorted(STORAGES.keys()))
+def storage(request):
+    return STORAGES[request.param]
+
+
+def new_set(fieldset, pclass, storage, lons):
+    pset = ParticleSet(fieldset=fieldset, pclass=pclass, storage=storage)
+    pset.add_many(make_particles(pclass, fieldset, lons))
+    return pset
+
+
+def check_chain(pset):
+    """Checks the node links (and the C chain of JIT nodes) of node-based storages against the positions."""
+    if not pset.data.node_based:
+        return
+    ids = ids_of(pset)
+    forward = []
+    node = pset.begin()
+    while node is not None:
+        forward.append(node.id)
+        node = node.next
+    assert forward == ids
+    if len(ids) > 0 and isinstance(pset.begin(), NodeJITBase):
+        pset.flush_links()
+        assert pset.begin().count_chain() == len(ids)
+
+
+def test_removal_mask():
+    assert removal_mask([0, -1, 2], 5).tolist() == [True, False, True, False, True]
+    mask = np.array([False, True, False])
+    assert removal_mask(mask, 3) is mask
+    with pytest.raises(AssertionError):
+        removal_mask(mask, 4)
+    assert removal_mask([True, False, False, True], 4).tolist() == [True, False, False, True]
+
+
+def test_unlink_masked():
+    # -- the nodes release their IDs when they are torn down: take them from the ID generator -- #
+    nodes = [Node(id=id) for id in np.sort(package_globals.idgen.nextIDs(8)).tolist()]
+    ids = [node.id for node in nodes]
+    for prev_node, node in zip(nodes[:-1], nodes[1:]):
+        node.set_prev(prev_node)
+        prev_node.set_next(node)
+    # -- runs of victims at the front, in the middle and at the end -- #
+    mask = removal_mask([0, 1, 3, 4, 7], 8)
+    survivors, victims = unlink_masked(nodes, mask)
+    assert [node.id for node in survivors] == [ids[i] for i in [2, 5, 6]]
+    assert [node.id for node in victims] == [ids[i] for i in [0, 1, 3, 4, 7]]
+    assert survivors[0].prev is None and survivors[0].next is survivors[1]
+    assert survivors[1].prev is survivors[0] and survivors[2].next is None
+    assert all(node.prev is None and node.next is None for node in victims)
+    assert unlink_masked(survivors, np.zeros(3, dtype=np.bool_)) == (survivors, [])
+
+
+def test_remove_many_with_mask(fieldset, pclass, storage):
+    pset = new_set(fieldset, pclass, storage, range(12))
+    ids = ids_of(pset)
+    lons = lons_of(pset)
+    mask = np.zeros(12, dtype=np.bool_)
+    mask[[0, 1, 5, 6, 7, 11]] = True
+    pset.remove_many(mask)
+    kept = np.flatnonzero(~mask).tolist()
+    assert ids_of(pset) == [ids[i] for i in kept] and lons_of(pset) == [lons[i] for i in kept]
+    assert len(pset._id_index) == len(kept) and ids[5] not in pset and ids[4] in pset
+    check_chain(pset)
+    pset.remove_many(np.zeros(len(pset), dtype=np.bool_))
+    assert len(pset) == len(kept)
+
+
+def test_remove_many_with_indices(fieldset, pclass, storage):
+    pset = new_set(fieldset, pclass, storage, range(8))
+    ids = ids_of(pset)
+    # -- unsorted, with a duplicate and a negative position -- #
+    pset.remove_many([4, 1, 4, -1])
+    assert ids_of(pset) == [ids[i] for i in [0, 2, 3, 5, 6]]
+    check_chain(pset)
+    pset.remove_entities([pset[1].data, pset[3].data])
+    assert ids_of(pset) == [ids[i] for i in [0, 3, 6]]
+    assert len(pset._id_index) == 3
+    check_chain(pset)
+
+
+def test_remove_many_with_bool_list(fieldset, pclass, storage):
+    pset = new_set(fieldset, pclass, storage, range(5))
+    ids = ids_of(pset)
+    # -- a list of Python bools is a mask, not the positions 0 and 1 -- #
+    pset.remove_many([True, False, False, False, True])
+    assert ids_of(pset) == ids[1:4] and len(pset._id_index) == 3
+    check_chain(pset)
+
+
+def test_remove_with_bool_array(fieldset, pclass, storage):
+    pset = new_set(fieldset, pclass, storage, range(6))
+    ids = ids_of(pset)
+    pset.remove(np.array([False, True, False, True, True, False]))
+    assert ids_of(pset) == [ids[i] for i in [0, 2, 5]] and ids[3] not in pset
+    check_chain(pset)
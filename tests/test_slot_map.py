@@ -0,0 +1,100 @@
+import numpy as np
+
+import package_globals
+from conftest import make_particles, ids_of, lons_of, scalar, compile_kernel
+from particleset_node import ParticleSet
+from SlotMap import SlotMapStorage
+from OffsetArena import NIL, FREE
+from parcels_mocks.status import StatusCode as ErrorCode
+
+
+def fresh_ids(n):
+    """:return: n new particle IDs, ascending (the ID generator hands out released IDs first, last one first)"""
+    return np.sort(package_globals.idgen.nextIDs(n)).astype(np.int64)
+
+
+def check_links(storage):
+    """Checks that the slot chain (both directions) follows the IDs and agrees with the handles."""
+    ids = [node.id for node in storage]
+    assert ids == sorted(ids) and len(ids) == len(storage)
+    forward = [int(storage.record(slot)['id']) for slot in storage.slots()]
+    backward = [int(storage.record(slot)['id']) for slot in storage.slots(backward=True)]
+    assert forward == ids and backward == ids[::-1]
+    assert storage.export_c()[0] == len(ids)
+    if len(ids) > 0:
+        assert storage.begin().id == ids[0] and storage.end().id == ids[-1]
+        assert storage.begin().prev is None and storage.end().next is None
+        assert [node.next.id for node in list(storage)[:-1]] == ids[1:]
+
+
+def test_chain_in_id_order(pclass):
+    ids = fresh_ids(8).tolist()
+    storage = SlotMapStorage(pclass, capacity=2)
+    for id in ids[2:6]:
+        storage.add(lon=float(id), id=id)
+    # -- below the first, in between, and a batch that interleaves -- #
+    storage.add(lon=float(ids[0]), id=ids[0])
+    # -- the removed handle owns its ID (and keeps the record): it is added back as it is -- #
+    storage.add(storage.remove(ids[3]))
+    storage.update([ids[1], ids[6], ids[7]])
+    check_links(storage)
+    assert [node.id for node in storage] == ids
+    assert storage.capacity == 8
+    assert scalar(storage.get_by_id(ids[0]).data.lon) == float(ids[0])
+
+
+def test_removal_frees_slots(pclass):
+    ids = fresh_ids(6).tolist()
+    storage = SlotMapStorage(pclass, capacity=8)
+    storage.update(ids)
+    slot = storage.row_of(ids[2])
+    victim = storage.remove(ids[2])
+    assert victim.id == ids[2] and victim.storage is None
+    assert storage.prev(slot) == FREE and storage.next(slot) == NIL
+    check_links(storage)
+    freed = {slot} | {storage.row_of(ids[i]) for i in (0, 3, 5)}
+    victims = storage.remove_many(np.array([True, False, True, False, True]))
+    assert [node.id for node in victims] == [ids[0], ids[3], ids[5]]
+    check_links(storage)
+    assert [node.id for node in storage] == [ids[1], ids[4]]
+    # -- freed slots are handed out again -- #
+    new_id = int(fresh_ids(1)[0])
+    storage.add(id=new_id)
+    assert storage.row_of(new_id) in freed and storage.capacity == 8
+    check_links(storage)
+
+
+def test_particle_set_on_slot_map(fieldset, pclass):
+    pset = ParticleSet(fieldset=fieldset, pclass=pclass, storage=SlotMapStorage)
+    pset.add_many(make_particles(pclass, fieldset, range(8)))
+    ids = ids_of(pset)
+    lons = lons_of(pset)
+    assert pset.loopgen_class is SlotMapStorage.loopgen_class
+    assert pset.get_by_id(ids[5]).data.lon == lons[5]
+    assert [node.id for node in pset.cursor(backward=True)] == ids[::-1]
+    pset[0].data.state = ErrorCode.Delete
+    pset[6].data.state = ErrorCode.Delete
+    pset.remove_deleted_items()
+    assert ids_of(pset) == [id for i, id in enumerate(ids) if i not in (0, 6)]
+    assert len(pset._id_index) == 6
+    check_links(pset.data)
+    copy = pset.to_slot_map()
+    assert lons_of(copy) == lons_of(pset)
+    check_links(copy.data)
+
+
+def test_kernel_on_sub_chain(fieldset, pclass):
+    def move(particle, fieldset, time):
+        particle.lon += 1.
+
+    pset = ParticleSet(fieldset=fieldset, pclass=pclass).to_slot_map()
+    pset.add_many(make_particles(pclass, fieldset, range(10)))
+    ids = ids_of(pset)
+    lons = lons_of(pset)
+    kernel = compile_kernel(pset, move)
+    kernel.execute(pset, endtime=3600., dt=3600., sub_chain=pset.index_range(3, 7))
+    assert lons_of(pset) == [lon + 1. if 3 <= i < 7 else lon for i, lon in enumerate(lons)]
+    # -- the particles outside the sub-chain are one time step behind -- #
+    kernel.execute(pset, endtime=7200., dt=3600.)
+    assert lons_of(pset) == [lon + 2. for lon in lons]
+    assert ids_of(pset) == ids
@@ -0,0 +1,73 @@
+import pytest
+
+from conftest import make_particles, ids_of, lons_of, scalar
+from particleset_node import ParticleSet
+from OrderStatistic import BPlusTreeList
+from ConcurrentList import ConcurrentRealList
+
+
+def new_set(fieldset, pclass, lons, **kwargs):
+    pset = ParticleSet(fieldset=fieldset, pclass=pclass, **kwargs)
+    pset.add_many(make_particles(pclass, fieldset, lons))
+    return pset
+
+
+def test_snapshot_keeps_records_after_materialize(fieldset, pclass):
+    pset = new_set(fieldset, pclass, range(10))
+    lons = lons_of(pset)
+    snapshot = pset.snapshot()
+    assert not snapshot.materialized
+    pset.materialize_snapshots()
+    assert snapshot.materialized
+    for node in pset.data:
+        node.data.lon = -1.
+    assert snapshot.records()['lon'].tolist() == lons
+    assert lons_of(pset) == [-1.] * 10
+
+
+def test_snapshot_records_read_first(fieldset, pclass):
+    pset = new_set(fieldset, pclass, range(10))
+    lons = lons_of(pset)
+    snapshot = pset.snapshot()
+    records = snapshot.records()
+    pset[3].data.lon = -1.
+    assert records['lon'].tolist() == lons
+
+
+def test_setitem_materializes(fieldset, pclass):
+    pset = new_set(fieldset, pclass, range(4))
+    lons = lons_of(pset)
+    snapshot = pset.snapshot()
+    replacement = make_particles(pclass, fieldset, [-1.])[0]
+    pset[2] = replacement
+    assert snapshot.materialized
+    assert snapshot.records()['lon'].tolist() == lons
+
+
+def test_snapshot_isolated_from_adds_and_removes(fieldset, pclass):
+    pset = new_set(fieldset, pclass, range(50))
+    ids = ids_of(pset)
+    snapshot = pset.snapshot()
+    pset.materialize_snapshots()
+    pset.remove_many(list(range(0, 50, 3)))
+    pset.add_many(make_particles(pclass, fieldset, range(100, 120)))
+    assert len(snapshot) == 50
+    assert [int(node.id) for node in snapshot] == ids
+    assert len(snapshot.records()) == 50
+    assert len(pset) == 50 - 17 + 20
+
+
+def test_unmaterialized_snapshot_sees_direct_changes(fieldset, pclass):
+    # -- the documented contract: direct changes without materialize_snapshots() reach the snapshot -- #
+    pset = new_set(fieldset, pclass, range(3))
+    snapshot = pset.snapshot()
+    pset[0].data.lon = -1.
+    assert scalar(snapshot.records()['lon'][0]) == -1.
+
+
+@pytest.mark.parametrize('kwargs', [{'skip_list': True}, {'order_backend': BPlusTreeList},
+                                    {'storage': ConcurrentRealList}], ids=['skip_list', 'ordered_list', 'concurrent'])
+def test_snapshot_refused_without_support(fieldset, pclass, kwargs):
+    pset = new_set(fieldset, pclass, range(3), **kwargs)
+    with pytest.raises(NotImplementedError):
+        pset.snapshot()
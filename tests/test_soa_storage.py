@@ -0,0 +1,148 @@
+import numpy as np
+import pytest
+
+import package_globals
+from conftest import make_particles, ids_of, lons_of, scalar, compile_kernel
+from particleset_node import ParticleSet
+from SoAStorage import SoAParticleStorage
+from RecordStorage import RecordNode
+from parcels_mocks.status import StatusCode as ErrorCode
+
+
+def fresh_ids(n):
+    """:return: n new particle IDs, ascending (the ID generator hands out released IDs first, last one first)"""
+    return np.sort(package_globals.idgen.nextIDs(n)).astype(np.int64)
+
+
+def new_set(fieldset, pclass, lons, **kwargs):
+    pset = ParticleSet(fieldset=fieldset, pclass=pclass, storage=SoAParticleStorage, **kwargs)
+    pset.add_many(make_particles(pclass, fieldset, lons))
+    return pset
+
+
+def test_compaction(pclass):
+    storage = SoAParticleStorage(pclass, capacity=4, compact_ratio=0.25)
+    ids = storage.add_many(lon=np.arange(16, dtype=np.float32), id=fresh_ids(16))
+    assert storage.capacity == 16 and len(storage) == 16
+    kept = storage.view(int(ids[15]))
+    storage.remove(int(ids[1]))
+    storage.remove(int(ids[3]))
+    assert storage.tombstones == 2
+    # -- the fifth tombstone exceeds a quarter of the rows: the live rows move to the front -- #
+    storage.remove_many([0, 1, 2])
+    assert storage.tombstones == 0 and len(storage) == 11
+    assert storage.column('lon').tolist() == [float(lon) for lon in range(5, 16)]
+    assert [storage.row_of(node.id) for node in storage] == list(range(11))
+    assert scalar(kept.lon) == 15.
+    kept.lon = 100.
+    assert storage.column('lon')[-1] == 100.
+
+
+def test_compaction_sorts_rows(pclass):
+    ids = fresh_ids(5).tolist()
+    storage = SoAParticleStorage(pclass, capacity=8)
+    storage.add_many(lon=np.arange(4, dtype=np.float32), id=np.array(ids[1:]))
+    # -- a lower ID (e.g. a reused one) is appended, and the positions still follow the IDs -- #
+    storage.add(lon=-1., id=ids[0])
+    assert [node.id for node in storage] == ids
+    assert storage.row_of(ids[0]) == 4
+    storage.compact()
+    assert storage.row_of(ids[0]) == 0
+    assert storage.column('id').tolist() == ids
+    assert storage.column('lon').tolist() == [-1., 0., 1., 2., 3.]
+
+
+def test_removed_particles_keep_their_data(pclass):
+    storage = SoAParticleStorage(pclass)
+    ids = storage.add_many(lon=np.arange(6, dtype=np.float32), id=fresh_ids(6))
+    view = storage.view(int(ids[2]))
+    victims = storage.remove_many(np.array([False, False, True, True, False, False]))
+    assert [node.id for node in victims] == [int(ids[2]), int(ids[3])]
+    assert all(isinstance(node, RecordNode) and node.storage is None for node in victims)
+    assert victims[0].data is view
+    assert [scalar(node.data.lon) for node in victims] == [2., 3.]
+    # -- the particles are detached: changes no longer reach the storage -- #
+    view.lon = 50.
+    assert storage.column('lon').tolist() == [0., 1., 4., 5.]
+
+
+def test_ids_are_released(pclass):
+    storage = SoAParticleStorage(pclass)
+    ids = storage.add_many(lon=np.zeros(3, dtype=np.float32))
+    storage.remove(int(ids[0]))
+    assert int(package_globals.idgen.released_ids[-1]) == int(ids[0])
+    storage.clear()
+    assert set(int(id) for id in ids[1:]) <= set(package_globals.idgen.released_ids.tolist())
+
+
+def test_particle_set_on_soa(fieldset, pclass):
+    pset = new_set(fieldset, pclass, range(8))
+    assert not pset.data.node_based
+    ids = ids_of(pset)
+    lons = lons_of(pset)
+    assert ids == sorted(ids) and sorted(lons) == [float(lon) for lon in range(8)]
+    assert pset.get_by_id(ids[3]).id == ids[3] and ids[3] in pset
+    assert [node.id for node in pset.cursor(start=pset[2])] == ids[2:]
+    assert [node.id for node in pset.cursor(backward=True)] == ids[::-1]
+    pset[1].data.lon = -1.
+    assert pset.data.column('lon').tolist() == lons[:1] + [-1.] + lons[2:]
+    particle = make_particles(pclass, fieldset, [42.])[0]
+    index = pset.add(particle)
+    id = int(scalar(particle.id))
+    assert pset[index-1].id == id and scalar(pset.get_by_id(id).data.lon) == 42.
+    pset.remove(pset.get_by_id(ids[0]))
+    pset.remove_many([pset.data.bisect_id(ids[1]), pset.data.bisect_id(ids[2])])
+    assert ids_of(pset) == sorted(ids[3:] + [id])
+    assert len(pset._id_index) == 6 and ids[0] not in pset
+
+
+def test_adopted_jit_particle_is_the_stored_one(fieldset):
+    from particle import JITParticle
+    pset = new_set(fieldset, JITParticle, range(3))
+    particle = make_particles(JITParticle, fieldset, [42.])[0]
+    pset.add(particle)
+    node = pset.get_by_id(particle.id)
+    assert node.data is particle
+    particle.lon = 7.
+    assert pset.data.field(node.id, 'lon')[0] == 7.
+
+
+def test_remove_deleted_items(fieldset, pclass):
+    pset = new_set(fieldset, pclass, range(6))
+    lons = lons_of(pset)
+    for index in [1, 4]:
+        pset[index].data.state = ErrorCode.Delete
+    assert pset.data.deleted_mask().tolist() == [False, True, False, False, True, False]
+    assert pset.get_deleted_item_indices() == [1, 4]
+    pset.remove_deleted_items()
+    assert lons_of(pset) == [lons[i] for i in [0, 2, 3, 5]]
+
+
+def test_fork_and_to_soa(fieldset, pclass):
+    pset = ParticleSet(fieldset=fieldset, pclass=pclass)
+    pset.add_many(make_particles(pclass, fieldset, range(5)))
+    soa = pset.to_soa()
+    assert isinstance(soa.data, SoAParticleStorage)
+    assert lons_of(soa) == lons_of(pset)
+    lon = lons_of(pset)[0]
+    soa[0].data.lon = -1.
+    assert lons_of(pset)[0] == lon
+    forked = soa.fork()
+    assert isinstance(forked.data, SoAParticleStorage) and lons_of(forked) == lons_of(soa)
+    assert set(ids_of(forked)).isdisjoint(ids_of(soa))
+
+
+def test_kernel_on_sub_chain(fieldset, pclass):
+    def move(particle, fieldset, time):
+        particle.lon += 1.
+
+    pset = new_set(fieldset, pclass, range(10))
+    ids = ids_of(pset)
+    # -- a reused (lower) ID and a tombstone in the middle of the run -- #
+    pset.remove_many([0, 5])
+    pset.add(make_particles(pclass, fieldset, [-1.])[0])
+    lons = lons_of(pset)
+    kernel = compile_kernel(pset, move)
+    kernel.execute(pset, endtime=3600., dt=3600., sub_chain=pset.id_range(ids[2], ids[8]))
+    expected = [lon + 1. if ids[2] <= id < ids[8] else lon for id, lon in zip(ids_of(pset), lons)]
+    assert lons_of(pset) == expected
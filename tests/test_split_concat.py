@@ -0,0 +1,147 @@
+from functools import partial
+
+import pytest
+
+from conftest import make_particles, ids_of, lons_of
+from particleset_node import ParticleSet
+from LinkedList import RealList, OrderedList
+from OrderStatistic import BPlusTreeList
+from SkipList import SkipList
+from ConcurrentList import ConcurrentRealList
+from Node import NodeCursor, NodeJITBase
+
+
+STORAGES = {'real_list': RealList,
+            'ordered_list': partial(OrderedList, backend=BPlusTreeList),
+            'skip_list': SkipList,
+            'concurrent': partial(ConcurrentRealList, segment_bits=2)}
+
+
+@pytest.fixture(params=sorted(STORAGES.keys()))
+def storage(request):
+    return STORAGES[request.param]
+
+
+def new_set(fieldset, pclass, storage, lons):
+    pset = ParticleSet(fieldset=fieldset, pclass=pclass, storage=storage)
+    pset.add_many(make_particles(pclass, fieldset, lons))
+    return pset
+
+
+def check_chain(pset):
+    """Checks that the links (Python- and C-side), the positions and the ID index of a set agree."""
+    nodes = list(pset.data)
+    assert [node.id for node in NodeCursor(pset.begin())] == [node.id for node in nodes]
+    assert [node.id for node in NodeCursor(pset.end(), backward=True)] == [node.id for node in reversed(nodes)]
+    assert [node.id for node in nodes] == sorted(node.id for node in nodes)
+    for index, node in enumerate(nodes):
+        assert pset[index] is node
+        assert node.id in pset
+        assert pset.get_by_id(node.id) is node
+    assert len(pset._id_index) == len(nodes)
+    if len(nodes) > 0 and isinstance(nodes[0], NodeJITBase):
+        pset.flush_links()
+        assert nodes[0].count_chain() == len(nodes)
+
+
+def test_split_at(fieldset, pclass, storage):
+    pset = new_set(fieldset, pclass, storage, range(20))
+    ids = ids_of(pset)
+    lons = lons_of(pset)
+    upper = pset.split_at(ids[7])
+    assert ids_of(pset) == ids[:7] and lons_of(pset) == lons[:7]
+    assert ids_of(upper) == ids[7:] and lons_of(upper) == lons[7:]
+    for id in ids[7:]:
+        assert id not in pset and id in upper
+    check_chain(pset)
+    check_chain(upper)
+
+
+@pytest.mark.parametrize('position', [0, 20])
+def test_split_at_ends(fieldset, pclass, storage, position):
+    pset = new_set(fieldset, pclass, storage, range(20))
+    ids = ids_of(pset)
+    upper = pset.split_at(ids[position] if position < len(ids) else ids[-1] + 1)
+    assert ids_of(pset) == ids[:position]
+    assert ids_of(upper) == ids[position:]
+    check_chain(pset)
+    check_chain(upper)
+
+
+def test_split_at_particle_id(fieldset, pclass, storage):
+    # -- the 'id' of a JIT particle is a 1-element array -- #
+    pset = new_set(fieldset, pclass, storage, range(10))
+    ids = ids_of(pset)
+    upper = pset.split_at(pset[4].data.id)
+    assert ids_of(pset) == ids[:4]
+    assert ids_of(upper) == ids[4:]
+    check_chain(pset)
+    check_chain(upper)
+
+
+def test_split_at_refuses_before_changing_anything(fieldset, pclass, storage):
+    pset = new_set(fieldset, pclass, storage, range(10))
+    ids = ids_of(pset)
+    with pytest.raises((TypeError, ValueError)):
+        pset.split_at('not an id')
+    assert ids_of(pset) == ids
+    check_chain(pset)
+
+
+def test_concat(fieldset, pclass, storage):
+    lower = new_set(fieldset, pclass, storage, range(10))
+    upper = new_set(fieldset, pclass, storage, range(10, 20))
+    ids = ids_of(lower) + ids_of(upper)
+    lower.concat(upper)
+    assert ids_of(lower) == sorted(ids)
+    assert len(upper) == 0 and len(upper._id_index) == 0
+    check_chain(lower)
+
+
+def test_concat_interleaved(fieldset, pclass, storage):
+    pset = new_set(fieldset, pclass, storage, range(20))
+    ids = ids_of(pset)
+    upper = pset.split_at(ids[10])
+    # -- move the upper half's lower part back, then concat a set whose IDs lie below this one's -- #
+    other = upper.split_at(ids[15])
+    upper.concat(pset)
+    assert ids_of(upper) == ids[:15]
+    other.concat(upper)
+    assert ids_of(other) == ids
+    check_chain(other)
+
+
+def test_splice(fieldset, pclass, storage):
+    source = new_set(fieldset, pclass, storage, range(20))
+    ids = ids_of(source)
+    lons = lons_of(source)
+    target = new_set(fieldset, pclass, storage, [])
+    target.splice(source, source.id_range(ids[5], ids[12]))
+    assert ids_of(target) == ids[5:12] and lons_of(target) == lons[5:12]
+    assert ids_of(source) == ids[:5] + ids[12:]
+    check_chain(source)
+    check_chain(target)
+
+
+def test_merge_and_split(fieldset, pclass, storage):
+    pset = new_set(fieldset, pclass, storage, range(12))
+    ids = ids_of(pset)
+    upper = pset.split(6)
+    assert ids_of(pset) == ids[:6] and ids_of(upper) == ids[6:]
+    upper_upper = upper.split(upper[3])
+    assert ids_of(upper_upper) == ids[9:]
+    pset.merge(upper_upper)
+    assert ids_of(pset) == ids[:6] + ids[9:]
+    pset.merge(upper, upper.id_range(ids[6], ids[8]))
+    assert ids_of(pset) == ids[:8] + ids[9:]
+    assert ids_of(upper) == ids[8:9]
+    check_chain(pset)
+    check_chain(upper)
+
+
+def test_fork_keeps_storage(fieldset, pclass, storage):
+    pset = new_set(fieldset, pclass, storage, range(8))
+    forked = pset.fork()
+    assert type(forked.data) == type(pset.data)
+    assert lons_of(forked) == lons_of(pset)
+    check_chain(forked)
@@ -0,0 +1,55 @@
+import pytest
+
+from conftest import make_particles, ids_of, lons_of, compile_kernel
+from particleset_node import ParticleSet
+from LinkedList import RealList
+
+
+def move(particle, fieldset, time):
+    particle.lon += 1.
+
+
+def new_set(fieldset, pclass, lons):
+    pset = ParticleSet(fieldset=fieldset, pclass=pclass, storage=RealList)
+    pset.add_many(make_particles(pclass, fieldset, lons))
+    return pset
+
+
+def test_id_range_descriptor(fieldset, pclass):
+    pset = new_set(fieldset, pclass, range(10))
+    pset.remove(4)
+    ids = ids_of(pset)
+    sub_chain = pset.id_range(ids[2], ids[6])
+    assert len(sub_chain) == 4 and [node.id for node in sub_chain] == ids[2:6]
+    assert sub_chain.id_bounds() == (ids[2], ids[5])
+    # -- bounds between and beyond the particle IDs -- #
+    assert [node.id for node in pset.id_range(ids[2] - 0.5, ids[3] + 1)] == ids[2:4]
+    assert [node.id for node in pset.id_range(ids[-1], ids[-1] + 100)] == ids[-1:]
+    assert len(pset.id_range(ids[3], ids[3])) == 0 and pset.id_range(ids[3], ids[3]).id_bounds() == (None, None)
+    assert [node.id for node in pset.index_range(7, 20)] == ids[7:]
+
+
+@pytest.mark.parametrize('bounds', [(0, 4), (3, 7), (6, 9), (0, 9)])
+def test_kernel_on_id_range(fieldset, pclass, bounds):
+    pset = new_set(fieldset, pclass, range(9))
+    ids = ids_of(pset)
+    lons = lons_of(pset)
+    lo, hi = bounds
+    kernel = compile_kernel(pset, move)
+    kernel.execute(pset, endtime=3600., dt=3600., sub_chain=pset.id_range(ids[lo], ids[hi-1] + 1))
+    assert lons_of(pset) == [lon + 1. if lo <= i < hi else lon for i, lon in enumerate(lons)]
+    if pclass.getPType().uses_jit:
+        # -- the C loop stops after the last node of the run, but the chain itself stays whole -- #
+        assert pset.begin().count_chain() == 9
+
+
+def test_partitions_cover_the_set(fieldset, pclass):
+    pset = new_set(fieldset, pclass, range(20))
+    pset.remove_many([3, 11, 12])
+    ids = ids_of(pset)
+    lons = lons_of(pset)
+    kernel = compile_kernel(pset, move)
+    # -- ID blocks of five, as for a partitioned execution -- #
+    for lo in range(ids[0], ids[-1] + 1, 5):
+        kernel.execute(pset, endtime=3600., dt=3600., sub_chain=pset.id_range(lo, lo + 5))
+    assert lons_of(pset) == [lon + 1. for lon in lons] and ids_of(pset) == ids
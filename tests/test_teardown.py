@@ -0,0 +1,90 @@
+import gc
+from functools import partial
+
+import numpy as np
+import pytest
+
+import package_globals
+from Node import Node, NodeJIT, CompactNodeJIT, teardown_nodes, node_link_journal
+from LinkedList import RealList, OrderedList
+from OrderStatistic import BPlusTreeList
+from SkipList import SkipList
+from ConcurrentList import ConcurrentRealList
+from wrapping import c_lib_register
+
+
+LISTS = {'real_list': RealList,
+         'ordered_list': partial(OrderedList, backend=BPlusTreeList),
+         'skip_list': SkipList,
+         'concurrent': partial(ConcurrentRealList, segment_bits=2)}
+
+
+def fresh_ids(n):
+    """:return: n new IDs, ascending - the nodes release their IDs when they are torn down"""
+    return np.sort(package_globals.idgen.nextIDs(n)).tolist()
+
+
+def registrations():
+    # -- collect the garbage of earlier tests first: its nodes deregister when they are finalised -- #
+    gc.collect()
+    return c_lib_register.get("node").register_count
+
+
+def released_tail(n):
+    """:return: the last n released IDs, sorted"""
+    return sorted(package_globals.idgen.released_ids[-n:].tolist())
+
+
+@pytest.mark.parametrize('nclass', [NodeJIT, CompactNodeJIT])
+def test_teardown_releases_ids_and_registrations(nclass):
+    ids = fresh_ids(6)
+    nodes = [nclass(id=id) for id in ids]
+    for prev_node, node in zip(nodes[:-1], nodes[1:]):
+        node.link_between(prev_node, None)
+    registered = registrations()
+    teardown_nodes(nodes)
+    assert registrations() == registered - 6 and released_tail(6) == ids
+    assert all(node.id is None and node.prev is None and node.next is None and not node.registered for node in nodes)
+    assert all(node._c_prev_p is None and node._c_next_p is None and node._c_data_p is None for node in nodes)
+    # -- finalising the torn-down nodes neither releases nor deregisters anything a second time -- #
+    nreleased = len(package_globals.idgen.released_ids)
+    del nodes, node, prev_node
+    assert registrations() == registered - 6 and len(package_globals.idgen.released_ids) == nreleased
+
+
+def test_teardown_of_plain_and_unregistered_nodes():
+    ids = fresh_ids(4)
+    nodes = [Node(id=ids[0]), Node(id=ids[1]), NodeJIT(id=ids[2]), NodeJIT(id=ids[3])]
+    nodes[3].unlink()
+    registered = registrations()
+    teardown_nodes(nodes)
+    # -- only the node that was still registered is deregistered -- #
+    assert registrations() == registered - 1 and released_tail(4) == ids
+
+
+def test_teardown_drops_journaled_nodes():
+    first, second = fresh_ids(2)
+    node_link_journal.enable()
+    try:
+        head = NodeJIT(id=first)
+        tail = NodeJIT(id=second)
+        tail.link_between(head, None)
+        assert len(node_link_journal) == 2
+        teardown_nodes([head, tail])
+        assert len(node_link_journal) == 0
+    finally:
+        node_link_journal.disable()
+    assert not node_link_journal.enabled
+
+
+@pytest.mark.parametrize('lclass', sorted(LISTS.keys()))
+def test_clear_tears_down_the_list(lclass):
+    ids = fresh_ids(10)
+    nlist = LISTS[lclass](dtype=NodeJIT)
+    nlist.update(ids)
+    nodes = list(nlist)
+    registered = registrations()
+    nlist.clear()
+    assert len(nlist) == 0 and nlist.begin() is None
+    assert registrations() == registered - 10 and released_tail(10) == ids
+    assert all(node.id is None and not node.registered and node._c_next_p is None for node in nodes)
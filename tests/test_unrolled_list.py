@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+from conftest import make_particles, lons_of, scalar, compile_kernel, run_loop
+from particle import JITParticle
+from particleset_node import ParticleSet
+from BlockNode import UnrolledList, particle_id
+
+
+def move(particle, fieldset, time):
+    particle.lon += 1.
+
+
+def new_particles(fieldset, lons, first_id=0):
+    """:return: list of JIT particles at the given longitudes, with consecutive IDs from 'first_id' on"""
+    return [JITParticle(lon=float(lon), lat=0., pid=first_id+i, fieldset=fieldset, depth=0., time=0., dt=3600.)
+            for i, lon in enumerate(lons)]
+
+
+def block_ids(ulist):
+    """:return: list of the (sorted) particle IDs per block, in chain order"""
+    return [sorted(block.slot_of.keys()) for block in ulist.blocks()]
+
+
+def check_blocks(ulist):
+    blocks = [ids for ids in block_ids(ulist) if len(ids) > 0]
+    flat = [id for ids in blocks for id in ids]
+    assert flat == sorted(flat) and len(flat) == len(ulist)
+    assert all(len(ids) <= ulist.capacity for ids in blocks)
+    assert [block.count for block in ulist.blocks()] == [block._c_count for block in ulist.blocks()]
+
+
+def test_blocks_split_and_merge(fieldset):
+    particles = new_particles(fieldset, range(40))
+    ulist = UnrolledList(JITParticle.getPType(), capacity=8)
+    for particle in particles[::-1]:
+        ulist.add(particle)
+    check_blocks(ulist)
+    assert len(ulist) == 40 and ulist.nblocks >= 5
+    ids = sorted(particle_id(p) for p in particles)
+    assert ulist.get_by_id(ids[7]).id == ids[7]
+    nblocks = ulist.nblocks
+    for id in ids[:20]:
+        ulist.remove(id)
+    check_blocks(ulist)
+    assert len(ulist) == 20 and ulist.nblocks < nblocks
+    assert ulist.get_by_id(ids[0]) is None
+    with pytest.raises(ValueError):
+        ulist.remove(ids[0])
+
+
+def test_removed_particle_keeps_its_record(fieldset):
+    particle = new_particles(fieldset, [3.])[0]
+    ulist = UnrolledList(JITParticle.getPType(), capacity=4)
+    ulist.add(particle)
+    ulist.begin().records['lon'][0] = 5.
+    assert ulist.remove(particle) is particle
+    ulist.clear()
+    assert scalar(particle.lon) == 5.
+
+
+def test_kernel_matches_node_chain(fieldset):
+    lons = np.arange(50, dtype=np.float32)
+    pset = ParticleSet(fieldset=fieldset, pclass=JITParticle)
+    pset.add_many(make_particles(JITParticle, fieldset, lons))
+    ulist = UnrolledList(JITParticle.getPType(), capacity=8)
+    for particle in new_particles(fieldset, lons):
+        ulist.add(particle)
+    # -- holes in the blocks (the i-th particle of the list has ID i and longitude i) -- #
+    for lon in [3., 17., 18., 40.]:
+        pset.remove(next(node for node in pset.data if scalar(node.data.lon) == lon))
+        ulist.remove(int(lon))
+    kernel = compile_kernel(pset, move)
+    block_kernel = compile_kernel(pset, move, loopgen_class=UnrolledList.loopgen_class)
+    kernel.execute(pset, endtime=3600., dt=3600.)
+    run_loop(block_kernel, ulist, endtime=3600., dt=3600.)
+    assert sorted(scalar(p.lon) for p in ulist) == sorted(lons_of(pset))
+
+
+def test_loop_honours_num_particles(fieldset):
+    ulist = UnrolledList(JITParticle.getPType(), capacity=4)
+    for particle in new_particles(fieldset, np.zeros(10)):
+        ulist.add(particle)
+    pset = ParticleSet(fieldset=fieldset, pclass=JITParticle)
+    kernel = compile_kernel(pset, move, loopgen_class=UnrolledList.loopgen_class)
+    run_loop(kernel, ulist, endtime=3600., dt=3600., num_particles=6)
+    assert sorted(scalar(p.lon) for p in ulist) == [0.] * 4 + [1.] * 6
+    with pytest.raises(AssertionError):
+        ulist.export_c(sub_chain=pset.index_range(0, 0))
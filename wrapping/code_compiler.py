@@ -52,15 +52,15 @@ class LibraryRegisterC:
             return self._data[libname]
         return None
 
-    def register(self, libname):
+    def register(self, libname, count=1):
         #if libname not in self._data.keys():
         #    self.load(libname)
         if libname in self._data.keys():
-            self._data[libname].register()
+            self._data[libname].register(count)
 
-    def deregister(self, libname):
+    def deregister(self, libname, count=1):
         if libname in self._data.keys():
-            self._data[libname].unregister()
+            self._data[libname].unregister(count)
         #    if self._data[libname].register_count <= 0:
         #        self.unload(libname)
 
@@ -119,12 +119,12 @@ class InterfaceC:
             # self._cleanup_lib = finalize(self, package_globals.cleanup_unload_lib, self.libc)
             self.loaded = True
 
-    def register(self):
-        self.register_count += 1
+    def register(self, count=1):
+        self.register_count += count
         # print("lib '{}' register (count: {})".format(self.lib_file, self.register_count))
 
-    def unregister(self):
-        self.register_count -= 1
+    def unregister(self, count=1):
+        self.register_count -= count
         # print("lib '{}' de-register (count: {})".format(self.lib_file, self.register_count))
 
     def load_functions(self, function_param_array=[]):